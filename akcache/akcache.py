@@ -1,38 +1,387 @@
+import functools
+import inspect
+import threading
 import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytz
 from log import logger
+from .keys import make_key
+from .registry import SharedCache, get_shared_cache
+
+# 后台刷新过期缓存用的线程池（stale-while-revalidate）
+_refresh_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="akcache-refresh")
+
+# 所有存活的 CacheWrapper 实例，用于汇总统计（共享同一缓存的实例只统计一次）
+_instances = weakref.WeakSet()
+
+
+def enable_copy_on_write():
+    """
+    开启 pandas 的 Copy-on-Write 模式（pandas 3 起默认开启）。
+
+    开启后 df.copy(deep=False) 得到的浅拷贝在被修改时才复制受影响的列，
+    缓存可以放心地把浅拷贝交给调用方，而不用每次命中都深拷贝整张表。
+    这是进程级的全局设置，由应用在启动时调用一次。
+    """
+    if int(pd.__version__.split(".")[0]) < 3:
+        pd.set_option("mode.copy_on_write", True)
+
+
+def protect(value):
+    """
+    返回缓存值的只读 / 写时复制视图，防止调用方修改（例如新增列）污染共享的缓存对象。
+
+    DataFrame / Series 返回浅拷贝（依赖 Copy-on-Write），numpy 数组返回只读视图，
+    list / dict 返回浅拷贝，其他类型原样返回。
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy(deep=False)
+    if isinstance(value, np.ndarray):
+        view = value.view()
+        view.flags.writeable = False
+        return view
+    if isinstance(value, (list, dict)):
+        return value.copy()
+    return value
 
 
 class CacheWrapper:
-    def __init__(self, obj, cache_time=180):
+    """
+    对任意对象（通常是 akshare 模块）的方法调用结果做缓存。
+
+    参数:
+        obj: 被代理的对象
+        cache_time (int): 缓存有效期（秒）
+        max_entries (int): 最多缓存的调用结果条数
+        max_bytes (int): 缓存结果的内存预算（字节），DataFrame 按 deep 方式统计
+        purge_interval (int): 主动清理过期条目的间隔（秒）
+        disk_dir (str): 可选的磁盘缓存目录。设置后结果会同时写入磁盘，
+            内存未命中时先查磁盘再请求上游，进程重启后缓存依然有效
+        disk_backend (str): 持久化层类型，"arrow"（默认，DataFrame 存为 Arrow IPC 文件）
+            或 "sqlite"（disk_dir 下的 SQLite 文件，同一台机器上的多个进程共享，
+            并用租约保证多个进程同时未命中时只请求一次上游）
+        copy_on_write (bool): 是否返回缓存值的写时复制视图（见 protect）。默认对共享
+            缓存（shared）开启：同一份结果会交给多个模块的调用方，任何一处修改返回的
+            DataFrame 都不能影响缓存中的对象。本类不修改 pandas 的全局设置，
+            应用需在启动时调用一次 enable_copy_on_write()
+        stale_ttl (int): 过期后仍可返回旧值的最长时间（秒）。在此窗口内直接返回旧值，
+            并在后台线程刷新；超过有效期 + stale_ttl 的数据不会再返回
+        ttl_policy (callable): 可选，按方法名返回缓存有效期（秒）的策略，例如
+            policy.AKSHARE_TTL_POLICY；返回 None 时使用 cache_time。
+            有效期按写入时刻计算并随条目保存
+        shared (bool): 是否使用进程内共享缓存。默认对模块对象开启：包装同一个模块
+            （如 akshare）的所有实例共用一份缓存、统计和持久化层，容量参数以第一个
+            创建的实例为准；有效期相关参数仍按实例生效：读取其他实例写入的条目时，
+            按读取者的配置和条目的写入时间判断是否过期
+
+    stats 按方法名记录命中、未命中、旧值命中、淘汰和上游耗时，
+    get_cache_stats() 汇总所有实例的统计。
+
+    线程安全：缓存读写加锁；同一个键过期后的并发调用只会向上游发起一次请求，
+    其余线程等待并共享同一个结果。
+    """
+
+    def __init__(
+        self,
+        obj,
+        cache_time=180,
+        max_entries=256,
+        max_bytes=512 * 1024 * 1024,
+        purge_interval=60,
+        disk_dir=None,
+        stale_ttl=0,
+        ttl_policy=None,
+        disk_backend="arrow",
+        shared=None,
+        copy_on_write=None,
+    ):
         self.obj = obj
         self.cache_time = cache_time
-        self.cache = {}
+        self.stale_ttl = stale_ttl
+        self.ttl_policy = ttl_policy
+        if shared is None:
+            shared = inspect.ismodule(obj)
+        self.copy_on_write = shared if copy_on_write is None else copy_on_write
+        options = dict(
+            max_entries=max_entries, max_bytes=max_bytes, purge_interval=purge_interval
+        )
+        if shared:
+            self.shared = get_shared_cache(self.label, **options)
+        else:
+            self.shared = SharedCache(self.label, **options)
+        if disk_dir:
+            self.shared.attach_persist(disk_dir, disk_backend)
+        self.cache = self.shared.store
+        self.stats = self.shared.stats
+        self._flight = self.shared.flight
+        _instances.add(self)
+
+    @property
+    def disk(self):
+        return self.shared.persist
+
+    @property
+    def label(self):
+        return getattr(self.obj, "__name__", type(self.obj).__name__)
 
     def __getattr__(self, name):
         method = getattr(self.obj, name)
 
         def cached_method(*args, **kwargs):
-            key = (name, args, tuple(kwargs.items()))  # 创建缓存键
-            current_time = time.time()
-
-            # 检查缓存是否存在且未过期
-            if key in self.cache:
-                cached_result, timestamp = self.cache[key]
-                if current_time - timestamp < self.cache_time:
-                    logger.debug(f"缓存命中: {name}")
-                    return cached_result
-
-            # 如果缓存不存在或过期，调用方法并缓存结果
-            logger.debug(f"缓存未命中, 正在调用方法 {name} {args} {kwargs}")
-            result = method(*args, **kwargs)
-            self.cache[key] = (result, current_time)
-            return result
+            return self.call(name, method, args, kwargs)
 
         return cached_method
 
+    def call(self, name, method, args, kwargs):
+        key = make_key(name, method, args, kwargs)  # 创建规范化的缓存键
+        current_time = time.time()
+
+        # 检查缓存是否存在且未过期
+        entry = self.cache.get(key)
+        if entry is not None:
+            age = current_time - entry.timestamp
+            ttl = self.entry_ttl(name, entry)
+            if age < ttl:
+                logger.debug(f"缓存命中: {name}")
+                self.stats.record(name, "hits")
+                return self._protect(entry.value)
+            if age < ttl + self.stale_ttl:
+                # 已过期但未超过最大陈旧时间：先返回旧值，后台刷新
+                logger.debug(f"返回过期缓存并后台刷新: {name}，已缓存 {int(age)} 秒")
+                self.stats.record(name, "stale_hits")
+                self._refresh_async(key, name, method, args, kwargs)
+                return self._protect(entry.value)
+
+        # 如果缓存不存在或过期，同一个键只允许一个线程调用方法，其余线程等待结果
+        self.stats.record(name, "misses")
+        result = self._flight.do(
+            key, lambda: self._load(key, name, method, args, kwargs)
+        )
+        return self._protect(result)
+
+    def _protect(self, value):
+        return protect(value) if self.copy_on_write else value
+
+    @property
+    def ttl_source(self):
+        """决定有效期的配置（策略、默认有效期），随写入的条目保存。"""
+        return (self.ttl_policy, self.cache_time)
+
+    def ttl_for(self, name, written_at=None):
+        """
+        返回 name 的结果按本实例的配置应使用的缓存有效期（秒）。
+        written_at 为结果的写入时间戳，默认为此刻；市场时钟策略按写入时刻计算。
+        """
+        if self.ttl_policy is not None:
+            now = None
+            if written_at is not None:
+                now = datetime.fromtimestamp(written_at, pytz.timezone("Asia/Shanghai"))
+            ttl = self.ttl_policy(name, now)
+            if ttl is not None:
+                return ttl
+        return self.cache_time
+
+    def entry_ttl(self, name, entry):
+        """
+        条目对本实例的有效期（秒）。共享缓存中的条目可能由配置不同的实例写入，
+        此时按本实例的配置和条目的写入时间重新计算，而不是沿用写入者的有效期。
+        """
+        if entry.source == self.ttl_source:
+            return entry.ttl
+        return self.ttl_for(name, entry.timestamp)
+
+    def _fresh_entry(self, key, name, current_time):
+        entry = self.cache.get(key)
+        if entry is not None and current_time - entry.timestamp < self.entry_ttl(
+            name, entry
+        ):
+            return entry
+        return None
+
+    def _load(self, key, name, method, args, kwargs):
+        # 等锁期间可能已有其他线程刷新了缓存，再检查一次
+        entry = self._fresh_entry(key, name, time.time())
+        if entry is not None:
+            logger.debug(f"缓存命中: {name}")
+            return entry.value
+
+        # 内存未命中时先查磁盘
+        disk = self.disk
+        if disk is not None:
+            found, value = self._promote(key, name, disk.get(key))
+            if found:
+                return value
+
+        # 跨进程持久化层（SQLite）：只有拿到租约的进程请求上游，其余进程等待其结果
+        leased = False
+        if disk is not None and hasattr(disk, "acquire"):
+            leased = disk.acquire(key)
+            if not leased:
+                logger.debug(f"其他进程正在请求 {name}，等待其结果")
+                found, value = self._promote(key, name, disk.wait(key))
+                if found:
+                    return value
+                leased = disk.acquire(key)
+
+        logger.debug(f"缓存未命中, 正在调用方法 {name} {args} {kwargs}")
+        current_time = time.time()
+        ttl = self.ttl_for(name)
+        try:
+            result = method(*args, **kwargs)
+        except Exception:
+            self.stats.record_upstream(name, time.time() - current_time, error=True)
+            if leased:
+                disk.release(key)
+            raise
+        self.stats.record_upstream(name, time.time() - current_time)
+        self.cache.set(
+            key, result, ttl, current_time, self.stale_ttl, self.ttl_source
+        )
+        if disk is not None:
+            disk.set(key, result, ttl, current_time, self.stale_ttl)
+            if leased:
+                disk.release(key)
+        return result
+
+    def _promote(self, key, name, hit):
+        # 把持久化层中仍有效的结果放回内存缓存，返回 (是否命中, 值)
+        if hit is None:
+            return False, None
+        value, timestamp, _, _ = hit
+        # 持久化的条目可能由其他配置的实例或进程写入，按本实例的配置判断是否有效
+        ttl = self.ttl_for(name, timestamp)
+        if time.time() - timestamp >= ttl:
+            return False, None
+        logger.debug(f"磁盘缓存命中: {name}")
+        self.stats.record(name, "disk_hits")
+        self.cache.set(key, value, ttl, timestamp, self.stale_ttl, self.ttl_source)
+        return True, value
+
+    def _refresh_async(self, key, name, method, args, kwargs):
+        if self._flight.in_flight(key):
+            return
+
+        def refresh():
+            try:
+                self._flight.do(key, lambda: self._load(key, name, method, args, kwargs))
+            except Exception as e:
+                logger.error(f"后台刷新缓存 {name} 时发生错误：{str(e)}")
+
+        _refresh_pool.submit(refresh)
+
+    def fetched_at(self, name, *args, **kwargs):
+        """
+        返回某次调用的缓存数据获取时间（时间戳），没有缓存时返回 None。
+        可用于在页面上显示“数据时间”。
+        """
+        return self.entry_time(name, getattr(self.obj, name), args, kwargs)
+
+    def entry_time(self, name, method, args, kwargs):
+        entry = self.cache.get(make_key(name, method, args, kwargs))
+        return entry.timestamp if entry is not None else None
+
+    def stats_snapshot(self):
+        """返回本实例按方法名汇总的统计数据（list[dict]）。"""
+        rows = self.stats.snapshot(self.cache.usage())
+        for row in rows:
+            row["缓存"] = self.shared.name
+        return rows
+
     def clear_cache(self):
         self.cache.clear()  # 清空缓存
+        if self.disk is not None:
+            self.disk.clear()
         logger.info("缓存已清空")
 
+    def purge_expired(self):
+        removed = self.cache.purge_expired()
+        if self.disk is not None:
+            removed += self.disk.purge_expired()
+        return removed
+
+
+_function_caches = {}
+_function_caches_lock = threading.Lock()
+
+
+def cached(ttl=180, stale_ttl=0, ttl_policy=None, **options):
+    """
+    函数结果缓存装饰器，可替代 st.cache_data(ttl=...)，额外支持 stale-while-revalidate
+    和按市场时钟变化的有效期（ttl_policy，例如 policy.market_ttl("realtime")）。
+
+    Streamlit 每次 rerun 都会重新执行页面脚本，缓存按函数的模块名和限定名保存在本模块中，
+    重新装饰同名函数时会复用之前的缓存。
+
+    被装饰的函数额外提供:
+        fetched_at(*args, **kwargs): 对应参数的数据获取时间戳
+        clear(): 清空该函数的缓存
+    """
+
+    def decorator(func):
+        cache_name = f"{func.__module__}.{func.__qualname__}"
+        with _function_caches_lock:
+            cache = _function_caches.get(cache_name)
+            if cache is None:
+                cache = _function_caches[cache_name] = CacheWrapper(
+                    func, cache_time=ttl, stale_ttl=stale_ttl, **options
+                )
+            cache.cache_time = ttl
+            cache.stale_ttl = stale_ttl
+            cache.ttl_policy = ttl_policy
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return cache.call(func.__qualname__, func, args, kwargs)
+
+        def fetched_at(*args, **kwargs):
+            return cache.entry_time(func.__qualname__, func, args, kwargs)
+
+        wrapper.fetched_at = fetched_at
+        wrapper.clear = cache.clear_cache
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
+
+
+def get_cache_stats():
+    """
+    汇总所有 CacheWrapper 实例（包括 cached 装饰的函数）的统计数据。
+
+    返回:
+        pd.DataFrame: 每个 (缓存, 函数) 一行，列包括命中、未命中、旧值命中、淘汰、
+        缓存条目、占用字节、上游调用次数、平均/最大耗时和耗时分布。
+    """
+    rows = []
+    seen = set()
+    for instance in list(_instances):
+        if id(instance.shared) in seen:
+            continue
+        seen.add(id(instance.shared))
+        rows.extend(instance.stats_snapshot())
+    df = pd.DataFrame(rows)
+    if df.empty:
+        return df
+    columns = ["缓存"] + [c for c in df.columns if c != "缓存"]
+    return df[columns].sort_values(["缓存", "函数"]).reset_index(drop=True)
+
+
+def reset_cache_stats():
+    for instance in list(_instances):
+        instance.stats.reset()
+
+
+def clear_function_caches():
+    """清空所有被 cached 装饰的函数的缓存。"""
+    with _function_caches_lock:
+        caches = list(_function_caches.values())
+    for cache in caches:
+        cache.clear_cache()
+
 
 # 示例使用
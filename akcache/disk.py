@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+from log import logger
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow 是可选依赖，缺失时磁盘缓存不可用
+    pa = None
+
+_META_KEY = b"akcache"
+
+
+class DiskCache:
+    """
+    磁盘缓存层：把 DataFrame 结果以 Arrow IPC 文件保存在 directory 下，容器重启后仍可命中。
+
+    每个缓存键对应一个文件（文件名为键的 sha1），缓存时间和有效期写在 schema 元数据里。
+    写入先落到临时文件再 os.replace，多个线程/进程同时写同一个键也不会读到半个文件。
+    非 DataFrame 的结果不落盘。
+    """
+
+    def __init__(self, directory):
+        if pa is None:
+            raise ImportError("磁盘缓存需要安装 pyarrow")
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def supports(value):
+        return isinstance(value, pd.DataFrame)
+
+    def path_for(self, key):
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{digest}.arrow")
+
+    def get(self, key):
+        """
+        读取缓存文件。
+
+        返回:
+            tuple: (value, timestamp, ttl, stale_ttl)；文件不存在或读取失败时返回 None。
+        """
+        path = self.path_for(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with pa.memory_map(path) as source:
+                table = pa.ipc.open_file(source).read_all()
+                meta = json.loads(table.schema.metadata[_META_KEY])
+                if meta.get("key") != repr(key):  # sha1 冲突
+                    return None
+                value = table.to_pandas()
+            return value, meta["timestamp"], meta["ttl"], meta.get("stale_ttl", 0)
+        except Exception as e:
+            logger.warning(f"读取磁盘缓存 {path} 失败：{str(e)}")
+            self._remove(path)
+            return None
+
+    def set(self, key, value, ttl, timestamp=None, stale_ttl=0):
+        if not self.supports(value):
+            return False
+        path = self.path_for(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        meta = {
+            "key": repr(key),
+            "name": key[0],
+            "timestamp": timestamp if timestamp is not None else time.time(),
+            "ttl": ttl,
+            "stale_ttl": stale_ttl,
+        }
+        try:
+            table = pa.Table.from_pandas(value)
+            table = table.replace_schema_metadata(
+                {**(table.schema.metadata or {}), _META_KEY: json.dumps(meta)}
+            )
+            with pa.OSFile(tmp_path, "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(tmp_path, path)  # 原子替换
+            return True
+        except Exception as e:
+            logger.warning(f"写入磁盘缓存 {key[0]} 失败：{str(e)}")
+            self._remove(tmp_path)
+            return False
+
+    def pop(self, key):
+        self._remove(self.path_for(key))
+
+    def clear(self):
+        for filename in os.listdir(self.directory):
+            if filename.endswith((".arrow", ".tmp")):
+                self._remove(os.path.join(self.directory, filename))
+
+    def purge_expired(self, now=None):
+        """删除已过期的缓存文件，只读取 schema 元数据，不加载数据。"""
+        now = now if now is not None else time.time()
+        removed = 0
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(".arrow"):
+                continue
+            path = os.path.join(self.directory, filename)
+            try:
+                with pa.memory_map(path) as source:
+                    schema = pa.ipc.open_file(source).schema
+                meta = json.loads(schema.metadata[_META_KEY])
+                expired = now - meta["timestamp"] >= meta["ttl"] + meta.get(
+                    "stale_ttl", 0
+                )
+            except Exception:
+                expired = True
+            if expired:
+                self._remove(path)
+                removed += 1
+        return removed
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,116 @@
+from datetime import datetime
+
+import pytz
+from helpers import market_time_helper
+
+# 各类数据在交易时段内的缓存有效期（秒）
+REALTIME_TTL = 60
+INTRADAY_TTL = 300
+DAILY_TTL = 600
+CALENDAR_TTL = 86400
+
+# 收盘后行情和日线数据仍可能在更新，这段时间内按交易时段处理（秒）
+SETTLE_SECONDS = 1800
+# 开盘前集合竞价阶段（09:15 起）实时行情会变化，这段时间内按交易时段处理（秒）
+AUCTION_SECONDS = 900
+
+
+class MarketTTL:
+    """
+    根据市场时钟计算某一类数据的缓存有效期。
+
+    kind:
+        "realtime": 实时行情。交易时段、集合竞价和收盘后半小时内 open_ttl 秒；
+            午休缓存到下午开盘，收盘后、非交易日缓存到下一次集合竞价开始
+        "intraday": 分钟线。同 realtime，但交易时段内默认有效期更长
+        "daily": 日线历史。交易时段及收盘后半小时内 open_ttl 秒，其余时间缓存到下一次开盘
+        "calendar": 交易日历等每天最多变化一次的数据，固定缓存一天
+    """
+
+    DEFAULT_OPEN_TTL = {
+        "realtime": REALTIME_TTL,
+        "intraday": INTRADAY_TTL,
+        "daily": DAILY_TTL,
+        "calendar": CALENDAR_TTL,
+    }
+
+    def __init__(self, kind, open_ttl=None, helper=None):
+        if kind not in self.DEFAULT_OPEN_TTL:
+            raise ValueError(f"未知的缓存策略类型: {kind}")
+        self.kind = kind
+        self.open_ttl = open_ttl or self.DEFAULT_OPEN_TTL[kind]
+        self.helper = helper or market_time_helper
+
+    def __call__(self, name=None, now=None):
+        if self.kind == "calendar":
+            return self.open_ttl
+
+        now = now or datetime.now(pytz.timezone("Asia/Shanghai"))
+        phase = self.helper.market_phase(now)
+        if phase in ("morning", "afternoon"):
+            return self.open_ttl
+
+        seconds_until_open = self.helper.seconds_until_next_open(now)
+        local_now = now.astimezone(self.helper.tz)
+        if phase == "closed" and self.helper.is_trading_day(local_now.date()):
+            _, _, _, market_close_time = self.helper._get_market_times(local_now)
+            seconds_after_close = (now - market_close_time).total_seconds()
+            if 0 <= seconds_after_close < SETTLE_SECONDS:
+                return self.open_ttl
+        elif phase == "pre_open" and self.kind == "realtime":
+            if seconds_until_open <= AUCTION_SECONDS:
+                return self.open_ttl
+
+        if self.kind == "realtime" and phase != "lunch":
+            # 下一次开盘前有集合竞价，实时行情只缓存到竞价开始
+            return max(seconds_until_open - AUCTION_SECONDS, 1)
+
+        # 休市期间数据不会变化，缓存到下一次开盘；至少保留一个交易时段的有效期
+        return max(self.open_ttl, seconds_until_open)
+
+
+class TTLPolicy:
+    """
+    按函数名查表得到缓存有效期，供 CacheWrapper(ttl_policy=...) 使用。
+
+    rules 的值可以是 MarketTTL 的类型名、MarketTTL 实例或固定秒数；
+    表中没有的函数返回 default（None 表示使用 CacheWrapper 的 cache_time）。
+    """
+
+    def __init__(self, rules, default=None):
+        self.rules = {
+            name: MarketTTL(rule) if isinstance(rule, str) else rule
+            for name, rule in rules.items()
+        }
+        self.default = default
+
+    def __call__(self, name, now=None):
+        rule = self.rules.get(name, self.default)
+        if callable(rule):
+            return rule(name, now)
+        return rule
+
+
+def market_ttl(kind, open_ttl=None):
+    """返回单一类型的市场时钟策略，便于给 cached 装饰的函数使用。"""
+    return MarketTTL(kind, open_ttl)
+
+
+AKSHARE_TTL_POLICY = TTLPolicy(
+    {
+        # 实时行情
+        "stock_zh_a_spot_em": "realtime",
+        "stock_zh_index_spot_em": "realtime",
+        "option_value_analysis_em": "realtime",
+        "stock_board_concept_name_em": "realtime",
+        "stock_board_concept_cons_em": "realtime",
+        "stock_zt_pool_em": "realtime",
+        # 分钟线
+        "stock_zh_a_minute": "intraday",
+        # 日线历史
+        "stock_zh_index_daily_em": "daily",
+        "index_zh_a_hist": "daily",
+        # 交易日历
+        "tool_trade_date_hist_sina": "calendar",
+    }
+)
@@ -0,0 +1,125 @@
+import threading
+
+# 上游调用耗时直方图的桶上界（秒），最后一个桶收集超过 30 秒的调用
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class FunctionStats:
+    __slots__ = (
+        "hits",
+        "stale_hits",
+        "disk_hits",
+        "misses",
+        "upstream_calls",
+        "errors",
+        "evictions",
+        "latency_total",
+        "latency_max",
+        "latency_buckets",
+    )
+
+    def __init__(self):
+        self.hits = 0
+        self.stale_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.upstream_calls = 0
+        self.errors = 0
+        self.evictions = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+
+class CacheStats:
+    """
+    按函数名统计缓存命中、未命中、返回旧值、淘汰次数以及上游调用耗时。
+
+    - hits: 内存缓存命中
+    - stale_hits: 返回了过期旧值（并触发后台刷新）
+    - disk_hits: 内存未命中但磁盘缓存命中
+    - misses: 需要等待加载的调用（包括合并到同一次上游请求的并发调用）
+    - upstream_calls / errors: 实际发往上游的请求次数及其中失败的次数
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _get(self, name):
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = FunctionStats()
+        return stats
+
+    def record(self, name, field):
+        with self._lock:
+            stats = self._get(name)
+            setattr(stats, field, getattr(stats, field) + 1)
+
+    def record_upstream(self, name, seconds, error=False):
+        bucket = len(LATENCY_BUCKETS)
+        for i, upper in enumerate(LATENCY_BUCKETS):
+            if seconds <= upper:
+                bucket = i
+                break
+        with self._lock:
+            stats = self._get(name)
+            stats.upstream_calls += 1
+            stats.errors += int(error)
+            stats.latency_total += seconds
+            stats.latency_max = max(stats.latency_max, seconds)
+            stats.latency_buckets[bucket] += 1
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def snapshot(self, usage=None):
+        """
+        返回每个函数一行的统计数据（list[dict]）。
+
+        参数:
+            usage (dict): 可选，{函数名: (条目数, 字节数)}，来自 CacheStore.usage()
+        """
+        usage = usage or {}
+        rows = []
+        with self._lock:
+            names = set(self._stats) | set(usage)
+            for name in sorted(names):
+                stats = self._stats.get(name) or FunctionStats()
+                entries, nbytes = usage.get(name, (0, 0))
+                lookups = stats.hits + stats.stale_hits + stats.disk_hits + stats.misses
+                rows.append(
+                    {
+                        "函数": name,
+                        "命中": stats.hits,
+                        "旧值命中": stats.stale_hits,
+                        "磁盘命中": stats.disk_hits,
+                        "未命中": stats.misses,
+                        "命中率": (
+                            (stats.hits + stats.stale_hits + stats.disk_hits) / lookups
+                            if lookups
+                            else None
+                        ),
+                        "上游调用": stats.upstream_calls,
+                        "上游失败": stats.errors,
+                        "淘汰": stats.evictions,
+                        "缓存条目": entries,
+                        "占用字节": nbytes,
+                        "平均耗时": (
+                            stats.latency_total / stats.upstream_calls
+                            if stats.upstream_calls
+                            else None
+                        ),
+                        "最大耗时": stats.latency_max,
+                        "耗时分布": dict(
+                            zip(bucket_labels(), list(stats.latency_buckets))
+                        ),
+                    }
+                )
+        return rows
+
+
+def bucket_labels():
+    return [f"≤{upper}s" for upper in LATENCY_BUCKETS] + [f">{LATENCY_BUCKETS[-1]}s"]
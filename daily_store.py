@@ -0,0 +1,280 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import akshare
+import numpy as np
+import pandas as pd
+from akcache import AKSHARE_TTL_POLICY, CacheWrapper
+from helpers import market_time_helper
+from log import logger
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow 是可选依赖，缺失时只在内存中保存日线
+    pa = None
+    pq = None
+
+# 第一次获取时回补的历史长度（天）
+BACKFILL_DAYS = 365 * 6
+# 上游更新失败后至少间隔这么久（秒）才重试，期间使用本地已有的数据
+RETRY_INTERVAL = 600
+
+ak = CacheWrapper(akshare, cache_time=180, ttl_policy=AKSHARE_TTL_POLICY)
+
+
+def index_symbol(code):
+    """
+    给指数代码加上交易所前缀：399 开头的深证指数为 sz，其余（000 开头的上证指数和
+    中证指数，如 000300 沪深300、000852 中证1000、000015 红利指数）由上交所发布，为 sh。
+    """
+    return f"sz{code}" if code.startswith("399") else f"sh{code}"
+
+
+class DailyBars:
+    """
+    一个指数的日 K 线（只包含已收盘的交易日），附带前缀和，任意 N 日统计都是 O(1)。
+
+    参数:
+        df (pd.DataFrame): 列 date、open、close、high、low、volume、amount，按日期升序
+    """
+
+    def __init__(self, df):
+        self.frame = df.reset_index(drop=True)
+        self.dates = self.frame["date"].to_numpy(dtype="datetime64[D]")
+        self.close = self.frame["close"].to_numpy(dtype=np.float64)
+        self.amount = self.frame["amount"].to_numpy(dtype=np.float64)
+        # amount_prefix[i] 为前 i 个交易日的成交额之和
+        self.amount_prefix = np.concatenate([[0.0], np.cumsum(self.amount)])
+        for array in (self.dates, self.close, self.amount, self.amount_prefix):
+            array.flags.writeable = False
+
+    def __len__(self):
+        return len(self.dates)
+
+    def _end(self, before):
+        # before 之前（不含）的交易日数量；before 为 None 时为全部
+        if before is None:
+            return len(self.dates)
+        return int(np.searchsorted(self.dates, np.datetime64(before, "D"), side="left"))
+
+    def mean_amount(self, n, before=None):
+        """before 之前（不含）最近 n 个交易日的平均成交额，数据不足 n 天时按已有天数计算。"""
+        end = self._end(before)
+        start = max(0, end - n)
+        if end == start:
+            return 0.0
+        return (self.amount_prefix[end] - self.amount_prefix[start]) / (end - start)
+
+    def returns(self, n, before=None):
+        """before 之前（不含）最后一个交易日相对 n 个交易日前的收益率，数据不足时返回 NaN。"""
+        end = self._end(before)
+        if end - 1 - n < 0:
+            return float("nan")
+        return self.close[end - 1] / self.close[end - 1 - n] - 1
+
+    def rolling_returns(self, n):
+        """每个交易日的 n 日收益率（pd.Series，以日期为索引），前 n 天为 NaN。"""
+        returns = np.full(len(self.close), np.nan)
+        returns[n:] = self.close[n:] / self.close[:-n] - 1
+        return pd.Series(returns, index=pd.DatetimeIndex(self.dates))
+
+    def tail(self, n):
+        return self.frame.tail(n).reset_index(drop=True)
+
+
+class DailyBarStore:
+    """
+    指数日 K 线的本地增量存储，每个指数一个 Parquet 文件（directory/<symbol>.parquet）。
+
+    每天最多向上游请求一次，且只请求本地最后一个交易日之后的数据；上游失败时使用本地数据，
+    RETRY_INTERVAL 秒后再重试。只保存已收盘的交易日，盘中未走完的当日 K 线不入库，
+    需要时由 get(include_today=True) 临时附加。
+
+    参数:
+        directory (str): 存储目录
+        helper: MarketTimeHelper，用于确定最近一个已收盘的交易日
+    """
+
+    def __init__(self, directory, helper=None):
+        self.directory = directory
+        self.helper = helper or market_time_helper
+        self._bars = {}  # symbol -> DailyBars
+        self._checked = {}  # symbol -> 最近一次确认数据完整时的收盘日
+        self._retry_at = {}  # symbol -> 上游失败后允许重试的时间
+        self._lock = threading.Lock()
+        if pq is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, symbol):
+        return os.path.join(self.directory, f"{symbol}.parquet")
+
+    def _read(self, symbol):
+        path = self._path(symbol)
+        if pq is None or not os.path.exists(path):
+            return None
+        try:
+            return pq.read_table(path).to_pandas()
+        except Exception as e:
+            logger.warning(f"读取日线 {path} 失败：{str(e)}")
+            return None
+
+    def _write(self, symbol, df):
+        if pq is None:
+            return
+        path = self._path(symbol)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"保存日线 {path} 失败：{str(e)}")
+
+    @staticmethod
+    def _normalize(df):
+        df = df.copy()
+        df["date"] = pd.to_datetime(df["date"]).dt.normalize()
+        for column in df.columns:
+            if column != "date":
+                df[column] = pd.to_numeric(df[column], errors="coerce")
+        return df
+
+    def get(self, symbol, fetch, now=None, include_today=False):
+        """
+        返回 symbol 的 DailyBars，必要时先从上游补齐。
+
+        参数:
+            fetch (callable): fetch(start_date) 返回 start_date（"YYYYMMDD"）之后的日 K 线；
+                为 None 时只使用本地已有的数据，不请求上游（回放模式）
+            include_today (bool): 盘中是否附加当天尚未收盘的 K 线（不入库）
+        """
+        bars = self._closed_bars(symbol, fetch, now)
+        if include_today and fetch is not None:
+            bars = self._with_today(symbol, bars, fetch, now)
+        return bars
+
+    def _with_today(self, symbol, bars, fetch, now):
+        now = now or datetime.now(self.helper.tz)
+        today = now.astimezone(self.helper.tz).date()
+        if (
+            not self.helper.is_trading_day(today)
+            or self.helper.market_phase(now) == "pre_open"
+            or (len(bars) and bars.dates[-1] >= np.datetime64(today, "D"))
+        ):
+            return bars
+        try:
+            new = self._normalize(fetch(today.strftime("%Y%m%d")))
+        except Exception as e:
+            logger.error(f"获取指数 {symbol} 当天行情时发生错误：{str(e)}")
+            return bars
+        new = new[new["date"].dt.date == today]
+        if new.empty:
+            return bars
+        return DailyBars(pd.concat([bars.frame, new.tail(1)], ignore_index=True))
+
+    def _closed_bars(self, symbol, fetch, now):
+        if fetch is None:
+            with self._lock:
+                if symbol not in self._bars:
+                    df = self._read(symbol)
+                    if df is None or df.empty:
+                        raise ValueError(f"本地没有指数 {symbol} 的日线数据")
+                    self._bars[symbol] = DailyBars(df)
+                return self._bars[symbol]
+
+        now = now or datetime.now(self.helper.tz)
+        last_close_day = self.helper.last_market_close(now).date()
+        if self._up_to_date(symbol, last_close_day):
+            return self._bars[symbol]
+
+        with self._lock:
+            if self._up_to_date(symbol, last_close_day):
+                return self._bars[symbol]
+
+            if symbol in self._bars:
+                df = self._bars[symbol].frame
+            else:
+                df = self._read(symbol)
+            last = df["date"].iloc[-1].date() if df is not None and len(df) else None
+            if last is None or last < last_close_day:
+                start = (
+                    last + timedelta(days=1)
+                    if last is not None
+                    else now.date() - timedelta(days=BACKFILL_DAYS)
+                )
+                try:
+                    new = self._normalize(fetch(start.strftime("%Y%m%d")))
+                    new = new[new["date"].dt.date <= last_close_day]
+                    if last is not None:
+                        new = new[new["date"].dt.date > last]
+                    added = len(new)
+                    if added:
+                        if df is not None:
+                            new = pd.concat([df, new], ignore_index=True)
+                        df = new.drop_duplicates("date", keep="last").sort_values("date")
+                        self._write(symbol, df)
+                        logger.info(f"日线 {symbol} 新增 {added} 条")
+                    # 上游还没有最近一个交易日的数据时，下次调用再试
+                    if df is not None and df["date"].iloc[-1].date() >= last_close_day:
+                        self._checked[symbol] = last_close_day
+                except Exception as e:
+                    logger.error(f"更新日线 {symbol} 时发生错误：{str(e)}")
+                    if df is None:
+                        raise
+                    # 先使用本地数据，过一段时间再重试，避免每次调用都请求上游
+                    self._retry_at[symbol] = time.time() + RETRY_INTERVAL
+            else:
+                self._checked[symbol] = last_close_day
+
+            if df is None or df.empty:
+                raise ValueError(f"没有指数 {symbol} 的日线数据")
+            self._bars[symbol] = DailyBars(df)
+            return self._bars[symbol]
+
+
+    def _up_to_date(self, symbol, last_close_day):
+        # 已确认包含最近一个收盘日，或上游失败后还没到重试时间
+        return self._checked.get(symbol) == last_close_day or (
+            symbol in self._bars and time.time() < self._retry_at.get(symbol, 0)
+        )
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_daily_store(directory=None):
+    """
+    返回进程内 directory 对应的 DailyBarStore（页面 rerun 后仍是同一个实例）。
+    默认目录为 DAILY_STORE_DIR，或 AKCACHE_DIR 下的 daily。
+    """
+    directory = directory or os.environ.get(
+        "DAILY_STORE_DIR",
+        os.path.join(os.environ.get("AKCACHE_DIR", ".akcache"), "daily"),
+    )
+    with _stores_lock:
+        if directory not in _stores:
+            _stores[directory] = DailyBarStore(directory)
+        return _stores[directory]
+
+
+def get_index_daily(symbol, offline=False, include_today=False):
+    """
+    返回指数（如 "sh000001"、"sz399006"、"sh000300"，见 index_symbol）已收盘交易日的
+    DailyBars。
+
+    数据来自 ak.stock_zh_index_daily_em，本地增量保存，每天最多更新一次；
+    include_today=True 时盘中附加当天尚未收盘的 K 线（按日线缓存有效期更新）；
+    offline=True 时只读本地数据。
+    """
+    if offline:
+        return get_daily_store().get(symbol, None)
+
+    def fetch(start_date):
+        return ak.stock_zh_index_daily_em(
+            symbol=symbol, start_date=start_date, end_date="20500101"
+        )
+
+    return get_daily_store().get(symbol, fetch, include_today=include_today)
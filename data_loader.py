@@ -1,6 +1,19 @@
-import akshare as ak
+import os
+import time
+import akshare
 import pandas as pd
 import streamlit as st
+from akcache import AKSHARE_TTL_POLICY, CacheWrapper
+from minute_bars import get_minute_bar_builder, get_minute_bar_feeder
+
+# 与 streamlit/main.py 使用相同的缓存目录和后端，两个应用共享 akshare 结果
+ak = CacheWrapper(
+    akshare,
+    cache_time=180,
+    ttl_policy=AKSHARE_TTL_POLICY,
+    disk_dir=os.environ.get("AKCACHE_DIR", ".akcache"),
+    disk_backend=os.environ.get("AKCACHE_BACKEND", "arrow"),
+)
 
 # Use Streamlit's caching to avoid frequent API calls
 @st.cache_data(ttl=300)
@@ -35,10 +48,40 @@ def get_all_market_spot_data():
     Contains Volume Ratio, Market Cap, etc.
     """
     try:
-        return ak.stock_zh_a_spot_em()
+        df = ak.stock_zh_a_spot_em()
     except Exception as e:
         print(f"Error fetching global spot data: {e}")
         return pd.DataFrame()
+    return df
+
+def _fetch_spot_snapshot():
+    """
+    Fetch one spot snapshot for the minute bar feeder.
+    Calls akshare directly: the shared cache keeps realtime quotes for longer
+    than the feeder's poll interval, so reading through it would feed the same
+    snapshot twice and leave gaps in the bars.
+    Returns:
+        tuple: (pd.DataFrame, fetch timestamp)
+    """
+    return akshare.stock_zh_a_spot_em(), time.time()
+
+def start_minute_bar_feed():
+    """
+    Start the background thread that feeds spot snapshots into the minute bar builder.
+    Runs independently of page reruns and st.cache_data; safe to call on every rerun.
+    """
+    feeder = get_minute_bar_feeder()
+    feeder.configure(_fetch_spot_snapshot)
+    feeder.start()
+
+def get_minute_bars():
+    """
+    Today's 1-minute OHLCV bars for every stock, built from spot snapshots
+    by the background feeder (see start_minute_bar_feed).
+    Returns:
+        MinuteBarBuilder: query with recent(), closes(), amount_by_minute(), stock_bars()
+    """
+    return get_minute_bar_builder()
 
 def get_sector_cons_single(sector_name):
     """
@@ -1,10 +1,17 @@
 import pytz
-from datetime import datetime
+from datetime import datetime, timedelta
+
+from trade_calendar import trade_calendar
+
+# 收盘后这段时间（秒）内仍需要获取行情：收盘集合竞价的成交在 15:00 之后才出现在行情中；
+# 更晚的快照包含盘后固定价格交易（15:05 起），不再计入当天的盘中数据
+CLOSE_GRACE_SECONDS = 180
 
 
 class MarketTimeHelper:
-    def __init__(self, timezone="Asia/Shanghai"):
+    def __init__(self, timezone="Asia/Shanghai", calendar=None):
         self.tz = pytz.timezone(timezone)
+        self.calendar = calendar or trade_calendar
 
     def during_market_time(self, current_time):
         current_time_gmt8 = current_time.astimezone(self.tz)
@@ -31,6 +38,94 @@ class MarketTimeHelper:
             delta = current_time_gmt8 - lunch_end_time
             return 120 + int(delta.total_seconds() // 60)
 
+    def is_trading_day(self, day):
+        """判断某个日期是否为交易日（按交易日历，日历不可用时仅排除周末）。"""
+        return self.calendar.is_trade_date(day)
+
+    def market_phase(self, current_time):
+        """
+        返回当前所处的交易时段。
+
+        返回:
+            str: "pre_open"（开盘前）、"morning"（上午交易）、"lunch"（午间休市）、
+                "afternoon"（下午交易）或 "closed"（收盘后及非交易日）。
+        """
+        current_time_gmt8 = current_time.astimezone(self.tz)
+        if not self.is_trading_day(current_time_gmt8.date()):
+            return "closed"
+        market_open_time, lunch_start_time, lunch_end_time, market_close_time = (
+            self._get_market_times(current_time_gmt8)
+        )
+
+        if current_time_gmt8 < market_open_time:
+            return "pre_open"
+        elif current_time_gmt8 < lunch_start_time:
+            return "morning"
+        elif current_time_gmt8 < lunch_end_time:
+            return "lunch"
+        elif current_time_gmt8 < market_close_time:
+            return "afternoon"
+        else:
+            return "closed"
+
+    def next_market_open(self, current_time):
+        """
+        返回下一次开盘（含午后开盘）的时间；正在交易时返回当前时间。
+        """
+        current_time_gmt8 = current_time.astimezone(self.tz)
+        phase = self.market_phase(current_time_gmt8)
+        market_open_time, _, lunch_end_time, _ = self._get_market_times(
+            current_time_gmt8
+        )
+
+        if phase in ("morning", "afternoon"):
+            return current_time_gmt8
+        elif phase == "pre_open":
+            return market_open_time
+        elif phase == "lunch":
+            return lunch_end_time
+
+        day = current_time_gmt8.date() + timedelta(days=1)
+        while not self.is_trading_day(day):
+            day += timedelta(days=1)
+        return self.tz.localize(
+            datetime.combine(day, datetime.strptime("09:30", "%H:%M").time())
+        )
+
+    def last_market_close(self, current_time):
+        """
+        返回 current_time 之前（含）最近一次收盘的时间，即最近一个已完整结束的交易日的 15:00。
+        """
+        current_time_gmt8 = current_time.astimezone(self.tz)
+        _, _, _, market_close_time = self._get_market_times(current_time_gmt8)
+        day = current_time_gmt8.date()
+        if not (self.is_trading_day(day) and current_time_gmt8 >= market_close_time):
+            day -= timedelta(days=1)
+            while not self.is_trading_day(day):
+                day -= timedelta(days=1)
+        return self.tz.localize(
+            datetime.combine(day, datetime.strptime("15:00", "%H:%M").time())
+        )
+
+    def seconds_after_close(self, current_time):
+        """交易日距最近一次收盘（15:00）经过的秒数，非交易日返回 None。"""
+        current_time_gmt8 = current_time.astimezone(self.tz)
+        if not self.is_trading_day(current_time_gmt8.date()):
+            return None
+        last_close = self.last_market_close(current_time_gmt8)
+        return (current_time_gmt8 - last_close).total_seconds()
+
+    def in_close_grace(self, current_time):
+        """是否处于收盘后 CLOSE_GRACE_SECONDS 秒内（收盘集合竞价结果仍在更新）。"""
+        if self.market_phase(current_time) != "closed":
+            return False
+        after_close = self.seconds_after_close(current_time)
+        return after_close is not None and after_close < CLOSE_GRACE_SECONDS
+
+    def seconds_until_next_open(self, current_time):
+        delta = self.next_market_open(current_time) - current_time.astimezone(self.tz)
+        return max(0, int(delta.total_seconds()))
+
     def _get_market_times(self, current_time_gmt8):
         market_open_time = self.tz.localize(
             datetime.combine(
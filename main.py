@@ -4,6 +4,10 @@ import data_loader
 import logic
 import red
 from qingx import qingxu
+from akcache import enable_copy_on_write
+
+# 缓存返回的 DataFrame 浅拷贝依赖 pandas 的 Copy-on-Write，进程启动时开启一次
+enable_copy_on_write()
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -280,6 +284,8 @@ def main():
                     # 2-Column Layout for "Dragons" vs "Laggards"
                     # This allows seeing Leaders and Followers side-by-side (One Page concept)
                 c1,c2,c3= st.columns([1,1.4,1])
+                # 1-minute bars built from spot snapshots (no per-stock minute API calls)
+                bars = data_loader.get_minute_bars()
                 # --- Column 1: Leaders ---
                 with c1:
                     st.markdown("### 🐲龙头梯队")
@@ -289,21 +295,37 @@ def main():
                     if not k13.empty:
                         dragons_disp = k13.copy()
                         dragons_disp['总市值'] = dragons_disp['总市值'] / 100_000_000
+                        recent = bars.recent(dragons_disp['代码'], minutes=5)
+                        dragons_disp['5分钟涨幅'] = recent['5分钟涨幅'].to_numpy()
+                        dragons_disp['分时'] = bars.closes(dragons_disp['代码'], minutes=60)
 
                         st.dataframe(
-                            dragons_disp[['名称', '最新价', '涨跌幅', '总市值']],
+                            dragons_disp[['名称', '最新价', '涨跌幅', '5分钟涨幅', '分时', '总市值']],
                             height=400,  # Fixed height to align
                             use_container_width=True,
                             hide_index=True,
                             column_config={
                                 "涨跌幅": st.column_config.NumberColumn(format="%.2f%%"),
+                                "5分钟涨幅": st.column_config.NumberColumn(format="%.2f%%"),
+                                "分时": st.column_config.LineChartColumn(label="近60分钟"),
                                 "总市值": st.column_config.NumberColumn(label="市值(亿)", format="%.1f"),
                                 "最新价": st.column_config.NumberColumn(format="%.2f"),
                             }
                         )
                     else:
                         st.caption("无")
+                # --- Column 2: Sector minute amount ---
+                with c2:
+                    st.markdown("### ⏱️板块分钟成交")
+                    sector_amount = bars.amount_by_minute(k9['代码'])
+                    if len(sector_amount) >= 2:
+                        st.caption(f"最近5分钟成交额 {sector_amount.tail(5).sum() / 1e8:.2f} 亿")
+                        st.bar_chart(sector_amount / 1e8, height=300, y_label="成交额(亿)")
+                    else:
+                        st.caption("开盘后积累几分钟快照即可显示")
 
 
 if __name__ == "__main__":
+    # Build minute bars in a background thread, independent of page reruns
+    data_loader.start_minute_bar_feed()
     main()
@@ -0,0 +1,382 @@
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from helpers import market_time_helper
+from log import logger
+
+# 每个交易日的 1 分钟 K 线数量：上午 120 根，下午 120 根
+BARS_PER_DAY = 240
+# K 线字段
+BAR_FIELDS = ["开盘", "最高", "最低", "收盘", "成交量", "成交额"]
+OPEN, HIGH, LOW, CLOSE, VOLUME, AMOUNT = range(len(BAR_FIELDS))
+
+
+def bar_label(bar):
+    """K 线的结束时刻（HH:MM），第 0 根为 09:31，第 119 根为 11:30，第 120 根为 13:01。"""
+    minutes_of_day = 9 * 60 + 31 + bar + (90 if bar >= 120 else 0)
+    return f"{minutes_of_day // 60:02d}:{minutes_of_day % 60:02d}"
+
+
+class MinuteBarBuilder:
+    """
+    由连续的全市场实时行情快照增量合成所有股票的 1 分钟 OHLCV。
+
+    每份快照一次向量化更新全部股票：最新价更新当前 K 线的开高低收，
+    成交量、成交额取与上一份快照累计值的差。股票按代码分配固定编号，
+    K 线保存在预分配的 (240, 股票, 字段) float32 数组中，新的交易日开始时清空。
+
+    注意:
+        - 某分钟内没有快照时该分钟没有 K 线，这段时间的成交量计入下一根有快照的 K 线；
+        - 每只股票的第一份快照只作为累计值的起点，不计入成交量；
+        - K 线的精度取决于快照频率，快照间隔 30 秒时每根 K 线最多由两份快照合成。
+
+    参数:
+        max_stocks (int): 初始容纳的股票数，超出时自动扩容
+        helper: MarketTimeHelper，用于把快照时间换算为 K 线序号
+    """
+
+    def __init__(self, max_stocks=6000, helper=None):
+        self.helper = helper or market_time_helper
+        self.bars = np.full(
+            (BARS_PER_DAY, max_stocks, len(BAR_FIELDS)), np.nan, dtype=np.float32
+        )
+        # 累计成交量 / 成交额用 float64 保存，保证差值的精度
+        self.last_volume = np.full(max_stocks, np.nan)
+        self.last_amount = np.full(max_stocks, np.nan)
+        self.current_bar = np.full(max_stocks, -1, dtype=np.int32)
+        self.codes = []
+        self.names = []
+        self._index = {}  # 代码 -> 股票编号
+        self._last_codes = None  # (代码数组, 编号数组)，股票列表不变时复用
+        self.day = None
+        self.latest_bar = -1
+        self.version = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _grow(self, size):
+        capacity = self.bars.shape[1]
+        if size <= capacity:
+            return
+        capacity = max(size, capacity * 3 // 2)
+        bars = np.full(
+            (BARS_PER_DAY, capacity, len(BAR_FIELDS)), np.nan, dtype=np.float32
+        )
+        bars[:, : self.bars.shape[1]] = self.bars
+        self.bars = bars
+        for name, fill in (
+            ("last_volume", np.nan),
+            ("last_amount", np.nan),
+            ("current_bar", -1),
+        ):
+            old = getattr(self, name)
+            new = np.full(capacity, fill, dtype=old.dtype)
+            new[: len(old)] = old
+            setattr(self, name, new)
+
+    def _stock_ids(self, codes, names):
+        cached = self._last_codes
+        if cached is not None and np.array_equal(cached[0], codes):
+            return cached[1]
+        ids = np.empty(len(codes), dtype=np.int64)
+        for i, code in enumerate(codes):
+            idx = self._index.get(code)
+            if idx is None:
+                idx = self._index[code] = len(self.codes)
+                self.codes.append(code)
+                self.names.append(names[i])
+            ids[i] = idx
+        self._grow(len(self.codes))
+        self._last_codes = (codes.copy(), ids)
+        return ids
+
+    def bar_of(self, timestamp):
+        """
+        返回快照时间所属的 K 线序号（0 ~ 239）；开盘前、非交易日和收盘
+        CLOSE_GRACE_SECONDS 秒之后返回 None。
+        午休期间的快照计入上午最后一根，刚收盘时的快照计入最后一根。
+        """
+        now = datetime.fromtimestamp(timestamp, self.helper.tz)
+        if not self.helper.is_trading_day(now.date()):
+            return None
+        phase = self.helper.market_phase(now)
+        if phase == "pre_open":
+            return None
+        if phase == "lunch":
+            return BARS_PER_DAY // 2 - 1
+        if phase == "closed":
+            return BARS_PER_DAY - 1 if self.helper.in_close_grace(now) else None
+        return min(self.helper.minutes_since_market_open(now), BARS_PER_DAY - 1)
+
+    def update(self, df, timestamp):
+        """
+        用一份全市场行情快照更新所有股票的当前 K 线。
+
+        参数:
+            df (pd.DataFrame): ak.stock_zh_a_spot_em() 的结果，需要 代码、名称、最新价、
+                成交量、成交额 列
+            timestamp (float): 快照的获取时间戳
+
+        返回:
+            int: 更新的 K 线序号；未更新（开盘前、非交易日、旧快照）时返回 None
+        """
+        if df is None or df.empty:
+            return None
+        bar = self.bar_of(timestamp)
+        if bar is None:
+            return None
+        day = datetime.fromtimestamp(timestamp, self.helper.tz).date()
+
+        codes = df["代码"].astype(str).to_numpy()
+        names = df["名称"].astype(str).to_numpy()
+        price = pd.to_numeric(df["最新价"], errors="coerce").to_numpy(np.float64)
+        volume = pd.to_numeric(df["成交量"], errors="coerce").to_numpy(np.float64)
+        amount = pd.to_numeric(df["成交额"], errors="coerce").to_numpy(np.float64)
+
+        with self._lock:
+            if day != self.day:
+                # 新的交易日，清空昨天的 K 线和累计值（股票编号保持不变）
+                self.bars.fill(np.nan)
+                self.last_volume.fill(np.nan)
+                self.last_amount.fill(np.nan)
+                self.current_bar.fill(-1)
+                self.day = day
+                self.latest_bar = -1
+                self.version = None
+            elif self.version is not None and timestamp <= self.version:
+                return None  # 已经合成过的快照（缓存命中）或更旧的快照
+
+            ids = self._stock_ids(codes, names)
+            # 停牌等没有价格的股票不更新
+            valid = ~np.isnan(price) & (price > 0)
+            ids, price = ids[valid], price[valid]
+            volume, amount = volume[valid], amount[valid]
+
+            # 成交量、成交额的增量；第一份快照只作为起点，累计值回落时按 0 处理
+            delta_volume = np.nan_to_num(
+                np.maximum(volume - self.last_volume[ids], 0), nan=0.0
+            )
+            delta_amount = np.nan_to_num(
+                np.maximum(amount - self.last_amount[ids], 0), nan=0.0
+            )
+            self.last_volume[ids] = np.where(
+                np.isnan(volume), self.last_volume[ids], volume
+            )
+            self.last_amount[ids] = np.where(
+                np.isnan(amount), self.last_amount[ids], amount
+            )
+
+            bars = self.bars[bar]
+            new = self.current_bar[ids] != bar
+            started = ids[new]
+            bars[started, OPEN] = price[new]
+            bars[started, HIGH] = price[new]
+            bars[started, LOW] = price[new]
+            bars[started, VOLUME] = 0
+            bars[started, AMOUNT] = 0
+            self.current_bar[started] = bar
+
+            bars[ids, HIGH] = np.fmax(bars[ids, HIGH], price)
+            bars[ids, LOW] = np.fmin(bars[ids, LOW], price)
+            bars[ids, CLOSE] = price
+            bars[ids, VOLUME] += delta_volume
+            bars[ids, AMOUNT] += delta_amount
+
+            self.latest_bar = max(self.latest_bar, bar)
+            self.version = timestamp
+        return bar
+
+    def stock_bars(self, code):
+        """
+        返回一只股票当天的 1 分钟 K 线，以结束时刻（HH:MM）为索引，只包含有数据的分钟；
+        没有该股票时返回空 DataFrame。
+        """
+        idx = self._index.get(str(code))
+        if idx is None or self.latest_bar < 0:
+            return pd.DataFrame(columns=BAR_FIELDS)
+        values = self.bars[: self.latest_bar + 1, idx]
+        present = ~np.isnan(values[:, CLOSE])
+        return pd.DataFrame(
+            values[present].astype(np.float64),
+            columns=BAR_FIELDS,
+            index=[bar_label(b) for b in np.flatnonzero(present)],
+        )
+
+    def _ids(self, codes):
+        return np.array(
+            [self._index.get(str(code), -1) for code in codes], dtype=np.int64
+        )
+
+    def closes(self, codes, minutes=60):
+        """
+        指定股票最近 minutes 分钟的收盘价（缺少 K 线的分钟沿用上一根），
+        每只股票一个 list，用于表格中的分时小图；没有数据的股票为空 list。
+        """
+        result = []
+        start = max(self.latest_bar + 1 - minutes, 0)
+        window = self.bars[start : self.latest_bar + 1, :, CLOSE]
+        for idx in self._ids(codes):
+            if idx < 0 or self.latest_bar < 0:
+                result.append([])
+                continue
+            series = pd.Series(window[:, idx]).ffill().dropna()
+            result.append([round(float(x), 3) for x in series])
+        return result
+
+    def recent(self, codes, minutes=5):
+        """
+        指定股票最近 minutes 根 K 线的汇总（一次向量化计算）。
+
+        返回:
+            pd.DataFrame: 以代码为索引，列 "{minutes}分钟涨幅"（%）、
+                "{minutes}分钟成交额"；数据不足时为 NaN
+        """
+        codes = [str(code) for code in codes]
+        ids = self._ids(codes)
+        change = np.full(len(ids), np.nan)
+        amount = np.full(len(ids), np.nan)
+        known = ids >= 0
+        if self.latest_bar >= 0 and known.any():
+            start = max(self.latest_bar + 1 - minutes, 0)
+            window = self.bars[start : self.latest_bar + 1][:, ids[known]]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                # 窗口内第一根 K 线的开盘价到最后一根的收盘价
+                first_open = _first_valid(window[:, :, OPEN])
+                last_close = _first_valid(window[::-1, :, CLOSE])
+                change[known] = (last_close / first_open - 1) * 100
+            amount[known] = np.nansum(window[:, :, AMOUNT], axis=0)
+        return pd.DataFrame(
+            {f"{minutes}分钟涨幅": change, f"{minutes}分钟成交额": amount},
+            index=pd.Index(codes, name="代码"),
+        )
+
+    def amount_by_minute(self, codes):
+        """
+        一组股票（如一个板块的成分股）每分钟的成交额合计，以结束时刻为索引。
+        """
+        ids = self._ids(codes)
+        ids = ids[ids >= 0]
+        if self.latest_bar < 0 or len(ids) == 0:
+            return pd.Series(dtype=np.float64, name="成交额")
+        values = self.bars[: self.latest_bar + 1][:, ids, AMOUNT]
+        present = ~np.isnan(values).all(axis=1)
+        totals = np.nansum(values, axis=1)[present]
+        return pd.Series(
+            totals.astype(np.float64),
+            index=[bar_label(b) for b in np.flatnonzero(present)],
+            name="成交额",
+        )
+
+
+def _first_valid(values):
+    # 每一列（股票）第一个非 NaN 的值，整列为 NaN 时为 NaN
+    valid = ~np.isnan(values)
+    first = valid.argmax(axis=0)
+    result = values[first, np.arange(values.shape[1])]
+    result[~valid.any(axis=0)] = np.nan
+    return result
+
+
+class MinuteBarFeeder:
+    """
+    在后台线程中定时获取全市场行情快照并写入 MinuteBarBuilder。
+
+    K 线的精度只取决于这里的获取频率，与页面是否打开、多久 rerun 一次以及
+    st.cache_data 的缓存无关。交易时段每 interval 秒获取一次；收盘后
+    CLOSE_GRACE_SECONDS 秒内继续获取以记录收盘集合竞价，午休再获取一次，
+    其余时间休眠到下一次开盘。
+
+    参数:
+        interval (int): 交易时段内的获取间隔（秒）
+        builder: MinuteBarBuilder，默认 get_minute_bar_builder()
+        helper: MarketTimeHelper，用于判断交易时段
+    """
+
+    def __init__(self, interval=30, builder=None, helper=None):
+        self.interval = interval
+        self.builder = builder
+        self.helper = helper or market_time_helper
+        self.fetch = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def configure(self, fetch):
+        """设置获取快照的无参函数，返回 (DataFrame, 获取时间戳)。页面每次 rerun 都可以调用。"""
+        with self._lock:
+            self.fetch = fetch
+
+    def feed_now(self):
+        """获取一份快照并写入 K 线，返回更新的 K 线序号（未更新时为 None）。"""
+        fetch = self.fetch
+        if fetch is None:
+            return None
+        df, timestamp = fetch()
+        builder = self.builder if self.builder is not None else get_minute_bar_builder()
+        return builder.update(df, timestamp)
+
+    def next_delay(self, now, was_trading):
+        """
+        返回距离下一次获取的秒数。
+
+        was_trading: 上一次获取是否在交易时段内；刚进入午休或收盘时立即再获取一次。
+        """
+        phase = self.helper.market_phase(now)
+        if phase in ("morning", "afternoon"):
+            return self.interval
+        if was_trading:
+            return 0
+        if self.helper.in_close_grace(now):
+            return self.interval
+        return max(self.interval, self.helper.seconds_until_next_open(now))
+
+    def start(self):
+        """启动后台线程，重复调用不会启动多个线程。"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="minute-bar-feeder", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            now = datetime.now(self.helper.tz)
+            was_trading = self.helper.market_phase(now) in ("morning", "afternoon")
+            try:
+                self.feed_now()
+            except Exception as e:
+                logger.error(f"合成分钟 K 线时发生错误：{str(e)}")
+            delay = self.next_delay(datetime.now(self.helper.tz), was_trading)
+            if self._stop.wait(delay):
+                return
+
+
+_builder = None
+_builder_lock = threading.Lock()
+
+
+def get_minute_bar_builder():
+    """返回进程内唯一的 MinuteBarBuilder（页面 rerun 后仍是同一个实例）。"""
+    global _builder
+    with _builder_lock:
+        if _builder is None:
+            _builder = MinuteBarBuilder()
+        return _builder
+
+
+_feeder = MinuteBarFeeder()
+
+
+def get_minute_bar_feeder():
+    """返回进程内唯一的 MinuteBarFeeder（页面 rerun 后仍是同一个实例）。"""
+    return _feeder
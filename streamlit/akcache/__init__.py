@@ -1,2 +1,24 @@
-from .akcache import CacheWrapper
-__all__ = ["CacheWrapper"]
\ No newline at end of file
+from .akcache import (
+    CacheWrapper,
+    cached,
+    clear_function_caches,
+    enable_copy_on_write,
+    get_cache_stats,
+    reset_cache_stats,
+)
+from .policy import AKSHARE_TTL_POLICY, MarketTTL, TTLPolicy, market_ttl
+from .registry import get_shared_cache
+
+__all__ = [
+    "CacheWrapper",
+    "cached",
+    "clear_function_caches",
+    "enable_copy_on_write",
+    "get_cache_stats",
+    "reset_cache_stats",
+    "get_shared_cache",
+    "AKSHARE_TTL_POLICY",
+    "MarketTTL",
+    "TTLPolicy",
+    "market_ttl",
+]
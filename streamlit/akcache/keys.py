@@ -0,0 +1,88 @@
+import functools
+import hashlib
+import inspect
+import pickle
+
+import numpy as np
+import pandas as pd
+
+
+@functools.lru_cache(maxsize=1024)
+def _signature(func):
+    try:
+        return inspect.signature(func)
+    except (TypeError, ValueError):  # 部分内置函数没有签名
+        return None
+
+
+def _digest(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def freeze(value):
+    """
+    把参数值转换成可哈希、且 repr 稳定的形式，用于构造缓存键。
+
+    - list / tuple 转为 tuple，dict / set 按元素 repr 排序，保证顺序无关
+    - DataFrame / Series / Index / ndarray 按内容计算 sha1，内容相同即命中
+    - 其他不可哈希对象按 pickle 内容计算 sha1，无法 pickle 时退化为 repr
+    """
+    if value is None or isinstance(value, (bool, int, float, str, bytes)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    if isinstance(value, dict):
+        items = [(freeze(k), freeze(v)) for k, v in value.items()]
+        return ("dict", tuple(sorted(items, key=repr)))
+    if isinstance(value, (set, frozenset)):
+        return ("set", tuple(sorted((freeze(v) for v in value), key=repr)))
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        hashed = pd.util.hash_pandas_object(value, index=True).values
+        if isinstance(value, pd.DataFrame):
+            hashed = np.append(hashed, pd.util.hash_array(value.columns.astype(str).values))
+        return (type(value).__name__, value.shape, _digest(hashed.tobytes()))
+    if isinstance(value, np.ndarray):
+        return ("ndarray", value.shape, str(value.dtype), _digest(value.tobytes()))
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        pass
+    try:
+        return (type(value).__name__, _digest(pickle.dumps(value)))
+    except Exception:
+        return (type(value).__name__, repr(value))
+
+
+def make_key(name, func, args, kwargs):
+    """
+    构造规范化的缓存键。
+
+    按目标函数签名绑定参数并补全默认值，因此 f(1, b=2)、f(a=1, b=2)、f(b=2, a=1)
+    得到同一个键；参数值经过 freeze 处理，列表、DataFrame 等不可哈希参数也能缓存。
+    无法获取签名或绑定失败时，退化为位置参数 + 排序后的关键字参数。
+    """
+    sig = _signature(func) if func is not None else None
+    if sig is not None:
+        try:
+            bound = sig.bind(*args, **kwargs)
+        except TypeError:
+            bound = None
+        if bound is not None:
+            bound.apply_defaults()
+            items = []
+            for param_name, value in bound.arguments.items():
+                kind = sig.parameters[param_name].kind
+                if kind is inspect.Parameter.VAR_POSITIONAL:
+                    items.append((param_name, freeze(value)))
+                elif kind is inspect.Parameter.VAR_KEYWORD:
+                    items.extend((k, freeze(v)) for k, v in value.items())
+                else:
+                    items.append((param_name, freeze(value)))
+            return (name, tuple(sorted(items, key=lambda item: item[0])))
+
+    return (
+        name,
+        freeze(args),
+        tuple(sorted(((k, freeze(v)) for k, v in kwargs.items()), key=lambda i: i[0])),
+    )
@@ -0,0 +1,74 @@
+import os
+import threading
+
+from log import logger
+from .disk import DiskCache
+from .singleflight import SingleFlight
+from .sqlite_store import SQLiteCache
+from .stats import CacheStats
+from .store import CacheStore
+
+
+class SharedCache:
+    """
+    一份缓存状态：内存 LRU、单飞调用表、统计和可选的持久化层（磁盘 / SQLite）。
+
+    同一个模块的多个 CacheWrapper 共享同一个 SharedCache（见 get_shared_cache）。
+    """
+
+    def __init__(self, name, max_entries, max_bytes, purge_interval):
+        self.name = name
+        self.stats = CacheStats()
+        self.store = CacheStore(
+            max_entries=max_entries,
+            max_bytes=max_bytes,
+            purge_interval=purge_interval,
+            on_evict=lambda key, entry: self.stats.record(key[0], "evictions"),
+        )
+        self.flight = SingleFlight()
+        self.persist = None
+        self._lock = threading.Lock()
+
+    def attach_persist(self, disk_dir, backend="arrow"):
+        """
+        挂载持久化层。已挂载时保持不变（以第一个配置的实例为准）。
+
+        backend:
+            "arrow": DiskCache，DataFrame 以 Arrow IPC 文件保存
+            "sqlite": SQLiteCache，任意结果 pickle 后存入 disk_dir/akcache.sqlite3，
+                并通过租约保证多个进程同时未命中时只请求一次上游
+        """
+        with self._lock:
+            if self.persist is not None:
+                return self.persist
+            try:
+                if backend == "sqlite":
+                    self.persist = SQLiteCache(os.path.join(disk_dir, "akcache.sqlite3"))
+                else:
+                    self.persist = DiskCache(disk_dir)
+            except (ImportError, OSError) as e:
+                logger.warning(f"持久化缓存不可用，仅使用内存缓存：{str(e)}")
+            return self.persist
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def get_shared_cache(name, max_entries=256, max_bytes=512 * 1024 * 1024, purge_interval=60):
+    """
+    返回进程内以 name（通常是被包装模块的名字，如 "akshare"）为键的共享缓存，
+    不存在时用给定的容量参数创建。
+    """
+    with _registry_lock:
+        shared = _registry.get(name)
+        if shared is None:
+            shared = _registry[name] = SharedCache(
+                name, max_entries, max_bytes, purge_interval
+            )
+        return shared
+
+
+def shared_caches():
+    with _registry_lock:
+        return list(_registry.values())
@@ -0,0 +1,160 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from log import logger
+
+# 跨进程租约的默认有效期（秒），持有者崩溃后其他进程最多等待这么久
+LEASE_SECONDS = 60
+
+
+class SQLiteCache:
+    """
+    基于本机 SQLite 文件的跨进程缓存层，接口与 DiskCache 相同。
+
+    同一台机器上的多个应用进程指向同一个文件即可共享缓存结果（pickle 序列化，任意类型）。
+    另外提供按键的租约（acquire / release / wait），多个进程同时未命中时只有拿到租约的进程
+    请求上游，其余进程等待它写入结果。数据库使用 WAL 模式，读写互不阻塞。
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.owner = f"{os.getpid()}-{id(self)}"
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "digest TEXT PRIMARY KEY, key TEXT, name TEXT, timestamp REAL, "
+                "ttl REAL, stale_ttl REAL, payload BLOB)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS leases ("
+                "digest TEXT PRIMARY KEY, owner TEXT, expires REAL)"
+            )
+
+    def _connect(self):
+        # sqlite3 连接不能跨线程使用，每个线程一个连接
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def supports(value):
+        return True
+
+    @staticmethod
+    def _digest(key):
+        return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        返回:
+            tuple: (value, timestamp, ttl, stale_ttl)；不存在或读取失败时返回 None。
+        """
+        try:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT key, timestamp, ttl, stale_ttl, payload FROM cache "
+                    "WHERE digest = ?",
+                    (self._digest(key),),
+                )
+                .fetchone()
+            )
+            if row is None or row[0] != repr(key):
+                return None
+            return pickle.loads(row[4]), row[1], row[2], row[3]
+        except Exception as e:
+            logger.warning(f"读取 SQLite 缓存失败：{str(e)}")
+            return None
+
+    def set(self, key, value, ttl, timestamp=None, stale_ttl=0):
+        try:
+            payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            self._connect().execute(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self._digest(key),
+                    repr(key),
+                    key[0],
+                    timestamp if timestamp is not None else time.time(),
+                    ttl,
+                    stale_ttl,
+                    payload,
+                ),
+            )
+            return True
+        except Exception as e:
+            logger.warning(f"写入 SQLite 缓存 {key[0]} 失败：{str(e)}")
+            return False
+
+    def pop(self, key):
+        self._connect().execute(
+            "DELETE FROM cache WHERE digest = ?", (self._digest(key),)
+        )
+
+    def clear(self):
+        conn = self._connect()
+        conn.execute("DELETE FROM cache")
+        conn.execute("DELETE FROM leases")
+
+    def purge_expired(self, now=None):
+        now = now if now is not None else time.time()
+        conn = self._connect()
+        conn.execute("DELETE FROM leases WHERE expires < ?", (now,))
+        return conn.execute(
+            "DELETE FROM cache WHERE timestamp + ttl + stale_ttl <= ?", (now,)
+        ).rowcount
+
+    def acquire(self, key, lease_seconds=LEASE_SECONDS):
+        """尝试获得某个键的上游请求租约，成功返回 True。过期的租约可以被抢占。"""
+        now = time.time()
+        conn = self._connect()
+        cursor = conn.execute(
+            "INSERT INTO leases VALUES (?, ?, ?) ON CONFLICT(digest) DO UPDATE SET "
+            "owner = excluded.owner, expires = excluded.expires "
+            "WHERE leases.expires < ? OR leases.owner = excluded.owner",
+            (self._digest(key), self.owner, now + lease_seconds, now),
+        )
+        return cursor.rowcount > 0
+
+    def release(self, key):
+        self._connect().execute(
+            "DELETE FROM leases WHERE digest = ? AND owner = ?",
+            (self._digest(key), self.owner),
+        )
+
+    def wait(self, key, timeout=LEASE_SECONDS, interval=0.2):
+        """
+        等待持有租约的进程写入新的有效结果。
+
+        返回:
+            tuple: 同 get()；超时或租约已释放但仍没有有效结果时返回 None。
+        """
+        deadline = time.time() + timeout
+        digest = self._digest(key)
+        conn = self._connect()
+        while time.time() < deadline:
+            leased = (
+                conn.execute(
+                    "SELECT 1 FROM leases WHERE digest = ? AND expires >= ?",
+                    (digest, time.time()),
+                ).fetchone()
+                is not None
+            )
+            hit = self.get(key)
+            if hit is not None and time.time() - hit[1] < hit[2]:
+                return hit
+            if not leased:
+                return None
+            time.sleep(interval)
+        return None
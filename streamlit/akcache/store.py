@@ -0,0 +1,178 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+from log import logger
+
+
+def estimate_size(value):
+    """
+    估算缓存值占用的内存字节数。
+
+    DataFrame / Series 使用 memory_usage(deep=True) 统计（包含字符串列的真实占用），
+    其他对象退化为 sys.getsizeof，容器类型递归累加一层元素。
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_size(k) + estimate_size(v) for k, v in value.items()
+        )
+    nbytes = getattr(value, "nbytes", None)  # numpy 数组
+    if isinstance(nbytes, int):
+        return nbytes
+    return sys.getsizeof(value)
+
+
+class CacheEntry:
+    """
+    缓存条目。ttl 为有效期，stale_ttl 为过期后仍允许返回旧值的时间，
+    两者之和之后条目才会被清理。source 记录算出 ttl 的有效期配置（写入者的策略），
+    配置不同的读取者据此重新计算有效期。
+    """
+
+    __slots__ = ("value", "timestamp", "ttl", "stale_ttl", "size", "source")
+
+    def __init__(self, value, timestamp, ttl, size, stale_ttl=0, source=None):
+        self.value = value
+        self.timestamp = timestamp
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.size = size
+        self.source = source
+
+    def age(self, now=None):
+        return (now if now is not None else time.time()) - self.timestamp
+
+    def fresh(self, now=None):
+        return self.age(now) < self.ttl
+
+    def expired(self, now=None):
+        return self.age(now) >= self.ttl + self.stale_ttl
+
+
+class CacheStore:
+    """
+    带容量上限的 LRU 缓存。
+
+    - max_entries: 最多保留的条目数
+    - max_bytes: 所有条目估算内存之和的上限（DataFrame 按 deep 方式统计）
+    - purge_interval: 每隔多少秒在访问时顺带清理一次已过期条目
+    - on_evict: 可选回调 on_evict(key, entry)，在条目因容量上限被淘汰时调用
+
+    超出任一上限时按最近最少使用的顺序淘汰；单个条目超过 max_bytes 时直接不缓存。
+    所有读写都在同一把可重入锁内完成，可以被多个会话线程同时访问。
+    """
+
+    def __init__(
+        self,
+        max_entries=256,
+        max_bytes=512 * 1024 * 1024,
+        purge_interval=60,
+        on_evict=None,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.purge_interval = purge_interval
+        self.on_evict = on_evict
+        self.total_bytes = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._last_purge = time.time()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key):
+        """返回缓存条目（不判断是否过期），并将其标记为最近使用。"""
+        with self._lock:
+            self._maybe_purge()
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, value, ttl, timestamp=None, stale_ttl=0, source=None):
+        size = estimate_size(value)  # 大表的 deep 统计较慢，放在锁外
+        with self._lock:
+            if self.max_bytes and size > self.max_bytes:
+                logger.warning(f"缓存值大小 {size} 字节超过上限 {self.max_bytes}，不缓存")
+                self.pop(key)
+                return None
+
+            self.pop(key)
+            entry = CacheEntry(
+                value,
+                timestamp if timestamp is not None else time.time(),
+                ttl,
+                size,
+                stale_ttl,
+                source,
+            )
+            self._entries[key] = entry
+            self.total_bytes += size
+            self._maybe_purge()
+            self._evict()
+            return entry
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.total_bytes -= entry.size
+            return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def usage(self):
+        """按函数名（键的第一个元素）汇总条目数和字节数，返回 {name: (count, bytes)}。"""
+        with self._lock:
+            result = {}
+            for key, entry in self._entries.items():
+                count, nbytes = result.get(key[0], (0, 0))
+                result[key[0]] = (count + 1, nbytes + entry.size)
+            return result
+
+    def purge_expired(self, now=None):
+        """删除所有已过期的条目，返回删除数量。"""
+        with self._lock:
+            now = now if now is not None else time.time()
+            self._last_purge = now
+            expired = [k for k, e in self._entries.items() if e.expired(now)]
+            for key in expired:
+                self.pop(key)
+            if expired:
+                logger.debug(f"清理过期缓存 {len(expired)} 条")
+            return len(expired)
+
+    def _maybe_purge(self):
+        now = time.time()
+        if now - self._last_purge >= self.purge_interval:
+            self.purge_expired(now)
+
+    def _evict(self):
+        while self._entries and (
+            (self.max_entries and len(self._entries) > self.max_entries)
+            or (self.max_bytes and self.total_bytes > self.max_bytes)
+        ):
+            key, entry = self._entries.popitem(last=False)
+            self.total_bytes -= entry.size
+            self.evictions += 1
+            logger.debug(f"LRU 淘汰缓存: {key[0]} ({entry.size} 字节)")
+            if self.on_evict is not None:
+                self.on_evict(key, entry)
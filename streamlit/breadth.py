@@ -0,0 +1,170 @@
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from limits import LIMIT_DOWN, LIMIT_UP, bj_board, classify_snapshot
+from log import logger
+
+# 前 N 大成交额股票明细保留的列
+TOP_STOCK_COLUMNS = ["代码", "名称", "最新价", "涨跌幅", "成交额", "总市值", "换手率"]
+
+
+@dataclass(frozen=True)
+class MarketBreadth:
+    """
+    同一份全市场行情快照计算出的市场宽度指标。
+
+    version 为快照的获取时间戳，所有字段都来自同一份快照，互相一致。
+    """
+
+    version: float
+    stock_count: int
+    median_change: float  # 中位数股票涨幅（%）
+    up_ratio: float  # 上涨（含平盘）股票占比（%），没有下跌股票时为 inf
+    up_count: int
+    down_count: int
+    limit_up_count: int
+    limit_down_count: int
+    top_percent: float  # 下面两个涨幅和拥挤度统计的前 n% 股票比例
+    top_weighted_change: float  # 前 n% 成交额股票的市值加权涨幅（%）
+    top_avg_change: float  # 前 n% 成交额股票的算数平均涨幅（%），去除涨幅超过 31% 的股票
+    crowdedness: float  # 前 n% 成交量股票占总成交量的比例（0~1）
+    top_n: int  # 下面市值统计和明细的前 N 只成交额股票
+    top_n_avg_market_value: float  # 平均市值（亿元）
+    top_n_total_market_value: float  # 总市值（亿元）
+    top_stocks: Optional[pd.DataFrame]  # 前 N 只成交额股票明细，按成交额降序
+
+    @classmethod
+    def empty(cls, version, top_percent, top_n):
+        return cls(
+            version=version,
+            stock_count=0,
+            median_change=0,
+            up_ratio=0,
+            up_count=0,
+            down_count=0,
+            limit_up_count=0,
+            limit_down_count=0,
+            top_percent=top_percent,
+            top_weighted_change=0,
+            top_avg_change=0,
+            crowdedness=0,
+            top_n=0,
+            top_n_avg_market_value=0,
+            top_n_total_market_value=0,
+            top_stocks=None,
+        )
+
+
+def _column(df, name):
+    return pd.to_numeric(df[name], errors="coerce").to_numpy(dtype=np.float64)
+
+
+def _descending_order(values):
+    # 降序排列的下标，NaN 排在最后（与 sort_values(ascending=False) 一致）
+    return np.argsort(-np.where(np.isnan(values), -np.inf, values), kind="stable")
+
+
+def _limit_counts(df, include_bj):
+    limits = classify_snapshot(df)
+    if not include_bj:
+        limits = np.where(bj_board(df["代码"].to_numpy()), 0, limits)
+    return (
+        int(np.count_nonzero(limits == LIMIT_UP)),
+        int(np.count_nonzero(limits == LIMIT_DOWN)),
+    )
+
+
+def compute_breadth(df, version, top_percent=5, top_n=10, include_bj=False):
+    """
+    一次遍历全市场行情快照，计算所有市场宽度指标。
+
+    成交额只排序一次，供前 n% 涨幅、前 N 只明细和平均市值共用；
+    中位数和前 n% 成交量只需要部分排序（np.partition）。
+
+    参数:
+        df (pd.DataFrame): ak.stock_zh_a_spot_em() 返回的全市场行情
+        version (float): 快照获取时间戳
+        top_percent (float): 前 n% 股票比例
+        top_n (int): 前 N 只成交额股票
+        include_bj (bool): 涨停、跌停家数是否包含北交所股票（涨跌幅限制 30%），
+            默认不包含，与原来只统计沪深两市的口径一致
+
+    返回:
+        MarketBreadth
+    """
+    if df is None or df.empty:
+        logger.info("实时行情数据为空，无法计算市场宽度指标")
+        return MarketBreadth.empty(version, top_percent, top_n)
+
+    change = _column(df, "涨跌幅")
+    amount = _column(df, "成交额")
+    volume = _column(df, "成交量")
+    market_value = _column(df, "总市值")
+    num_stocks = len(df)
+
+    # 中位数涨幅：按涨幅排序后位于中间的股票（NaN 排在最后）
+    middle_index = num_stocks // 2
+    median_change = float(np.partition(change, middle_index)[middle_index])
+
+    # 涨跌家数
+    up_count = int(np.count_nonzero(change >= 0))
+    down_count = int(np.count_nonzero(change < 0))
+    up_ratio = float("inf") if down_count == 0 else up_count / num_stocks * 100
+
+    limit_up_count, limit_down_count = _limit_counts(df, include_bj)
+
+    # 按成交额降序排序一次，前 n% 和前 N 只共用
+    order = _descending_order(amount)
+    k = int(num_stocks * (top_percent / 100))
+    top_k = order[:k]
+    weight = np.nansum(market_value[top_k])
+    top_weighted_change = (
+        float(np.nansum(change[top_k] * market_value[top_k]) / weight) if weight else 0
+    )
+    below_limit = order[change[order] < 31][:k]
+    top_avg_change = float(change[below_limit].mean()) if len(below_limit) else 0
+
+    # 拥挤度：前 n% 成交量股票占总成交量的比例
+    volume_filled = np.nan_to_num(volume, nan=0.0)
+    total_volume = volume_filled.sum()
+    if total_volume == 0 or k == 0:
+        crowdedness = 0
+    else:
+        crowdedness = float(
+            np.partition(volume_filled, num_stocks - k)[num_stocks - k :].sum()
+            / total_volume
+        )
+
+    top_n_index = order[:top_n]
+    top_n_values = market_value[top_n_index]
+    top_stocks = df.iloc[top_n_index][
+        [c for c in TOP_STOCK_COLUMNS if c in df.columns]
+    ]
+
+    breadth = MarketBreadth(
+        version=version,
+        stock_count=num_stocks,
+        median_change=median_change,
+        up_ratio=up_ratio,
+        up_count=up_count,
+        down_count=down_count,
+        limit_up_count=limit_up_count,
+        limit_down_count=limit_down_count,
+        top_percent=top_percent,
+        top_weighted_change=top_weighted_change,
+        top_avg_change=top_avg_change,
+        crowdedness=crowdedness,
+        top_n=len(top_n_index),
+        top_n_avg_market_value=float(np.nanmean(top_n_values) / 1e8)
+        if len(top_n_index)
+        else 0,
+        top_n_total_market_value=float(np.nansum(top_n_values) / 1e8),
+        top_stocks=top_stocks,
+    )
+    logger.info(
+        f"市场宽度: 中位数涨幅 {median_change}, 上涨 {up_count} 下跌 {down_count}, "
+        f"涨停 {limit_up_count} 跌停 {limit_down_count}, 拥挤度 {crowdedness*100:.2f}%"
+    )
+    return breadth
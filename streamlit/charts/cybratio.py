@@ -4,7 +4,7 @@ import os
 # 获取上级目录路径
 parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 sys.path.insert(0, parent_dir)
-from stockview.akcache.akcache import akshare as ak
+from daily_store import get_index_daily
 import pandas as pd
 import streamlit as st
 import altair as alt
@@ -19,9 +19,10 @@ SYMBOL_CYB = "sz399006"
 #   date	    open	close	high	low	    amount	    amount
 # 0	1991-04-03	988.05	988.05	988.05	988.05	1	        1.000000e+04
 
-df_sh = ak.stock_zh_index_daily_em(SYMBOL_SH).tail(250)
-df_sz = ak.stock_zh_index_daily_em(SYMBOL_SZ).tail(250)
-df_cyb = ak.stock_zh_index_daily_em(SYMBOL_CYB).tail(250)
+# 日线来自本地增量日线存储，每天只向上游请求新增的交易日；盘中附加当天的实时 K 线
+df_sh = get_index_daily(SYMBOL_SH, include_today=True).tail(250)
+df_sz = get_index_daily(SYMBOL_SZ, include_today=True).tail(250)
+df_cyb = get_index_daily(SYMBOL_CYB, include_today=True).tail(250)
 
 # Ensure the date columns are in datetime format
 df_sh["date"] = pd.to_datetime(df_sh["date"]).dt.date
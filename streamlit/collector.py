@@ -0,0 +1,176 @@
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from types import MappingProxyType
+
+from fanout import FetchTask, fetch_all
+from helpers import market_time_helper
+from log import logger
+
+
+@dataclass(frozen=True)
+class MarketSnapshot:
+    """
+    采集线程发布的一份不可变快照。
+
+    version 每发布一次加 1；values / errors 为只读映射 {数据源名: 值 / 错误信息}。
+    某个数据源本轮失败时沿用上一份快照中的值，errors 中记录本轮的错误；
+    updated_at 记录每个数据源当前值的数据时间，用于判断值是否已过期：值带 version
+    时间戳（如 IndexSnapshot、MarketBreadth 的获取时间）时使用它，否则为采集时间。
+    数据源可能返回缓存中的旧值，采集成功不代表数据是新的。
+    """
+
+    version: int
+    published_at: float
+    values: MappingProxyType
+    errors: MappingProxyType
+    updated_at: MappingProxyType
+
+    def age(self, now=None):
+        return (now or time.time()) - self.published_at
+
+    def source_age(self, name, now=None):
+        """数据源当前值的数据时间距今的秒数，从未成功时返回 None。"""
+        updated_at = self.updated_at.get(name)
+        if updated_at is None:
+            return None
+        return (now or time.time()) - updated_at
+
+    def stale_sources(self, max_age, now=None):
+        """
+        返回数据时间早于 max_age 秒（或从未成功）的数据源
+        {名称: (数据时间戳或 None, 本轮的错误信息)}。
+        """
+        stale = {}
+        for name in set(self.updated_at) | set(self.errors):
+            age = self.source_age(name, now)
+            if age is None or age > max_age:
+                stale[name] = (self.updated_at.get(name), self.errors.get(name))
+        return stale
+
+
+def data_time(value, default):
+    """数据源值的数据时间：值带数值型的 version（获取时间戳）时使用它，否则为 default。"""
+    version = getattr(value, "version", None)
+    if isinstance(version, (int, float)) and not isinstance(version, bool):
+        return float(version)
+    return default
+
+
+class SnapshotCollector:
+    """
+    所有 Streamlit 会话共享的后台行情采集线程。
+
+    按市场时钟轮询配置的数据源（实时行情、指数行情等）：交易时段每 interval 秒一次，
+    午休时再采集一次，收盘后 CLOSE_GRACE_SECONDS 秒内继续轮询以取得收盘集合竞价的结果，
+    其余时间休眠到下一次开盘。
+    每轮结果作为新的 MarketSnapshot 整体替换发布，页面只读取 latest()，
+    因此无论打开多少个页面，上游请求量都不变。
+    """
+
+    def __init__(self, interval=30, timeout=30, helper=None):
+        self.interval = interval
+        self.timeout = timeout
+        self.helper = helper or market_time_helper
+        self.sources = {}
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def configure(self, sources):
+        """替换数据源 {名称: 无参函数}。页面每次 rerun 都可以调用。"""
+        with self._lock:
+            self.sources = dict(sources)
+
+    def latest(self, max_age=None):
+        """返回最新的快照；没有快照或快照比 max_age 秒更旧时返回 None。"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return None
+        if max_age is not None and snapshot.age() > max_age:
+            return None
+        return snapshot
+
+    def collect_now(self):
+        """采集一轮并发布新快照。"""
+        with self._lock:
+            sources = dict(self.sources)
+        results = fetch_all(
+            [FetchTask(name, func, self.timeout) for name, func in sources.items()]
+        )
+        previous = self._snapshot
+        values = dict(previous.values) if previous is not None else {}
+        updated_at = dict(previous.updated_at) if previous is not None else {}
+        errors = {}
+        now = time.time()
+        for name, result in results.items():
+            if result.ok:
+                values[name] = result.value
+                updated_at[name] = data_time(result.value, now)
+            else:
+                errors[name] = result.error
+        snapshot = MarketSnapshot(
+            version=previous.version + 1 if previous is not None else 1,
+            published_at=now,
+            values=MappingProxyType(values),
+            errors=MappingProxyType(errors),
+            updated_at=MappingProxyType(updated_at),
+        )
+        # 整体替换引用，读者要么看到旧快照，要么看到新快照
+        self._snapshot = snapshot
+        logger.info(
+            f"发布行情快照 v{snapshot.version}，失败 {len(errors)} 个"
+            + (f"：{list(errors)}" if errors else "")
+        )
+        return snapshot
+
+    def next_delay(self, now, was_trading):
+        """
+        返回距离下一次采集的秒数。
+
+        was_trading: 上一次采集是否在交易时段内；刚进入午休或收盘时立即再采集一次。
+        """
+        phase = self.helper.market_phase(now)
+        if phase in ("morning", "afternoon"):
+            return self.interval
+        if was_trading:
+            return 0
+        if self.helper.in_close_grace(now):
+            return self.interval
+        return max(self.interval, self.helper.seconds_until_next_open(now))
+
+    def start(self):
+        """启动后台采集线程，重复调用不会启动多个线程。"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="snapshot-collector", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            now = datetime.now(self.helper.tz)
+            was_trading = self.helper.market_phase(now) in ("morning", "afternoon")
+            try:
+                self.collect_now()
+            except Exception as e:
+                logger.error(f"采集行情快照时发生错误：{str(e)}")
+            delay = self.next_delay(datetime.now(self.helper.tz), was_trading)
+            if self._stop.wait(delay):
+                return
+
+
+_collector = SnapshotCollector()
+
+
+def get_collector():
+    """返回进程内唯一的 SnapshotCollector（页面 rerun 后仍是同一个实例）。"""
+    return _collector
@@ -24,6 +24,9 @@ else
     # 重建并重启 Docker 容器
     docker build -t stockview .
     docker rm -f stockview
-    docker run -d --name stockview -p 8501:8501 stockview
+    # 挂载缓存目录，重新部署后磁盘缓存依然可用
+    mkdir -p /root/stockview_cache
+    docker run -d --name stockview -p 8501:8501 \
+        -v /root/stockview_cache:/app/.akcache stockview
     echo "Deployment completed"
 fi
\ No newline at end of file
@@ -0,0 +1,78 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from log import logger
+
+# 页面数据源并发请求共用的线程池，所有会话、所有 rerun 共享，限制同时发往上游的请求数
+_pool = ThreadPoolExecutor(max_workers=6, thread_name_prefix="fanout")
+
+
+class FetchTask:
+    """
+    一个互不依赖的数据源请求。
+
+    参数:
+        name (str): 数据源名称，用于日志和错误标记
+        func (callable): 无参函数
+        timeout (float): 从提交开始计算的超时时间（秒）
+    """
+
+    def __init__(self, name, func, timeout=30):
+        self.name = name
+        self.func = func
+        self.timeout = timeout
+
+
+class FetchResult:
+    """FetchTask 的执行结果。error 不为 None 时 value 无意义。"""
+
+    def __init__(self, name, value=None, error=None, elapsed=0.0):
+        self.name = name
+        self.value = value
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def fetch_all(tasks, executor=None):
+    """
+    在有界线程池中并发执行所有任务，每个任务单独计时、单独超时。
+
+    超时的任务不会被中断（线程无法取消），它完成后结果照常进入各自的缓存，
+    下一次调用即可命中；本次只把它标记为超时。单个任务失败不影响其他任务。
+
+    参数:
+        tasks (list[FetchTask]): 要执行的任务
+        executor: 可选，默认使用模块内共享的线程池
+
+    返回:
+        dict: {任务名: FetchResult}
+    """
+    executor = executor or _pool
+    submitted = []
+    for task in tasks:
+        submitted.append((task, time.time(), executor.submit(task.func)))
+
+    results = {}
+    for task, started, future in submitted:
+        remaining = max(0.0, started + task.timeout - time.time())
+        try:
+            value = future.result(timeout=remaining)
+            results[task.name] = FetchResult(
+                task.name, value=value, elapsed=time.time() - started
+            )
+        except FutureTimeoutError:
+            logger.error(f"获取{task.name}超时（{task.timeout} 秒）")
+            results[task.name] = FetchResult(
+                task.name, error="超时", elapsed=time.time() - started
+            )
+        except Exception as e:
+            logger.error(f"获取{task.name}时发生错误：{str(e)}")
+            results[task.name] = FetchResult(
+                task.name, error=str(e) or type(e).__name__, elapsed=time.time() - started
+            )
+    return results
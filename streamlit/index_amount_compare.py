@@ -1,11 +1,12 @@
 import streamlit as st
 import akshare
 from akcache.akcache import CacheWrapper
+from akcache.policy import AKSHARE_TTL_POLICY
 import pandas as pd
 from datetime import datetime, timedelta
 import altair as alt
 
-ak = CacheWrapper(akshare, cache_time=180)
+ak = CacheWrapper(akshare, cache_time=180, ttl_policy=AKSHARE_TTL_POLICY)
 
 # 获取最近一年的日期范围
 end_date = datetime.now().strftime("%Y%m%d")
@@ -0,0 +1,100 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from log import logger
+
+# 需要的指数系列，代码重复时以靠前的系列为准
+INDEX_SERIES = ["上证系列指数", "深证系列指数", "中证系列指数", "沪深重要指数"]
+
+
+class IndexSnapshot:
+    """
+    同一时刻所有指数系列的实时行情，以指数代码为索引。
+
+    参数:
+        table (pd.DataFrame): 以 代码 为索引的指数行情（最新价、成交额等列）
+        version (float): 快照获取时间戳
+        errors (dict): 获取失败的系列 {系列名: 错误信息}
+    """
+
+    def __init__(self, table, version, errors=None):
+        self.table = table
+        self.version = version
+        self.errors = errors or {}
+        # 代码 -> 行号，单个指数的查询不需要每次走 pandas 索引
+        self._positions = {code: i for i, code in enumerate(table.index)}
+        self._columns = {}
+
+    def _column(self, name):
+        values = self._columns.get(name)
+        if values is None:
+            values = self._columns[name] = pd.to_numeric(
+                self.table[name], errors="coerce"
+            ).to_numpy(np.float64)
+        return values
+
+    def get(self, symbol, column):
+        """返回指数 symbol 的 column 值，找不到该指数时抛出 KeyError。"""
+        position = self._positions.get(symbol)
+        if position is None:
+            raise KeyError(f"指数快照中没有 {symbol}")
+        return self._column(column)[position]
+
+    def amount(self, symbol):
+        return self.get(symbol, "成交额")
+
+    def price(self, symbol):
+        return self.get(symbol, "最新价")
+
+    def __contains__(self, symbol):
+        return symbol in self._positions
+
+
+def fetch_index_snapshot(ak, series=INDEX_SERIES, max_workers=4):
+    """
+    并行获取各指数系列的实时行情，合并为一个 IndexSnapshot。
+
+    部分系列获取失败时仍返回其余系列的数据（失败信息记录在 errors 中），全部失败时抛出异常。
+
+    参数:
+        ak: akshare 或包装了 akshare 的 CacheWrapper
+        series (list): 指数系列名称，传给 stock_zh_index_spot_em(symbol=...)
+        max_workers (int): 并发请求数
+    """
+    start = time.time()
+
+    def fetch(name):
+        try:
+            return name, ak.stock_zh_index_spot_em(symbol=name), None
+        except Exception as e:
+            logger.error(f"获取{name}实时行情时发生错误：{str(e)}")
+            return name, None, e
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(fetch, series))
+
+    frames = [df for _, df, _ in results if df is not None and not df.empty]
+    errors = {name: str(e) for name, _, e in results if e is not None}
+    if not frames:
+        raise RuntimeError(f"所有指数系列获取失败：{errors}")
+
+    table = pd.concat(frames, axis=0, ignore_index=True)
+    table["代码"] = table["代码"].astype(str)
+    table = table.drop_duplicates("代码", keep="first").set_index("代码")
+
+    # 快照版本取各系列中最早的获取时间（部分系列可能来自缓存）
+    version = None
+    if hasattr(ak, "fetched_at"):
+        timestamps = [
+            ak.fetched_at("stock_zh_index_spot_em", symbol=name)
+            for name, df, _ in results
+            if df is not None
+        ]
+        timestamps = [t for t in timestamps if t is not None]
+        version = min(timestamps) if timestamps else None
+    logger.info(
+        f"获取指数快照完成，共 {len(table)} 个指数，耗时 {time.time() - start:.2f} 秒"
+    )
+    return IndexSnapshot(table, version or time.time(), errors)
@@ -1,19 +1,25 @@
 import streamlit as st
-import akshare as ak
 import pandas as pd
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
+from daily_store import get_index_daily, index_symbol
 
 
 def get_index_data(index_code, start_date, end_date):
-    """获取指数数据"""
-    df = ak.index_zh_a_hist(
-        symbol=index_code, period="daily", start_date=start_date, end_date=end_date
+    """获取指数数据（本地增量日线存储，见 daily_store；盘中包含当天的实时 K 线）"""
+    df = get_index_daily(index_symbol(index_code), include_today=True).frame.rename(
+        columns={
+            "date": "日期",
+            "open": "开盘",
+            "close": "收盘",
+            "high": "最高",
+            "low": "最低",
+            "volume": "成交量",
+            "amount": "成交额",
+        }
     )
-
-    df["日期"] = pd.to_datetime(df["日期"])
     df.set_index("日期", inplace=True)
-    return df
+    return df.loc[pd.Timestamp(start_date) : pd.Timestamp(end_date)]
 
 
 def calculate_return_spread(df1, df2, window=40):
@@ -0,0 +1,282 @@
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from helpers import market_time_helper
+from log import logger
+from volume_curve import TRADING_MINUTES, trading_minute
+
+# 环形缓冲区保存的个股字段
+BUFFER_FIELDS = ["最新价", "涨跌幅", "成交额", "成交量"]
+# 每分钟保存的市场宽度指标：{名称: MarketBreadth 字段}
+SUMMARY_FIELDS = {
+    "上涨占比": "up_ratio",
+    "涨停数量": "limit_up_count",
+    "跌停数量": "limit_down_count",
+    "中位数涨幅": "median_change",
+}
+MAX_STOCKS = 8000
+# 按股票数量分配缓冲区时预留的余量，新上市的股票不必马上扩容
+STOCK_HEADROOM = 256
+
+
+def minute_label(minute):
+    """把开盘后的交易分钟数转换为时刻字符串（如 120 -> "11:30"，121 -> "13:01"）。"""
+    minutes_of_day = 9 * 60 + 30 + minute + (90 if minute > 120 else 0)
+    return f"{minutes_of_day // 60:02d}:{minutes_of_day % 60:02d}"
+
+
+class IntradayBuffer:
+    """
+    当天全市场行情的分钟级环形缓冲区，形状 (分钟, 股票, 字段)。
+
+    第一次写入时按快照的股票数量（加 STOCK_HEADROOM 余量）分配，股票增加时再扩容，
+    从不写入（如只使用回放）的进程不占用内存。
+    每次实时行情刷新写入一次，按开盘后的交易分钟数（0 ~ 240，跳过午休）定位槽位，
+    同一分钟内的多次刷新保留最后一份；收盘 CLOSE_GRACE_SECONDS 秒之后的快照不再写入，
+    避免盘后数据覆盖 15:00 的槽位。股票按代码分配固定编号，整个进程内不变。
+    读写都持有同一把锁，查询返回的是副本。
+    日内查询（某只股票 N 分钟涨幅、10:00 与现在的中位数涨幅、市场宽度走势）都是数组切片，
+    不再请求上游。新的交易日开始时清空数据。
+
+    参数:
+        capacity (int): 保存的分钟数，默认一整天（241 个槽位）
+        max_stocks (int): 最多容纳的股票数
+        fields (list): 保存的个股字段，默认 BUFFER_FIELDS
+        helper: MarketTimeHelper，用于判断交易日和交易时段
+    """
+
+    def __init__(
+        self, capacity=TRADING_MINUTES + 1, max_stocks=MAX_STOCKS, fields=None, helper=None
+    ):
+        self.capacity = capacity
+        self.max_stocks = max_stocks
+        self.fields = list(fields or BUFFER_FIELDS)
+        self.helper = helper or market_time_helper
+        self.values = None  # 第一次写入时分配，见 _reserve
+        self.summary = {
+            name: np.full(capacity, np.nan) for name in SUMMARY_FIELDS
+        }
+        # 每个槽位保存的是哪个交易分钟，-1 为空
+        self.slot_minute = np.full(capacity, -1, dtype=np.int32)
+        self.codes = []
+        self.names = []
+        self._index = {}  # 代码 -> 股票编号
+        self._last_codes = None  # (代码数组, 编号数组)，股票列表不变时复用
+        self.day = None
+        self.latest_minute = -1
+        self.version = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _stock_ids(self, codes, names):
+        cached = self._last_codes
+        if cached is not None and np.array_equal(cached[0], codes):
+            return cached[1]
+        ids = np.empty(len(codes), dtype=np.int64)
+        for i, code in enumerate(codes):
+            idx = self._index.get(code)
+            if idx is None:
+                if len(self.codes) >= self.max_stocks:
+                    idx = -1
+                else:
+                    idx = self._index[code] = len(self.codes)
+                    self.codes.append(code)
+                    self.names.append(names[i])
+            ids[i] = idx
+        if (ids < 0).any():
+            logger.warning(f"日内缓冲区已满（{self.max_stocks} 只股票），新股票不再记录")
+        self._last_codes = (codes.copy(), ids)
+        return ids
+
+    def _reserve(self, size):
+        # 保证缓冲区至少容纳 size 只股票，按需分配或扩容（保留已写入的数据）
+        allocated = 0 if self.values is None else self.values.shape[1]
+        if size <= allocated:
+            return
+        rows = min(self.max_stocks, max(size + STOCK_HEADROOM, allocated * 5 // 4))
+        values = np.full(
+            (self.capacity, rows, len(self.fields)), np.nan, dtype=np.float32
+        )
+        if allocated:
+            values[:, :allocated] = self.values
+        self.values = values
+
+    def _slot(self, minute):
+        return minute % self.capacity
+
+    def minute_of(self, timestamp):
+        """
+        返回时间戳对应的交易分钟数；开盘前、非交易日和收盘 CLOSE_GRACE_SECONDS 秒之后
+        返回 None。收盘集合竞价的快照（宽限期内）计入 15:00。
+        """
+        now = datetime.fromtimestamp(timestamp, self.helper.tz)
+        if not self.helper.is_trading_day(now.date()):
+            return None
+        phase = self.helper.market_phase(now)
+        if phase == "pre_open" or (
+            phase == "closed" and not self.helper.in_close_grace(now)
+        ):
+            return None
+        minute = int(trading_minute(now.hour * 60 + now.minute))
+        return min(max(minute, 0), TRADING_MINUTES)
+
+    def update(self, df, timestamp, breadth=None):
+        """
+        写入一份全市场行情快照。
+
+        参数:
+            df (pd.DataFrame): ak.stock_zh_a_spot_em() 的结果
+            timestamp (float): 快照的获取时间戳
+            breadth (MarketBreadth): 同一份快照计算出的市场宽度，用于记录宽度走势
+
+        返回:
+            int: 写入的交易分钟数；未写入时返回 None
+        """
+        if df is None or df.empty:
+            return None
+        minute = self.minute_of(timestamp)
+        if minute is None:
+            return None
+        day = datetime.fromtimestamp(timestamp, self.helper.tz).date()
+
+        codes = df["代码"].astype(str).to_numpy()
+        names = df["名称"].astype(str).to_numpy()
+        values = np.column_stack(
+            [
+                pd.to_numeric(df[name], errors="coerce").to_numpy(np.float32)
+                if name in df.columns
+                else np.full(len(df), np.nan, np.float32)
+                for name in self.fields
+            ]
+        )
+
+        with self._lock:
+            if day != self.day:
+                # 新的交易日，清空昨天的数据（股票编号保持不变）
+                if self.values is not None:
+                    self.values.fill(np.nan)
+                for series in self.summary.values():
+                    series.fill(np.nan)
+                self.slot_minute.fill(-1)
+                self.day = day
+                self.latest_minute = -1
+            elif minute < self.latest_minute:
+                return None  # 比已写入的快照更旧
+
+            ids = self._stock_ids(codes, names)
+            self._reserve(len(self.codes))
+            keep = ids >= 0
+            slot = self._slot(minute)
+            if self.slot_minute[slot] != minute:
+                self.values[slot] = np.nan
+            self.values[slot, ids[keep]] = values[keep]
+            self.slot_minute[slot] = minute
+            for name, attribute in SUMMARY_FIELDS.items():
+                self.summary[name][slot] = (
+                    getattr(breadth, attribute) if breadth is not None else np.nan
+                )
+            self.latest_minute = minute
+            self.version = timestamp
+        return minute
+
+    def _filled_at(self, minute):
+        # minute（含）之前最近一个有数据的交易分钟，超出缓冲区范围或没有数据时返回 None
+        minute = min(minute, self.latest_minute)
+        earliest = max(self.latest_minute - self.capacity + 1, 0)
+        while minute >= earliest:
+            if self.slot_minute[self._slot(minute)] == minute:
+                return minute
+            minute -= 1
+        return None
+
+    def field_at(self, name, minute=None):
+        """
+        返回 minute（默认最新）时所有股票的字段值（副本，按股票编号排列）。
+        该分钟没有刷新时取之前最近一次的数据；没有数据时返回 None。
+        """
+        with self._lock:
+            return self._field_at(name, minute)
+
+    def _field_at(self, name, minute=None):
+        # 调用方持有锁；复制出来，释放锁后写入线程覆盖同一槽位也不影响结果
+        minute = self.latest_minute if minute is None else minute
+        filled = self._filled_at(minute)
+        if filled is None:
+            return None
+        slot = self._slot(filled)
+        return self.values[slot, : len(self.codes), self.fields.index(name)].copy()
+
+    def changes(self, minutes):
+        """
+        所有股票最近 minutes 分钟的涨幅（%，按股票编号排列），数据不足时为 NaN。
+        """
+        with self._lock:
+            return self._changes(minutes)
+
+    def _changes(self, minutes):
+        now = self._field_at("最新价")
+        before = self._field_at("最新价", self.latest_minute - minutes)
+        if now is None or before is None:
+            return np.full(len(self.codes), np.nan, dtype=np.float32)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return (now / before - 1) * 100
+
+    def stock_changes(self, codes, periods=(5, 15, 30)):
+        """
+        指定股票最近 5 / 15 / 30 分钟的涨幅（%）。
+
+        返回:
+            pd.DataFrame: 以代码为索引，每个周期一列（如 "5分钟涨幅"）
+        """
+        with self._lock:
+            ids = np.array(
+                [self._index.get(str(code), -1) for code in codes], dtype=np.int64
+            )
+            by_period = {minutes: self._changes(minutes) for minutes in periods}
+        result = {}
+        for minutes, changes in by_period.items():
+            valid = (ids >= 0) & (ids < len(changes))
+            column = np.full(len(ids), np.nan)
+            column[valid] = changes[ids[valid]]
+            result[f"{minutes}分钟涨幅"] = column
+        return pd.DataFrame(result, index=pd.Index([str(c) for c in codes], name="代码"))
+
+    def median_change_at(self, minute=None):
+        """minute（默认最新）时全市场的中位数涨幅（%）。"""
+        changes = self.field_at("涨跌幅", minute)
+        if changes is None or np.isnan(changes).all():
+            return float("nan")
+        return float(np.nanmedian(changes))
+
+    def summary_frame(self):
+        """
+        当天每个交易分钟的市场宽度指标（上涨占比、涨停数量、跌停数量、中位数涨幅），
+        以时刻（HH:MM）为索引，只包含有刷新的分钟。
+        """
+        with self._lock:
+            if self.latest_minute < 0:
+                return pd.DataFrame(columns=list(SUMMARY_FIELDS))
+            earliest = max(self.latest_minute - self.capacity + 1, 0)
+            minutes = np.arange(earliest, self.latest_minute + 1)
+            slots = self._slot(minutes)
+            present = self.slot_minute[slots] == minutes
+            minutes, slots = minutes[present], slots[present]
+            data = {name: series[slots] for name, series in self.summary.items()}
+        return pd.DataFrame(data, index=[minute_label(m) for m in minutes])
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_intraday_buffer():
+    """返回进程内唯一的 IntradayBuffer（页面 rerun 后仍是同一个实例）。"""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = IntradayBuffer()
+        return _buffer
@@ -0,0 +1,148 @@
+import numpy as np
+import pandas as pd
+
+# 各板块的涨跌幅限制比例
+MAIN_BOARD_RATIO = 0.10  # 沪深主板
+GROWTH_BOARD_RATIO = 0.20  # 创业板、科创板（含 ST）
+BJ_RATIO = 0.30  # 北交所
+ST_RATIO = 0.05  # 主板风险警示股票
+
+# 最小报价单位（元）
+TICK = 0.01
+
+LIMIT_UP = 1
+LIMIT_DOWN = -1
+
+
+def bj_board(codes):
+    """返回每只股票是否为北交所股票（4、8、92 开头）的布尔数组。"""
+    code_num = pd.to_numeric(
+        pd.Series(codes, copy=False).astype(str).str[:3], errors="coerce"
+    ).to_numpy()
+    return (
+        ((code_num >= 400) & (code_num < 500))
+        | ((code_num >= 800) & (code_num < 900))
+        | (code_num == 920)
+    )
+
+
+def limit_ratios(codes, names):
+    """
+    按股票代码和名称返回每只股票的涨跌幅限制比例，没有涨跌幅限制的股票为 NaN。
+
+    - 30 开头（创业板）、688 / 689 开头（科创板）: 20%
+    - 4、8、92 开头（北交所）: 30%
+    - 其他（沪深主板）: 10%，名称带 ST 的为 5%
+    - 名称以 N（上市首日）或 C（注册制新股上市前五日）开头: 无涨跌幅限制
+
+    参数:
+        codes: 股票代码（字符串序列）
+        names: 股票名称（字符串序列）
+
+    返回:
+        np.ndarray: float64 的限制比例
+    """
+    codes = pd.Series(codes, copy=False).astype(str)
+    names = pd.Series(names, copy=False).astype(str)
+    code_num = pd.to_numeric(codes.str[:3], errors="coerce").to_numpy()
+
+    is_growth = ((code_num >= 300) & (code_num < 310)) | (
+        (code_num >= 688) & (code_num < 690)
+    )
+    is_bj = bj_board(codes)
+    is_st = names.str.upper().str.contains("ST", regex=False).to_numpy()
+    is_new = names.str.startswith(("N", "C")).to_numpy()
+
+    ratio = np.where(is_st, ST_RATIO, MAIN_BOARD_RATIO)
+    ratio = np.where(is_growth, GROWTH_BOARD_RATIO, ratio)
+    ratio = np.where(is_bj, BJ_RATIO, ratio)
+    return np.where(is_new, np.nan, ratio)
+
+
+def round_to_tick(prices):
+    """四舍五入到最小报价单位（交易所按四舍五入计算涨跌停价）。"""
+    # 加一个很小的量，避免 x.xx5 因浮点误差被舍掉
+    return np.floor(prices / TICK + 0.5 + 1e-9) * TICK
+
+
+def limit_prices(prev_close, ratio):
+    """
+    按昨收价和限制比例计算涨停价、跌停价。
+
+    返回:
+        tuple: (涨停价, 跌停价)，无涨跌幅限制的股票为 NaN
+    """
+    prev_close = np.asarray(prev_close, dtype=np.float64)
+    return (
+        round_to_tick(prev_close * (1 + ratio)),
+        round_to_tick(prev_close * (1 - ratio)),
+    )
+
+
+def classify_limits(price, prev_close, ratio):
+    """
+    判断每只股票当前是否涨停 / 跌停。
+
+    参数:
+        price: 最新价
+        prev_close: 昨收价
+        ratio: limit_ratios() 返回的限制比例
+
+    返回:
+        np.ndarray: int8，涨停为 LIMIT_UP，跌停为 LIMIT_DOWN，其他（含停牌、无涨跌幅限制）为 0
+    """
+    price = np.asarray(price, dtype=np.float64)
+    up_price, down_price = limit_prices(prev_close, ratio)
+    # 价格都是 0.01 的整数倍，留半个价位的容差抵消浮点误差
+    tolerance = TICK / 2
+    result = np.zeros(len(price), dtype=np.int8)
+    with np.errstate(invalid="ignore"):
+        result[price >= up_price - tolerance] = LIMIT_UP
+        result[(price <= down_price + tolerance) & (price > 0)] = LIMIT_DOWN
+    return result
+
+
+def previous_close(df):
+    """
+    返回行情快照中每只股票的昨收价。有 昨收 列时直接使用，否则由 最新价 和 涨跌幅 反推。
+    """
+    if "昨收" in df.columns:
+        prev_close = pd.to_numeric(df["昨收"], errors="coerce").to_numpy(np.float64)
+    else:
+        price = pd.to_numeric(df["最新价"], errors="coerce").to_numpy(np.float64)
+        change = pd.to_numeric(df["涨跌幅"], errors="coerce").to_numpy(np.float64)
+        prev_close = round_to_tick(price / (1 + change / 100))
+    return prev_close
+
+
+# 最近一次快照的 (代码, 名称, 限制比例)。股票列表和名称在盘中基本不变，
+# 字符串判断比数值计算慢两个数量级，列表相同时直接复用
+_last_ratios = None
+
+
+def snapshot_ratios(df):
+    """返回快照中每只股票的涨跌幅限制比例，股票列表与上一次相同时复用上次结果。"""
+    global _last_ratios
+    codes = df["代码"].to_numpy()
+    names = df["名称"].to_numpy()
+    cached = _last_ratios
+    if (
+        cached is not None
+        and np.array_equal(cached[0], codes)
+        and np.array_equal(cached[1], names)
+    ):
+        return cached[2]
+    ratio = limit_ratios(codes, names)
+    _last_ratios = (codes.copy(), names.copy(), ratio)
+    return ratio
+
+
+def classify_snapshot(df):
+    """
+    对 ak.stock_zh_a_spot_em() 的全市场行情快照做涨跌停分类。
+
+    返回:
+        np.ndarray: 与 df 行对应的 classify_limits() 结果
+    """
+    price = pd.to_numeric(df["最新价"], errors="coerce").to_numpy(np.float64)
+    return classify_limits(price, previous_close(df), snapshot_ratios(df))
@@ -1,118 +1,180 @@
 import streamlit as st
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
+import numpy as np
 import pandas as pd
 from log import logger
 import pytz
 
 # from streamlit_autorefresh import st_autorefresh
 import akshare
-from akcache import CacheWrapper
+from akcache import (
+    AKSHARE_TTL_POLICY,
+    CacheWrapper,
+    cached,
+    clear_function_caches,
+    enable_copy_on_write,
+    get_cache_stats,
+    market_ttl,
+    reset_cache_stats,
+)
 from options import analyze_atm_options, find_primary_options
 from helpers import during_market_time, minutes_since_market_open
 from streamlit_autorefresh import st_autorefresh
 from index_spread import create_spread_chart
+from warmer import REALTIME_BEFORE_OPEN, WarmTask, get_warmer
+from collector import get_collector
+from breadth import compute_breadth
+from index_snapshot import fetch_index_snapshot
+from fanout import FetchTask, fetch_all
+from metrics import Metric, Source, get_metric_graph
+from volume_curve import CumulativeCurve, compute_amount_curve
+from minute_store import get_minute_store
+from trade_calendar import trade_calendar
+from daily_store import get_index_daily
+from snapshot_recorder import get_recorder
+from replay import PLAYBACK_SPEEDS, advance, load_replay_day, replay_days
+from intraday import get_intraday_buffer
 import sys
+import time
 import os
 
-ak = CacheWrapper(akshare, cache_time=180)
+# 缓存返回的 DataFrame 浅拷贝依赖 pandas 的 Copy-on-Write，进程启动时开启一次
+enable_copy_on_write()
+
+# 包装 akshare 的所有 CacheWrapper 共享同一份进程内缓存，页面 rerun 后缓存依然有效；
+# AKCACHE_BACKEND=sqlite 时同一台机器上的多个应用进程共享磁盘缓存并合并上游请求
+ak = CacheWrapper(
+    akshare,
+    cache_time=180,
+    ttl_policy=AKSHARE_TTL_POLICY,
+    disk_dir=os.environ.get("AKCACHE_DIR", ".akcache"),
+    disk_backend=os.environ.get("AKCACHE_BACKEND", "arrow"),
+)
+# 指数分钟线本地存储目录，默认放在持久化缓存目录下
+MINUTE_STORE_DIR = os.environ.get(
+    "MINUTE_STORE_DIR",
+    os.path.join(os.environ.get("AKCACHE_DIR", ".akcache"), "minute"),
+)
+# 缓存过期后仍可先返回旧数据（后台刷新）的最长时间（秒）
+STALE_TTL = 300
 # 设置页面
 st.set_page_config("成交量预测", "📈", layout="wide", initial_sidebar_state="expanded")
 
 
-@st.cache_data(ttl=60)
 def is_trade_date(date):
     """
     判断是否是交易日。
 
+    交易日历每天加载一次并保存在本地（见 trade_calendar），查询为二分查找。
+
     参数:
     date (datetime.date): 要检查的日期。
 
     返回:
     bool: 如果是交易日，则返回 True；否则返回 False。
     """
-    try:
-        stock_calendar = ak.tool_trade_date_hist_sina()
-        stock_calendar_dates = pd.to_datetime(stock_calendar["trade_date"]).dt.date
-        if date in set(stock_calendar_dates):
-            logger.info(f"{date} 是交易日")
-            return True
-        else:
-            logger.info(f"{date} 不是交易日")
-            return False
-    except Exception as e:
-        logger.error(f"检查日期时发生错误：{str(e)}")
-        raise
+    result = trade_calendar.is_trade_date(date)
+    logger.info(f"{date} {'是' if result else '不是'}交易日")
+    return result
+
+
+def get_index_minutes(symbol, period, ndays, before=None, offline=False):
+    """
+    获取指数 before（默认今天）之前最近 ndays 个交易日（多取几天）的分钟 K 线。
+
+    优先读本地分钟线存储（MINUTE_STORE_DIR），本地缺少最近一个完整交易日时
+    才请求 akshare 并只追加新的 K 线；存储不可用时直接返回 akshare 的数据。
+    offline=True 时只读本地存储（回放模式），交易日只按本地保存的交易日历推算，
+    存储或本地交易日历不可用时抛出异常。
+    """
+
+    def fetch():
+        return ak.stock_zh_a_minute(symbol=symbol, period=str(period), adjust="qfq")
+
+    store = get_minute_store(MINUTE_STORE_DIR)
+    if store is None:
+        if offline:
+            raise RuntimeError("分钟线本地存储不可用")
+        return fetch()
+    if not offline:
+        store.update(symbol, period, fetch)
+    # 多取几个交易日，K 线不完整的交易日会被丢弃；离线时不加载交易日历，避免请求上游
+    calendar = trade_calendar.local_calendar() if offline else trade_calendar
+    end = before or date.today()
+    start = calendar.prev_trade_date(end, ndays + 5)
+    return store.read(symbol, period, start=start, end=end)
 
 
 # 只需要每天执行一次，获取成交量分时比例
-@st.cache_data(ttl=42000)
-def get_amount_curve(ndays):
+@cached(ttl=42000)
+def get_amount_curve(
+    ndays, period=15, weighting="equal", halflife=5, before=None, offline=False
+):
     """
     获取指定天数的成交量曲线。
 
     参数:
-    ndays (int): 要获取的天数。
+    ndays (int): 要获取的天数（1 ~ 60，1 分钟 K 线只有最近几天的数据）。
+    period (int): K 线周期（分钟），1 / 5 / 15。
+    weighting (str): 各交易日的权重，"equal" 等权，"exp" 按 halflife 指数衰减。
+    halflife (float): 指数衰减的半衰期（交易日）。
+    before (date): 只使用该日期之前的交易日，默认今天。
+    offline (bool): 只读本地分钟线存储，不请求 akshare（回放模式）。
 
     返回:
-    list: 包含每15分钟成交量百分比的列表。
+    list: 包含每 period 分钟成交量百分比的列表，长度 240/period。
 
     异常:
     如果在获取或处理数据时发生错误，将记录错误并抛出异常。
 
     功能描述:
-    1. 从 akshare 获取上证和深证的分钟数据。
-    2. 合并数据并计算总成交量。
-    3. 过滤掉当天的数据，只保留指定天数的数据。
-    4. 计算每15分钟的成交量占当天总成交量的百分比。
-    5. 生成并返回成交量曲线。
-
-    日志:
-    - 记录获取数据的开始和成功信息。
-    - 记录数据处理完成的信息。
-    - 记录百分比数据计算成功的信息。
-    - 记录生成成交量曲线的信息。
-    - 记录任何发生的错误。
+    1. 从本地分钟线存储读取上证和深证的分钟数据（增量从 akshare 补齐）。
+    2. 按时间合并数据并计算总成交量。
+    3. 按交易日和时段分组，丢弃 K 线不完整的交易日和当天的数据。
+    4. 计算每个时段的成交量占当天总成交量的百分比，按天加权平均生成成交量曲线。
     """
-    logger.info(f"开始获取成交量曲线，天数：{ndays}")
+    logger.info(
+        f"开始获取成交量曲线，天数：{ndays}，周期：{period} 分钟，加权：{weighting}"
+    )
     try:
-        stock_zh_a_minute_df_sh = ak.stock_zh_a_minute(
-            symbol="sh000001", period="15", adjust="qfq"
+        stock_zh_a_minute_df_sh = get_index_minutes(
+            "sh000001", period, ndays, before, offline
         )
-        stock_zh_a_minute_df_sz = ak.stock_zh_a_minute(
-            symbol="sz399001", period="15", adjust="qfq"
+        stock_zh_a_minute_df_sz = get_index_minutes(
+            "sz399001", period, ndays, before, offline
         )
         logger.info("成功获取上证和深证分钟数据")
 
-        df = pd.concat([stock_zh_a_minute_df_sh, stock_zh_a_minute_df_sz], axis=1)
-        df2 = df.iloc[:, [0, 5, 11]].copy(deep=True)
-        df2.columns = ["day", "amount_sh", "amount_sz"]
-        df2["amount_sh"] = pd.to_numeric(df2["amount_sh"])
-        df2["amount_sz"] = pd.to_numeric(df2["amount_sz"])
-        df2["date"] = pd.to_datetime(df2["day"])  # format='%Y-%m-%d %H:%M:%S'
-        df2["totalamount"] = df2.apply(
-            lambda x: (x["amount_sh"] + x["amount_sz"]), axis=1
+        # 有成交额时用成交额，否则用成交量
+        column = (
+            "amount"
+            if "amount" in stock_zh_a_minute_df_sh.columns
+            and "amount" in stock_zh_a_minute_df_sz.columns
+            else "volume"
         )
-        df2.drop(["day"], axis=1, inplace=True)
-        df2 = df2[
-            df2["date"] < datetime.combine(date.today(), datetime.min.time())
-        ]  # 获取本日之前15分钟数据，当日不要。
-        df2 = df2.tail(ndays * 16)  # 取n天的数据，一天16个数据。
-        logger.info(f"数据处理完成，共{len(df2)}条记录")
-
-        df_all = pd.DataFrame()
-        for i in range(ndays):
-            df_range = df2.iloc[i * 16 : (i + 1) * 16].copy()  # 创建副本
-            day_amount = df_range.totalamount.sum()
-            df_range.loc[:, "pct"] = df_range.apply(
-                lambda x: (x["totalamount"] / day_amount), axis=1
-            )
-            df_all = pd.concat([df_all, df_range])
-        df_all = df_all.reset_index()
-        logger.info(f"成功计算{ndays}天的百分比数据")
+        df = pd.merge(
+            stock_zh_a_minute_df_sh[["day", column]],
+            stock_zh_a_minute_df_sz[["day", column]],
+            on="day",
+            suffixes=("_sh", "_sz"),
+        )
+        bars = pd.DataFrame(
+            {
+                "day": df["day"],
+                "amount": pd.to_numeric(df[f"{column}_sh"])
+                + pd.to_numeric(df[f"{column}_sz"]),
+            }
+        )
+        logger.info(f"数据处理完成，共{len(bars)}条记录")
 
-        curve = []
-        for j in range(16):
-            curve.append(df_all[df_all.index % 16 - j == 0].pct.mean())
+        curve = compute_amount_curve(
+            bars,
+            ndays,
+            period=period,
+            weighting=weighting,
+            halflife=halflife,
+            before=before,
+        ).tolist()
 
         logger.info(f"成功生成成交量曲线:{curve}")
         return curve
@@ -121,96 +183,124 @@ def get_amount_curve(ndays):
         raise
 
 
-@st.cache_data(ttl=180)
+# 累计成交比例每天只需要构建一次
+@cached(ttl=42000)
+def get_cumulative_curve(ndays=3, period=15, before=None, offline=False):
+    """
+    获取开盘后每个交易分钟的累计成交比例（见 volume_curve.CumulativeCurve）。
+
+    参数:
+    ndays (int): 成交量曲线使用的天数。
+    period (int): 成交量曲线的 K 线周期（分钟）。
+    before (date): 只使用该日期之前的交易日，默认今天。
+    offline (bool): 只读本地数据（回放模式）。
+    """
+    curve = get_amount_curve(ndays, period, before=before, offline=offline)
+    return CumulativeCurve(curve, period)
+
+
 def get_estimate_amount(minutes, vol=None):
     """
     估算成交量。
 
     参数：
-    minutes (int): 已交易的分钟数。
+    minutes (int): 已交易的分钟数（跳过午休）。
     vol (int, 可选): 指定的成交量。如果未提供，将自动获取。
 
     返回：
     int: 估算的成交量。如果发生错误，返回0。
-
-    异常：
-    KeyError: 当计算累计比例时发生键错误。
-    ZeroDivisionError: 当估算成交量时发生除零错误。
-
-    日志：
-    - 记录开始估算成交量的信息。
-    - 记录计算得到的累计比例。
-    - 记录自动获取的成交量（如果未指定）。
-    - 记录估算的成交量。
-    - 记录计算累计比例时的键错误警告。
-    - 记录估算成交量时的除零错误。
     """
 
     logger.info(f"开始估算成交量，已交易分钟数：{minutes}，指定成交量：{vol}")
-    curve = get_amount_curve(3)
-    df = pd.DataFrame(curve, columns=["amount"])
-    t = minutes // 15
-    if t > 15:
-        t = 15
-    remaining_minutes = minutes % 15
-
-    try:
-        a = df[0:t]["amount"].sum() + df.loc[t] * remaining_minutes / 15
-
-        logger.info(f"计算得到的累计比例：{a}")
-    except KeyError:
-        a = df[0:t]["amount"].sum()
-        logger.warning(f"计算累计比例时发生KeyError，使用备选方案：{a}")
-        raise
+    curve = get_cumulative_curve(3)
 
     if not vol:
         total_amount = get_a_amount()
         vol = total_amount[0] + total_amount[1]
         logger.info(f"自动获取成交量：{vol}")
-    try:
-        estimated_amount = int(vol / a.iloc[0]) if vol > 0 else 0
-        logger.info(f"估算的成交量：{estimated_amount}")
-        return estimated_amount
-    except ZeroDivisionError:
-        logger.error("估算成交量时发生除零错误")
+    if vol <= 0 or curve.fraction(minutes) <= 0:
         return 0
+    estimated_amount = int(curve.forecast(vol, minutes))
+    logger.info(f"估算的成交量：{estimated_amount}")
+    return estimated_amount
+
 
+def forecast_amounts(amounts, current_time, curve=None):
+    """
+    一次预测多个序列（如上证、深证、各指数）的全天成交额。
+
+    参数：
+    amounts: 数组或 Series，截至当前的累计成交额。
+    current_time (datetime): 当前时间。
+    curve (CumulativeCurve): 累计成交比例，默认 get_cumulative_curve(3)。
 
-@st.cache_data(ttl=180)
-def get_n_day_avg_amount(n):
+    返回：
+    np.ndarray 或 Series（与 amounts 相同）：非交易时间返回当前成交额。
     """
-    获取上证和深证指数最近 n 个交易日的平均成交额。
+    if not during_market_time(current_time):
+        return amounts
+    curve = curve or get_cumulative_curve(3)
+    forecast = curve.forecast(
+        amounts, minutes_since_market_open(current_time)
+    )
+    if isinstance(amounts, pd.Series):
+        return pd.Series(forecast, index=amounts.index)
+    return forecast
+
+
+def get_n_day_avg_amount(n, before=None, offline=False):
+    """
+    获取上证和深证指数 before（默认今天）之前最近 n 个交易日的平均成交额之和。
+
+    日线来自本地增量日线存储（见 daily_store），按前缀和计算，任意 n 都是 O(1)。
 
     参数:
         n (int): 要计算的交易日天数。
+        before (date): 截止日期（不含）。
+        offline (bool): 只读本地日线（回放模式）。
 
     返回:
-        tuple: 包含上证和深证指数平均成交额的元组，格式为 (sh_avg_amount, sz_avg_amount)。
+        int: 上证和深证平均成交额之和。
     """
-    logger.info(f"开始获取最近 {n} 个交易日的平均成交额")
-    try:
-        stock_zh_a_daily_df_sh = ak.stock_zh_index_daily_em(symbol="sh000001")
-        stock_zh_a_daily_df_sz = ak.stock_zh_index_daily_em(symbol="sz399001")
-        logger.info("成功获取上证和深证每日数据")
+    before = before or date.today()
+    sh_bars = get_index_daily("sh000001", offline=offline)
+    sz_bars = get_index_daily("sz399001", offline=offline)
+    sh_amount = int(sh_bars.mean_amount(n, before=before))
+    sz_amount = int(sz_bars.mean_amount(n, before=before))
+    logger.info(
+        f"最近 {n} 个交易日上证平均成交额: {sh_amount}, 深证平均成交额: {sz_amount}"
+    )
+    return sh_amount + sz_amount
 
-        sh_amount = int(stock_zh_a_daily_df_sh["amount"].iloc[-6:-1].mean())
-        sz_amount = int(stock_zh_a_daily_df_sz["amount"].iloc[-6:-1].mean())
 
-        logger.info(
-            f"最近 {n} 个交易日上证平均成交额: {sh_amount}, 深证平均成交额: {sz_amount}"
-        )
-        return sh_amount + sz_amount
+def _record_snapshot(kind, df, version):
+    # 每份新快照记录到当天的快照文件，供回放模式使用（见 snapshot_recorder）
+    recorder = get_recorder(kind)
+    if recorder is None:
+        return
+    try:
+        recorder.record(df, version)
     except Exception as e:
-        logger.error(f"获取最近 {n} 个交易日的平均成交额时发生错误：{str(e)}")
-        return 0, 0
+        logger.error(f"记录行情快照时发生错误：{str(e)}")
+
+
+@cached(ttl_policy=market_ttl("realtime"), stale_ttl=STALE_TTL)
+def get_index_snapshot():
+    """
+    并行获取上证、深证、中证、沪深重要指数四个系列的实时行情，合并为以代码为索引的快照。
+    单个指数的价格、成交额都从这份快照中查询，每份新快照同时记录到当天的快照文件。
+
+    返回:
+        IndexSnapshot
+    """
+    snapshot = fetch_index_snapshot(ak)
+    _record_snapshot("index", snapshot.table.reset_index(), snapshot.version)
+    return snapshot
 
 
-@st.cache_data(ttl=180)
 def get_index_price(symbol):
     try:
-        index_data = ak.stock_zh_index_spot_em(symbol="沪深重要指数")
-        index_value = int(index_data[index_data["代码"] == symbol]["最新价"].values[0])
-        return index_value
+        return int(get_index_snapshot().price(symbol))
     except Exception as e:
         exc_type, exc_obj, tb = sys.exc_info()
         fname = os.path.split(tb.tb_frame.f_code.co_filename)[1]
@@ -222,52 +312,35 @@ def get_index_price(symbol):
 
 def get_index_amount(symbol):
     try:
-        df_sh = ak.stock_zh_index_spot_em(symbol="上证系列指数")
-        df_sz = ak.stock_zh_index_spot_em(symbol="深证系列指数")
-        df_csi = ak.stock_zh_index_spot_em(symbol="中证系列指数")
-        df_vip = ak.stock_zh_index_spot_em(symbol="沪深重要指数")
-        df = pd.concat([df_sh, df_sz, df_csi, df_vip], axis=0)
-
-        index_value = int(df[df["代码"] == symbol]["成交额"].values[0])
-        return index_value
+        return int(get_index_snapshot().amount(symbol))
     except Exception as e:
         logger.error(f"获取指数 {symbol} 当前成交额时发生错误：{str(e)}")
         raise
 
 
 # 获取当前成交额
-@st.cache_data(ttl=180)
 def get_a_amount() -> tuple[float, float]:
     """
     获取上证和深证指数的成交量。
 
-    该函数使用 akshare 库获取当前上证指数和深证指数的成交量。
-    如果当前时间不在交易时间内，则将全局的 TTL 变量设置为 3600 秒。
-
     返回:
         tuple: 包含上证和深证指数成交量的元组，格式为 (sh_amount, sz_amount)。
-
-    异常:
-        KeyError: 如果在获取的数据中未找到预期的股票代码（上证为 "000001"，深证为 "399001"）。
     """
 
     try:
         logger.info("开始获取指数数据")
-        spot_df = ak.stock_zh_index_spot_em(symbol="沪深重要指数")
+        snapshot = get_index_snapshot()
     except Exception as e:
         logger.error(f"获取指数数据时发生错误：{str(e)}")
         return 0, 0
 
     # 检查是否存在对应的指数代码
-    sh_mask = spot_df["代码"] == "000001"
-    sz_mask = spot_df["代码"] == "399001"
-
-    if not sh_mask.any() or not sz_mask.any():
+    if "000001" not in snapshot or "399001" not in snapshot:
         logger.error("未找到上证或深证指数数据")
         return 0, 0
 
-    sh_amount = spot_df[sh_mask]["成交额"].iloc[0]  # 使用iloc[0]代替values[0]
-    sz_amount = spot_df[sz_mask]["成交额"].iloc[0]  # 深证成交额
+    sh_amount = snapshot.amount("000001")  # 上证成交额
+    sz_amount = snapshot.amount("399001")  # 深证成交额
     logger.info(f"获取上证和深证指数的成交量: 上证 {sh_amount}, 深证 {sz_amount}")
     if pd.isna(sh_amount) or pd.isna(sz_amount):
         logger.error("获取的成交量数据包含 NaN 值")
@@ -276,214 +349,30 @@ def get_a_amount() -> tuple[float, float]:
     return sh_amount, sz_amount
 
 
-@st.cache_data(ttl=180)
-def middle_price_change():
+@cached(ttl_policy=market_ttl("realtime"), stale_ttl=STALE_TTL)
+def get_market_breadth(top_percent=5, top_n=10):
     """
-    计算所有股票的中位数涨幅。
-
-    该函数获取A股的实时交易数据，并计算所有股票的中间涨幅（即按涨幅排序后位于中间的股票涨幅）。
-
-    返回:
-        float: 中间股票涨幅。如果数据为空，则返回0。
-    """
-    df = ak.stock_zh_a_spot_em()
-    if df.empty:
-        logger.info("实时行情数据为空，无法计算中间涨幅")
-        return 0
-
-    # 按涨幅排序
-    df_sorted = df.sort_values("涨跌幅")
-
-    # 计算中间位置
-    middle_index = len(df_sorted) // 2
-
-    # 获取中间涨幅
-    middle_price_change = df_sorted.iloc[middle_index]["涨跌幅"]
-    logger.info(f"中间股票涨幅为: {middle_price_change}")
-
-    return middle_price_change
-
-
-@st.cache_data(ttl=180)
-def count_limit_up_stocks():
-    """
-    计算涨停板股票的数量。
-
-    该函数获取A股的实时交易数据，并计算涨停板（涨幅达到10%或以上）的股票数量。
-
-    返回:
-        int: 涨停板股票的数量。如果数据为空，则返回0。
-    """
-    df = ak.stock_zh_a_spot_em()
-    if df.empty:
-        logger.info("实时行情数据为空，无法计算涨停板数量")
-        return 0
-
-    # 计算涨停板股票的数量，30 开头和 68 开头的是 20% 涨停，其他是 10% 涨停
-    df["涨停板"] = df.apply(
-        lambda row: (
-            row["涨跌幅"] >= 19.9
-            if row["代码"].startswith(("30", "68"))
-            else row["涨跌幅"] >= 29
-            if row["代码"].startswith("8")
-            else row["涨跌幅"] >= 9.9
-        ),
-        axis=1,
-    )
-    limit_up_stocks = df[df["涨停板"] & ~df["代码"].str.startswith("8")].shape[0]
-    logger.info(f"涨停板股票数量: {limit_up_stocks}")
-
-    return limit_up_stocks
-
-
-@st.cache_data(ttl=180)
-def count_limit_down_stocks():
-    """
-    计算跌停板股票的数量。
-
-    该函数获取A股的实时交易数据，并计算跌停板（跌幅达到10%或以上）的股票数量。
-
-    返回:
-        int: 跌停板股票的数量。如果数据为空，则返回0。
-    """
-    df = ak.stock_zh_a_spot_em()
-    if df.empty:
-        logger.info("实时行情数据为空，无法计算跌停板数量")
-        return 0
-
-    # 计算跌停板股票的数量，30 开头和 68 开头的是 20% 跌停，其他是 10% 跌停
-    df["跌停板"] = df.apply(
-        lambda row: (
-            row["涨跌幅"] <= -19.9
-            if row["代码"].startswith(("30", "68"))
-            else row["涨跌幅"] <= -29
-            if row["代码"].startswith("8")
-            else row["涨跌幅"] <= -9.9
-        ),
-        axis=1,
-    )
-    limit_down_stocks = df[df["跌停板"] & ~df["代码"].str.startswith("8")].shape[0]
-    logger.info(f"跌停板股票数量: {limit_down_stocks}")
-
-    return limit_down_stocks
-
-
-@st.cache_data(ttl=180)
-def stock_up_down_ratio():
-    """
-    计算股票的涨跌比。
-
-    该函数获取A股的实时交易数据，并计算上涨股票数量与下跌股票数量的比值。
-
-    返回:
-        float: 股票的涨跌比。如果数据为空，则返回0。
-    """
-    df = ak.stock_zh_a_spot_em()
-    if df.empty:
-        logger.info("实时行情数据为空，无法计算涨跌比")
-        return 0
-
-    # 计算股票总数
-    num_stocks = len(df)
-
-    # 计算上涨和下跌股票的数量
-    up_stocks = df[df["涨跌幅"] >= 0].shape[0]
-    down_stocks = df[df["涨跌幅"] < 0].shape[0]
-    logger.info(f"上涨股票数量: {up_stocks}, 下跌股票数量: {down_stocks}")
-    if down_stocks == 0:
-        logger.info("没有下跌的股票，涨跌比为无穷大")
-        return float("inf")
-
-    up_down_ratio = (up_stocks / num_stocks) * 100
-    logger.info(f"股票上涨百分比为: {up_down_ratio}")
-
-    return up_down_ratio
-
-
-@st.cache_data(ttl=180)
-def top_n_stock_avg_price_change(n):
-    """
-    计算前 n% 成交金额的股票的平均涨幅。
-
-    该函数获取A股的实时交易数据，将股票按成交金额降序排序，并计算总成交金额。
-    然后确定构成前 n% 成交金额的股票数量，并计算这些股票的平均涨幅。
+    基于同一份全市场行情快照计算市场宽度指标（中位数涨幅、涨跌停数量、上涨占比、
+    前 n% 成交额股票涨幅、拥挤度、前 N 大成交额股票市值等）。
+    每份新快照同时交给 SnapshotRecorder 记录到当天的快照文件，并写入日内缓冲区
+    （见 intraday），供分钟级走势查询。
 
     参数:
-        n (float): 要计算的股票百分比。
+        top_percent (float): 前 n% 股票比例
+        top_n (int): 前 N 只成交额股票
 
     返回:
-        float: 前 n% 成交金额的股票的平均涨幅。如果数据为空，则返回0。
+        MarketBreadth: 所有指标及快照版本（获取时间戳）。
     """
-    # 获取 A 股实时行情数据
-    # 序号	代码	名称	最新价	涨跌幅	涨跌额	成交量	成交额	振幅	最高	...	量比	换手率	市盈率-动态	市净率	总市值	流通市值	涨速	5分钟涨跌	60日涨跌幅	年初至今涨跌幅
     df = ak.stock_zh_a_spot_em()
-    if df.empty:
-        logger.info("实时行情数据为空，无法计算平均涨幅")
-        return 0
-
-    # 按成交金额降序排序
-    df_sorted = df.sort_values("成交额", ascending=False)
-
-    # 计算前 n% 的股票数量
-    num_stocks = len(df)
-    top_n_percent = int(num_stocks * (n / 100))
-
-    # 计算前 n% 股票的加权平均涨幅
-    top_n_weighted_avg_price_change = (
-        df_sorted["涨跌幅"].head(top_n_percent)
-        * df_sorted["总市值"].head(top_n_percent)
-    ).sum() / df_sorted["总市值"].head(top_n_percent).sum()
-
-    # 计算前 n% 股票的算数平均涨幅，去除涨幅超过31%的股票
-    top_n_avg_price_change = (
-        df_sorted[df_sorted["涨跌幅"] < 31]["涨跌幅"].head(top_n_percent).mean()
-    )
-
-    logger.info(f"前 {n}% 成交金额的股票的平均涨幅为: {top_n_avg_price_change:.2f}%")
-
-    return top_n_weighted_avg_price_change, top_n_avg_price_change
-
-
-@st.cache_data(ttl=180)
-def top_n_stock_amount_percent(n):
-    """
-    计算前 n% 的股票对总成交量的贡献百分比。
-
-    该函数获取A股的实时交易数据，将股票按成交量降序排序，并计算总成交量。
-    然后确定构成前 n% 成交量的股票数量，并计算这些股票的总成交量。
-    最后，计算前 n% 的股票对总成交量的贡献百分比。
-
-    参数:
-        n (float): 要计算的股票百分比。
-
-    返回:
-        float: 前 n% 的股票对总成交量的贡献百分比。如果总成交量为零，则返回0。
-    """
-
-    # 获取 A 股实时行情数据
-    df = ak.stock_zh_a_spot_em()
-    # 按成交量降序排序
-    df_sorted = df.sort_values("成交量", ascending=False)
-
-    # 计算前 n% 的股票数量
-    num_stocks = len(df)
-    top_n_percent = int(num_stocks * (n / 100))
-
-    # 计算总成交量
-    total_amount = df["成交量"].sum()
-
-    if total_amount == 0:
-        logger.info("总成交量为0, 可能是盘前，无法计算拥挤度")
-        return 0
-
-    # 计算前 n% 股票的成交量总和
-    top_n_percent_amount = df_sorted["成交量"].head(top_n_percent).sum()
-
-    # 计算拥挤度
-    crowdedness = top_n_percent_amount / total_amount
-    logger.info(f"前 {n}% 成交量的股票占总成交量的 {crowdedness*100:.2f}%")
-
-    return crowdedness
+    version = ak.fetched_at("stock_zh_a_spot_em") or time.time()
+    _record_snapshot("stocks", df, version)
+    breadth = compute_breadth(df, version, top_percent=top_percent, top_n=top_n)
+    try:
+        get_intraday_buffer().update(df, version, breadth)
+    except Exception as e:
+        logger.error(f"写入日内缓冲区时发生错误：{str(e)}")
+    return breadth
 
 
 # 简单的预测模型
@@ -535,210 +424,388 @@ def streamlit_options(etf):
     st.write(f"隐含波动率: {closest_option['隐含波动率']:.2f}%")
 
 
-@st.cache_data(ttl=180)
-def get_top_n_popular_stocks(n):
+def format_top_stocks(top_stocks):
     """
-    获取成交额前 N 的股票详细信息和统计数据。
+    格式化前 N 大成交额股票明细，用于表格展示。
 
     参数:
-        n (int): 获取前 N 只股票的信息
+        top_stocks (pd.DataFrame): MarketBreadth.top_stocks
 
     返回:
-        df: 包含前 N 只股票的详细信息和统计数据的 DataFrame。
+        df: 以名称为索引、数值格式化为字符串的 DataFrame；没有数据时返回 None。
     """
-    try:
-        # 获取 A 股实时行情数据
-        df = ak.stock_zh_a_spot_em()
-        if df.empty:
-            logger.info("实时行情数据为空")
-            return None
-
-        # 按成交额降序排序
-        df_sorted = df.sort_values("成交额", ascending=False)
-
-        # 获取前 N 只股票
-        top_n_stocks = df_sorted.head(n).copy()
+    if top_stocks is None or top_stocks.empty:
+        return None
 
-        # 选择需要的列并重命名
-        result_df = top_n_stocks[
-            ["代码", "名称", "最新价", "涨跌幅", "成交额", "总市值", "换手率"]
-        ].copy()
+    result_df = top_stocks.copy()
 
-        # 格式化数值
-        result_df["涨跌幅"] = result_df["涨跌幅"].apply(lambda x: f"{x:.2f}%")
-        result_df["换手率"] = result_df["换手率"].apply(lambda x: f"{x:.2f}%")
-        result_df["成交额"] = (result_df["成交额"] / 1e8).apply(lambda x: f"{int(x)}亿")
-        result_df["总市值"] = (result_df["总市值"] / 1e8).apply(lambda x: f"{int(x)}亿")
-        result_df["最新价"] = result_df["最新价"].apply(lambda x: f"{x:.2f}")
+    # 格式化数值
+    result_df["涨跌幅"] = result_df["涨跌幅"].apply(lambda x: f"{x:.2f}%")
+    result_df["换手率"] = result_df["换手率"].apply(lambda x: f"{x:.2f}%")
+    result_df["成交额"] = (result_df["成交额"] / 1e8).apply(lambda x: f"{int(x)}亿")
+    result_df["总市值"] = (result_df["总市值"] / 1e8).apply(lambda x: f"{int(x)}亿")
+    result_df["最新价"] = result_df["最新价"].apply(lambda x: f"{x:.2f}")
 
-        # 设置索引为名称，但不显示索引名
-        result_df.set_index("名称", inplace=True)
+    # 设置索引为名称，但不显示索引名
+    result_df.set_index("名称", inplace=True)
 
-        return result_df
+    return result_df
 
-    except Exception as e:
-        logger.error(f"获取股票信息时发生错误：{str(e)}")
-        return None
 
-
-@st.cache_data(ttl=180)
-def calculate_top_n_stocks_avg_market_value(n):
+def get_data_time():
     """
-    计算成交额前N的股票的平均市值。
-
-    参数:
-        n (int): 要计算的股票数量
-
-    返回:
-        tuple: (avg_market_value, total_market_value, stocks_count)
-        - avg_market_value: 平均市值（亿元）
-        - total_market_value: 总市值（亿元）
-        - stocks_count: 实际统计的股票数量
+    返回当前展示数据的获取时间（取指数行情和个股行情中较早的一个），没有缓存时返回 None。
     """
-    try:
-        logger.info(f"开始计算前{n}只股票的平均市值")
-        df = ak.stock_zh_a_spot_em()
-
-        if df.empty:
-            logger.warning("获取到的股票数据为空")
-            return 0, 0, 0
-
-        # 按成交额降序排序并获取前N只
-        df_sorted = df.sort_values("成交额", ascending=False).head(n)
+    timestamps = [
+        t
+        for t in (get_index_snapshot.fetched_at(), get_market_breadth.fetched_at(5, 10))
+        if t is not None
+    ]
+    if not timestamps:
+        return None
+    return datetime.fromtimestamp(min(timestamps), pytz.timezone("Asia/Shanghai"))
 
-        # 计算市值（转换为亿元）
-        total_market_value = df_sorted["总市值"].sum() / 1e8
-        avg_market_value = df_sorted["总市值"].mean() / 1e8
-        stocks_count = len(df_sorted)
 
-        logger.info(f"前{stocks_count}只股票平均市值: {avg_market_value:.2f}亿")
-        logger.info(f"前{stocks_count}只股票总市值: {total_market_value:.2f}亿")
+# 各数据源的超时时间（秒），超时或失败的数据源只影响依赖它的指标
+FETCH_TIMEOUTS = {
+    "指数行情": 15,
+    "全市场行情": 30,
+    "日线行情": 20,
+    "成交量曲线": 30,
+    "交易日历": 15,
+}
 
-        return avg_market_value, total_market_value, stocks_count
-    except Exception as e:
-        logger.error(f"计算平均市值时发生错误: {str(e)}")
-        return 0, 0, 0
 
+def _index_amounts(snapshot):
+    sh_amount = snapshot.amount("000001")
+    sz_amount = snapshot.amount("399001")
+    return sh_amount, sz_amount, sh_amount + sz_amount or 1  # 总成交额为 0 时用 1
 
-def get_market_heat():
-    logger.info("程序启动")
-    # Streamlit 页面设置
 
-    # 获取当前成交额
-    logger.info("开始获取当前成交额")
-    sh_amount, sz_amount = get_a_amount()
+def _index_ratio(symbol):
+    # 指数成交占总成交比例（%）
+    return lambda snapshot, amounts: round(
+        float(snapshot.amount(symbol) / amounts[2] * 100), 2
+    )
 
-    # 当前时间
-    current_time = datetime.now()
 
-    # 预测成交额
-    sh_pred = predict_amount(sh_amount, current_time)
-    sz_pred = predict_amount(sz_amount, current_time)
+def _predict_total_amount(amounts, curve, trading_day, now):
+    # 预测成交额（成交量曲线是输入之一，曲线更新后重新预测）
+    if not trading_day:
+        return None
+    sh_amount, sz_amount, _ = amounts
+    total_pred = forecast_amounts(np.array([sh_amount, sz_amount]), now, curve).sum()
+    return int(total_pred / 1e8)
+
+
+def _top_n_label(template):
+    def label(values):
+        breadth = values.get("全市场行情")
+        return template.format(breadth.top_n if breadth is not None else 10)
+
+    return label
+
+
+# 市场成交与情绪指标。每个指标声明输入的数据源或其他指标，
+# 只有输入版本变化的指标才重新计算（见 metrics.MetricGraph）
+MARKET_HEAT_METRICS = [
+    Metric("index_amounts", "上证、深证、总成交额", ["指数行情"], _index_amounts),
+    # 成交额指标（亿）
+    Metric("sh_amount", "上证成交额", ["index_amounts"], lambda a: int(a[0] / 1e8), "成交额"),
+    Metric("sz_amount", "深证成交额", ["index_amounts"], lambda a: int(a[1] / 1e8), "成交额"),
+    # 创业板成交额（散户跟风指标）
+    Metric(
+        "cyb_amount",
+        "创业板成交额",
+        ["指数行情"],
+        lambda snapshot: int(snapshot.amount("399006") / 1e8),
+        "成交额",
+    ),
+    Metric(
+        "total_amount", "当前总成交额", ["index_amounts"], lambda a: int(a[2] / 1e8), "成交额"
+    ),
+    Metric(
+        "cyb_ratio",
+        "创业板成交占总成交比例",
+        ["指数行情", "index_amounts"],
+        _index_ratio("399006"),
+        "成交额",
+    ),
+    Metric(
+        "zz1000_ratio",
+        "中证 1000 成交占总成交比例",
+        ["指数行情", "index_amounts"],
+        _index_ratio("000852"),
+        "成交额",
+    ),
+    Metric(
+        "zz2000_ratio",
+        "中证 2000 成交占总成交比例",
+        ["指数行情", "index_amounts"],
+        _index_ratio("932000"),
+        "成交额",
+    ),
+    Metric(
+        "hs300_ratio",
+        "沪深 300 成交占总成交比例",
+        ["指数行情", "index_amounts"],
+        _index_ratio("000300"),
+        "成交额",
+    ),
+    Metric(
+        "pred_amount",
+        "预计今日总成交额",
+        ["index_amounts", "成交量曲线", "交易日历", "时钟"],
+        _predict_total_amount,
+        "成交额",
+    ),
+    Metric("avg_5_day", "5日均值", ["日线行情"], lambda avg: int(avg / 1e8), "成交额"),
+    # 情绪指标，都来自同一份全市场行情快照
+    # 拥挤度，算法参见https://legulegu.com/stockdata/ashares-congestion
+    Metric(
+        "crowdedness",
+        "交易拥挤度",
+        ["全市场行情"],
+        lambda b: round(b.crowdedness * 100, 2),
+        "情绪",
+    ),
+    Metric(
+        "median_change",
+        "中位数股票涨幅",
+        ["全市场行情"],
+        lambda b: round(b.median_change, 2),
+        "情绪",
+    ),
+    Metric(
+        "top_weighted_change",
+        "前 5% 成交加权涨幅",
+        ["全市场行情"],
+        lambda b: round(b.top_weighted_change, 2),
+        "情绪",
+    ),
+    Metric(
+        "top_avg_change",
+        "前 5% 成交算数涨幅",
+        ["全市场行情"],
+        lambda b: round(b.top_avg_change, 2),
+        "情绪",
+    ),
+    Metric("up_ratio", "股票上涨百分比", ["全市场行情"], lambda b: round(b.up_ratio, 2), "情绪"),
+    Metric("limit_up_count", "涨停板股票数量", ["全市场行情"], lambda b: b.limit_up_count, "情绪"),
+    Metric(
+        "limit_down_count", "跌停板股票数量", ["全市场行情"], lambda b: b.limit_down_count, "情绪"
+    ),
+    # 前 N 大成交额股票
+    Metric(
+        "top_n_avg_market_value",
+        _top_n_label("前{}大成交额股票平均市值"),
+        ["全市场行情"],
+        lambda b: int(b.top_n_avg_market_value),
+        "龙头",
+    ),
+    Metric(
+        "top_stocks",
+        _top_n_label("前{}大成交额股票活跃度"),
+        ["全市场行情"],
+        lambda b: format_top_stocks(b.top_stocks),
+        "龙头",
+    ),
+]
+
+
+def _collect_sources(tasks, versions):
+    # 并发获取数据源，成功的按 versions 取版本，失败的只记录错误
+    sources = {}
+    for name, result in fetch_all(tasks).items():
+        if result.ok:
+            sources[name] = Source(result.value, versions[name](result.value))
+        else:
+            sources[name] = Source(error=result.error)
+    return sources
 
-    # 计算总成交额和预测总成交额
-    total_amount = sh_amount + sz_amount or 1  # Use 1 if total_amount is 0
-    total_pred = sh_pred + sz_pred
 
-    # 创业板成交占比（散户跟风指标）
-    cyb_amount = get_index_amount("399006")
+def _collector_max_age(collector):
+    # 交易时段内超过 3 个采集周期没有更新的数据视为过期；休市期间数据不变，不判断
+    return 3 * collector.interval if during_market_time(datetime.now()) else None
 
-    # 计算创业板成交占总成交比例
-    cyb_ratio = cyb_amount / total_amount * 100
 
-    # 沪深 300 成交占比
-    hs300_amount = get_index_amount("000300")
-    hs300_ratio = hs300_amount / total_amount * 100
+def get_stale_sources():
+    """
+    后台采集线程中持续失败、页面仍在显示旧值的数据源
+    {名称: (最近一次采集成功的时间戳, 本轮的错误信息)}。
 
-    # 中证 1000 成交占比
-    zz1000_amount = get_index_amount("000852")
-    zz1000_ratio = zz1000_amount / total_amount * 100
+    整份快照过期时页面会自己获取数据（见 _live_sources），此时返回空。
+    """
+    collector = get_collector()
+    max_age = _collector_max_age(collector)
+    snapshot = collector.latest(max_age=max_age)
+    if snapshot is None or max_age is None:
+        return {}
+    return {
+        name: status
+        for name, status in snapshot.stale_sources(max_age).items()
+        if name in snapshot.values
+    }
 
-    # 中证 2000 成交占比
-    zz2000_amount = get_index_amount("932000")
-    zz2000_ratio = zz2000_amount / total_amount * 100
 
-    # 获取5日均值
-    avg_5_day = get_n_day_avg_amount(5)
+def _stale_metric_keys(stale):
+    # 直接或经由其他指标依赖过期数据源的指标
+    affected = set(stale)
+    changed = True
+    while changed:
+        changed = False
+        for metric in MARKET_HEAT_METRICS:
+            if metric.key not in affected and affected.intersection(metric.inputs):
+                affected.add(metric.key)
+                changed = True
+    return {metric.key for metric in MARKET_HEAT_METRICS if metric.key in affected}
+
+
+def _live_sources():
+    today = datetime.now(pytz.timezone("Asia/Shanghai")).date()
+
+    # 交易时段内快照超过 3 个采集周期没有更新，视为采集线程异常，改为页面自己获取；
+    # 单个数据源持续失败时快照沿用旧值，由 get_stale_sources 在页面上标记
+    collector = get_collector()
+    snapshot = collector.latest(max_age=_collector_max_age(collector))
+
+    def collected(name, fetch):
+        if snapshot is not None and name in snapshot.values:
+            return lambda: snapshot.values[name]
+        return fetch
+
+    # 数据源版本：快照自带获取时间，均值直接以值作为版本，其他取缓存中的获取时间
+    sources = _collect_sources(
+        [
+            FetchTask(
+                "指数行情",
+                collected("指数行情", get_index_snapshot),
+                FETCH_TIMEOUTS["指数行情"],
+            ),
+            FetchTask(
+                "全市场行情",
+                collected("全市场行情", lambda: get_market_breadth(5, 10)),
+                FETCH_TIMEOUTS["全市场行情"],
+            ),
+            FetchTask(
+                "日线行情", lambda: get_n_day_avg_amount(5), FETCH_TIMEOUTS["日线行情"]
+            ),
+            FetchTask(
+                "成交量曲线",
+                lambda: get_cumulative_curve(3),
+                FETCH_TIMEOUTS["成交量曲线"],
+            ),
+            FetchTask(
+                "交易日历", lambda: is_trade_date(today), FETCH_TIMEOUTS["交易日历"]
+            ),
+        ],
+        {
+            "指数行情": lambda value: value.version,
+            "全市场行情": lambda value: value.version,
+            "日线行情": lambda value: value,
+            "成交量曲线": lambda value: get_cumulative_curve.fetched_at(3),
+            "交易日历": lambda value: (today, trade_calendar.version),
+        },
+    )
+    # 预测成交额随时间变化，每分钟重新计算一次
+    now = datetime.now()
+    sources["时钟"] = Source(now, now.strftime("%Y-%m-%d %H:%M"))
+    return sources
+
+
+def _replay_sources(replay, at):
+    # 回放模式：行情来自记录的快照，日线和分钟线只读本地存储，不请求上游
+    day = replay.day
+    sources = _collect_sources(
+        [
+            FetchTask(
+                "指数行情",
+                lambda: replay.index_snapshot(at),
+                FETCH_TIMEOUTS["指数行情"],
+            ),
+            FetchTask(
+                "全市场行情",
+                lambda: replay.breadth(at, 5, 10),
+                FETCH_TIMEOUTS["全市场行情"],
+            ),
+            FetchTask(
+                "日线行情",
+                lambda: get_n_day_avg_amount(5, before=day, offline=True),
+                FETCH_TIMEOUTS["日线行情"],
+            ),
+            FetchTask(
+                "成交量曲线",
+                lambda: get_cumulative_curve(3, before=day, offline=True),
+                FETCH_TIMEOUTS["成交量曲线"],
+            ),
+        ],
+        {
+            "指数行情": lambda value: value.version,
+            "全市场行情": lambda value: value.version,
+            "日线行情": lambda value: value,
+            "成交量曲线": lambda value: day,
+        },
+    )
+    # 只有交易日才会记录快照
+    sources["交易日历"] = Source(True, day)
+    sources["时钟"] = Source(at, at.strftime("%Y-%m-%d %H:%M"))
+    return sources
 
-    # 拥挤度，算法参见https://legulegu.com/stockdata/ashares-congestion
-    crowdedness = top_n_stock_amount_percent(5) * 100
 
-    # 中间股票涨幅
-    middle_price_change_value = middle_price_change()
+def get_market_heat(replay=None, at=None):
+    """
+    获取成交额和情绪指标。
 
-    # top5 成交额股票平均涨幅和加权平均涨幅
-    top5_weighted_avg_price_change, top5_avg_price_change = (
-        top_n_stock_avg_price_change(5)
-    )
-    # 股票涨跌比
-    up_down_ratio = stock_up_down_ratio()
+    指数行情和全市场行情优先读取后台采集线程发布的快照（见 collector），页面本身不请求上游；
+    没有可用快照时与其他互不依赖的数据源（指数日线、成交量曲线、交易日历）一起并发获取，
+    每个数据源单独超时；再按 MARKET_HEAT_METRICS 增量计算指标。
+    某个数据源失败时只有依赖它的指标为 None，并可通过 error() 读取原因。
 
-    # 涨停数量
-    limit_up_count = count_limit_up_stocks()
-    # 跌停数量
-    limit_down_count = count_limit_down_stocks()
+    回放模式下数据源换成 replay 在 at 时刻的记录快照（见 replay），指标计算完全相同。
 
-    # 计算前10只股票的平均市值
-    avg_market_value, total_market_value, stocks_count = (
-        calculate_top_n_stocks_avg_market_value(10)
-    )
-    # 显示前10只活跃股票的详细信息
-    top_stocks = get_top_n_popular_stocks(10)
-
-    # 创建数据字典
-    data = {
-        "指标": [
-            "上证成交额",
-            "深证成交额",
-            "创业板成交额",
-            "当前总成交额",
-            "创业板成交占总成交比例",
-            "中证 1000 成交占总成交比例",
-            "中证 2000 成交占总成交比例",
-            "沪深 300 成交占总成交比例",
-            "预计今日总成交额",
-            "5日均值",
-            "交易拥挤度",
-            "中位数股票涨幅",
-            "前 5% 成交加权涨幅",
-            "前 5% 成交算数涨幅",
-            "股票上涨百分比",
-            "涨停板股票数量",
-            "跌停板股票数量",
-            f"前{stocks_count}大成交额股票平均市值",
-            f"前{stocks_count}大成交额股票活跃度",
-        ],
-        "数值": [
-            int(sh_amount / 1e8),  # 上证成交额（亿）
-            int(sz_amount / 1e8),  # 深证成交额（亿）
-            int(cyb_amount / 1e8),  # 创业板成交额（亿）
-            int(total_amount / 1e8),  # 当前总成交额（亿）
-            round(cyb_ratio, 2),  # 创业板成交占比（%）
-            round(zz1000_ratio, 2),  # 中证1000成交占比（%）
-            round(zz2000_ratio, 2),  # 中证2000成交占比（%）
-            round(hs300_ratio, 2),  # 沪深300成交占比（%）
-            # 预计今日总成交额（亿）
-            (
-                int(total_pred / 1e8)
-                if is_trade_date(datetime.now(pytz.timezone("Asia/Shanghai")).date())
-                else None
-            ),
-            int(avg_5_day / 1e8),  # 5日均值（亿）
-            round(crowdedness, 2),  # 交易拥挤度
-            round(middle_price_change_value, 2),  # 中位数股票涨幅（%）
-            round(top5_weighted_avg_price_change, 2),  # 前5%成交加权涨幅（%）
-            round(top5_avg_price_change, 2),  # 前5%成交算数涨幅（%）
-            round(up_down_ratio, 2),  # 股票上涨百分比（%）
-            limit_up_count,  # 涨停板股票数量
-            limit_down_count,  # 跌停板股票数量
-            int(avg_market_value),  # 前N大成交额股票平均市值（亿）
-            top_stocks,  # 前N大成交额股票活跃度
-        ],
-    }
+    参数:
+        replay (ReplayDay): 回放的交易日，None 为实时模式
+        at (datetime): 回放时刻（带时区）
 
+    返回:
+        MetricValues: 按指标名读取，如 data["pred_amount"]、data.error("up_ratio")
+    """
+    logger.info("程序启动")
+    if replay is None:
+        sources = _live_sources()
+        graph = get_metric_graph("market_heat")
+    else:
+        sources = _replay_sources(replay, at)
+        graph = get_metric_graph("market_heat_replay")
+
+    graph.configure(MARKET_HEAT_METRICS)
+    data = graph.evaluate(sources)
+
+    failed = data.failed()
+    if failed:
+        logger.warning(f"部分指标获取失败：{failed}")
     return data
 
 
+# 后台采集线程轮询的实时数据源，所有页面共享它发布的快照
+COLLECTOR_SOURCES = {
+    "指数行情": get_index_snapshot,
+    "全市场行情": lambda: get_market_breadth(5, 10),
+}
+
+# 开盘前 / 午后开盘后预热的数据，第一个打开页面的用户直接命中缓存
+WARM_TASKS = [
+    WarmTask("交易日历", lambda: is_trade_date(date.today())),
+    WarmTask("成交量曲线", lambda: get_cumulative_curve(3)),
+    WarmTask("5日均值", lambda: get_n_day_avg_amount(5)),
+    WarmTask("指数行情", get_index_snapshot, before_open=REALTIME_BEFORE_OPEN),
+    WarmTask(
+        "全市场行情",
+        lambda: get_market_breadth(5, 10),
+        before_open=REALTIME_BEFORE_OPEN,
+    ),
+]
+
 placeholder = st.empty()  # 创建一个空白区域
 
 
@@ -756,21 +823,32 @@ def streamlit_market_heat():
 
     # 成交额指标
     st.header("成交额")
-    for item, value in zip(data["指标"][0:10], data["数值"][0:10]):
-        st.write(f"{item}: {value}")
+    for key in data.group("成交额"):
+        st.write(f"{data.label(key)}: {data[key]}")
 
     # 情绪指标
     st.header("情绪指标")
-    for item, value in zip(data["指标"][10:17], data["数值"][10:17]):
-        st.write(f"{item}: {value}")
+    for key in data.group("情绪"):
+        st.write(f"{data.label(key)}: {data[key]}")
 
     # 清除缓存按钮
     if st.button("清除缓存"):
         st.cache_data.clear()
+        clear_function_caches()
         ak.clear_cache()
         st.success("缓存已清除")
 
 
+def streamlit_sparkline(trend, column):
+    """在指标下方画当天的分钟走势（迷你折线图），少于 2 个点时不画。"""
+    if trend is None or column not in trend:
+        return
+    series = trend[column].dropna()
+    if len(series) < 2:
+        return
+    st.line_chart(series, height=80, use_container_width=True)
+
+
 def streamlit_spread_chart():
     st.markdown("### 📈 指数40日收益差分析")
 
@@ -788,11 +866,134 @@ def streamlit_spread_chart():
         st.write(f"中证1000-红利指数收益差: {zz1000_dividend_spread:.2f}%")
 
 
+def streamlit_cache_admin():
+    """
+    缓存统计页（隐藏页面，通过 ?admin=1 访问），用于根据实际命中率和上游耗时调整 TTL。
+    """
+    st.title("🛠️ 缓存统计")
+    stats_df = get_cache_stats()
+    if stats_df.empty:
+        st.info("暂无缓存统计数据")
+        return
+
+    summary = stats_df.drop(columns=["耗时分布"])
+    summary["占用(MB)"] = (summary.pop("占用字节") / 1024 / 1024).round(2)
+    st.dataframe(
+        summary,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "命中率": st.column_config.NumberColumn(format="%.2f"),
+            "平均耗时": st.column_config.NumberColumn(label="平均耗时(秒)", format="%.3f"),
+            "最大耗时": st.column_config.NumberColumn(label="最大耗时(秒)", format="%.3f"),
+        },
+    )
+
+    st.markdown("#### 上游调用耗时分布")
+    histogram = pd.DataFrame(
+        list(stats_df["耗时分布"]), index=stats_df["缓存"] + "." + stats_df["函数"]
+    )
+    histogram = histogram[histogram.sum(axis=1) > 0]
+    st.dataframe(histogram, use_container_width=True)
+
+    st.markdown("#### 缓存预热")
+    report = get_warmer().last_report
+    if report is None:
+        st.caption("本进程尚未执行过预热")
+    else:
+        st.write(
+            f"最近一次预热: {report['开始时间']:%Y-%m-%d %H:%M:%S}，"
+            f"总耗时 {report['总耗时']:.2f} 秒"
+        )
+        st.dataframe(pd.DataFrame(report["任务"]), hide_index=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("重置统计"):
+            reset_cache_stats()
+            st.rerun()
+    with col2:
+        if st.button("清除缓存"):
+            st.cache_data.clear()
+            clear_function_caches()
+            ak.clear_cache()
+            st.success("缓存已清除")
+
+
+def streamlit_replay_controls():
+    """
+    侧边栏的回放控制：选择已记录的交易日、用滑块选择时刻，或按 10x / 60x 自动播放。
+
+    播放时每秒 rerun 一次，按实际经过的时间 × 倍速推进回放时刻（跳过午休）。
+
+    返回:
+        (ReplayDay, datetime): 回放的交易日和时刻；未开启回放时为 (None, None)
+    """
+    days = replay_days()
+    if not st.sidebar.toggle("回放模式", key="replay_mode", disabled=not days):
+        if not days:
+            st.sidebar.caption("还没有记录的行情快照，无法回放")
+        return None, None
+
+    tz = pytz.timezone("Asia/Shanghai")
+    day = st.sidebar.selectbox(
+        "交易日", days, format_func=lambda d: d.strftime("%Y-%m-%d"), key="replay_day"
+    )
+    try:
+        replay = load_replay_day(day, tz)
+    except Exception as e:
+        st.sidebar.error(f"无法载入回放数据：{str(e)}")
+        return None, None
+
+    state = st.session_state
+    # replay_clock 为精确的回放时刻，滑块只显示到 10 秒；滑块被拖动时以滑块为准
+    clock = state.get("replay_clock")
+    if clock is None or clock.date() != day:
+        clock = replay.start
+    elif state.get("replay_time") not in (None, state.get("replay_shown")):
+        clock = tz.localize(datetime.combine(day, state["replay_time"]))
+
+    speed = state.get("replay_speed", "暂停")
+    now = time.time()
+    if speed != "暂停":
+        elapsed = now - state.get("replay_tick", now)
+        clock, finished = advance(clock, int(speed.rstrip("x")), elapsed, replay.end)
+        if finished:
+            state["replay_speed"] = "暂停"
+    state["replay_tick"] = now
+    state["replay_clock"] = clock
+    shown = clock.replace(second=clock.second // 10 * 10, microsecond=0).time()
+    state["replay_time"] = state["replay_shown"] = shown
+
+    st.sidebar.slider(
+        "回放时刻",
+        min_value=replay.start.time().replace(microsecond=0),
+        max_value=replay.end.time().replace(microsecond=0),
+        step=timedelta(seconds=10),
+        format="HH:mm:ss",
+        key="replay_time",
+    )
+    speed = st.sidebar.radio(
+        "播放",
+        ["暂停"] + [f"{speed}x" for speed in PLAYBACK_SPEEDS],
+        horizontal=True,
+        key="replay_speed",
+    )
+    if speed != "暂停":
+        st_autorefresh(interval=1000, key="replay_refresh")
+    return replay, clock
+
+
 def streamlit_app():
+    if st.query_params.get("admin") == "1":
+        streamlit_cache_admin()
+        return
+
+    replay, replay_time = streamlit_replay_controls()
     current_time = datetime.now()
-    is_trading = during_market_time(current_time)
+    is_trading = replay is None and during_market_time(current_time)
 
-    # 只在交易时间启用自动刷新
+    # 只在交易时间启用自动刷新（回放模式由播放控制刷新）
     if is_trading:
         st_autorefresh(interval=60000, key="data_refresh")
 
@@ -807,52 +1008,98 @@ def streamlit_app():
         with col1:
             st.markdown("### 🎯 市场成交与情绪分析")
 
-        try:
-            data = get_market_heat()
-        except Exception:
+        data = get_market_heat(replay, replay_time)
+        failed = [
+            f"{data.label(key)}（{error}）" for key, error in data.failed().items()
+        ]
+        if len(failed) == len(data.keys()):
             st.error("开盘期间，无法获取数据，请稍后刷新。")
             return
+        if failed:
+            st.warning("部分指标暂时无法获取：" + "；".join(failed))
+
+        # 采集线程持续失败的数据源仍显示旧值，提示并标记依赖它们的指标
+        stale = get_stale_sources() if replay is None else {}
+        stale_keys = _stale_metric_keys(stale)
+        if stale:
+            tz = pytz.timezone("Asia/Shanghai")
+            st.warning(
+                "以下数据未能及时更新，显示的是较早的数据："
+                + "；".join(
+                    f"{name}（{datetime.fromtimestamp(at, tz):%H:%M:%S} 更新"
+                    + (f"，{error}" if error else "")
+                    + "）"
+                    for name, (at, error) in stale.items()
+                )
+            )
+
+        def metric_label(label, key):
+            return f"{label}（数据过期）" if key in stale_keys else label
+
+        # 当天的市场宽度走势，来自日内缓冲区（回放模式不显示）
+        intraday = get_intraday_buffer() if replay is None else None
+        trend = intraday.summary_frame() if intraday is not None else None
 
         # 使用多列布局显示主要指标
         metrics_col1, metrics_col2, metrics_col3, metrics_col4 = st.columns(4)
 
         with metrics_col1:
-            avg_amount = data["数值"][9]  # 5日均值（亿）
-            pred_amount = data["数值"][8]  # 预估成交额（亿）
+            avg_amount = data["avg_5_day"]  # 5日均值（亿）
+            pred_amount = data["pred_amount"]  # 预估成交额（亿）
 
             # 预估成交额指标
-            if pred_amount is not None:
+            if pred_amount is not None and avg_amount is not None:
                 delta_vs_avg = pred_amount - avg_amount
                 delta_color = "normal" if delta_vs_avg > 0 else "inverse"
                 st.metric(
-                    "预估成交额",
+                    metric_label("预估成交额", "pred_amount"),
                     f"{pred_amount:,}亿",
                     delta=f"{delta_vs_avg:+,}亿 vs 5日均值",
                     delta_color=delta_color,
                 )
 
         with metrics_col2:
-            up_ratio = data["数值"][14]  # 上涨占比（%）
-            st.metric("上涨占比", f"{up_ratio:.1f}%")
+            up_ratio = data["up_ratio"]  # 上涨占比（%）
+            st.metric(
+                metric_label("上涨占比", "up_ratio"),
+                "—" if up_ratio is None else f"{up_ratio:.1f}%",
+            )
+            streamlit_sparkline(trend, "上涨占比")
 
         with metrics_col3:
-            limit_up = data["数值"][15]  # 涨停数量
-            limit_down = data["数值"][16]  # 跌停数量
+            limit_up = data["limit_up_count"]  # 涨停数量
+            limit_down = data["limit_down_count"]  # 跌停数量
             st.metric(
-                "涨停数量",
-                str(limit_up),
-                delta=f"-跌停 {limit_down}",
+                metric_label("涨停数量", "limit_up_count"),
+                "—" if limit_up is None else str(limit_up),
+                delta=None if limit_down is None else f"-跌停 {limit_down}",
                 delta_color="inverse",
             )
+            streamlit_sparkline(trend, "涨停数量")
 
         with metrics_col4:
-            middle_change = data["数值"][11]  # 中位数涨幅（%）
+            middle_change = data["median_change"]  # 中位数涨幅（%）
+            # 与 10:00（开盘后第 30 个交易分钟）相比的变化
+            since_ten = (
+                intraday.median_change_at(30)
+                if intraday is not None and intraday.latest_minute > 30
+                else float("nan")
+            )
             st.metric(
-                "中位数涨幅",
-                f"{middle_change:.2f}%",
-                delta=None,
-                delta_color="inverse" if middle_change > 0 else "normal",
+                metric_label("中位数涨幅", "median_change"),
+                "—" if middle_change is None else f"{middle_change:.2f}%",
+                delta=(
+                    None
+                    if middle_change is None or np.isnan(since_ten)
+                    else f"{middle_change - since_ten:+.2f}% vs 10:00"
+                ),
+                delta_color=(
+                    "inverse"
+                    if middle_change is not None and middle_change > 0
+                    else "normal"
+                ),
             )
+            streamlit_sparkline(trend, "中位数涨幅")
 
         # 分两列显示详细数据
         col1, col2 = st.columns(2)
@@ -919,16 +1166,22 @@ def streamlit_app():
             st.markdown("#### 💰 指数成交占比")
 
             # 总成交额（亿）
-            total = data["数值"][3]
+            total = data["total_amount"]
 
             # 定义指数数据
             indices = [
-                ("上证指数", data["数值"][0]),
-                ("深证指数", data["数值"][1]),
-                ("创业板", data["数值"][2]),
-                ("中证1000", data["数值"][5] * total / 100),  # 转换百分比为实际值
-                ("中证2000", data["数值"][6] * total / 100),  # 转换百分比为实际值
-                ("沪深300", data["数值"][7] * total / 100),  # 转换百分比为实际值
+                ("上证指数", data["sh_amount"]),
+                ("深证指数", data["sz_amount"]),
+                ("创业板", data["cyb_amount"]),
+                ("中证1000", data["zz1000_ratio"]),
+                ("中证2000", data["zz2000_ratio"]),
+                ("沪深300", data["hs300_ratio"]),
+            ]
+            # 占比指标转换为实际值，获取失败的指数不显示
+            indices = [
+                (name, amount if i < 3 else amount * total / 100)
+                for i, (name, amount) in enumerate(indices)
+                if total and amount is not None
             ]
 
             # 显示各指数进度条
@@ -952,13 +1205,18 @@ def streamlit_app():
             # 显示总成交额和5日均值
             cols = st.columns(2)
             with cols[0]:
-                st.info(f"**总成交额**: {data['数值'][3]} 亿")
+                st.info(f"**总成交额**: {'—' if total is None else total} 亿")
             with cols[1]:
-                st.info(f"**5日均值**: {data['数值'][9]} 亿")
+                avg_amount = data["avg_5_day"]
+                st.info(f"**5日均值**: {'—' if avg_amount is None else avg_amount} 亿")
 
         with col2:
             st.markdown("#### 💡 情绪指标")
-            for item, value in zip(data["指标"][10:17], data["数值"][10:17]):
+            for key in data.group("情绪"):
+                item, value, error = data.label(key), data[key], data.error(key)
+                if error is not None:
+                    st.warning(f"**{item}**: 获取失败（{error}）")
+                    continue
                 # 处理带颜色标记的值
                 output = f"**{item}**: {value}"
                 # More Pythonic way to check for specific substrings
@@ -972,12 +1230,18 @@ def streamlit_app():
     with tab2:
         # 第二个tab显示龙头股分析
         st.markdown("### 🔥 龙头股活跃度分析")
-        data = get_market_heat()
+        data = get_market_heat(replay, replay_time)
 
         # 显示平均市值
-        st.info(f"#### 📊 {data['指标'][17]}\n{data['数值'][17]}")
+        label = data.label("top_n_avg_market_value")
+        if data.error("top_n_avg_market_value") is not None:
+            st.warning(
+                f"#### 📊 {label}\n获取失败（{data.error('top_n_avg_market_value')}）"
+            )
+        else:
+            st.info(f"#### 📊 {label}\n{data['top_n_avg_market_value']}")
 
-        if data["数值"][18] is not None:
+        if data["top_stocks"] is not None:
             # 增加过滤和排序选项
             col1, col2 = st.columns([2, 2])
             with col1:
@@ -986,7 +1250,19 @@ def streamlit_app():
                 )
 
             # 获取原始DataFrame
-            df = data["数值"][18]
+            df = data["top_stocks"]
+            if replay is None:
+                # 最近 5 / 15 / 30 分钟涨幅，来自日内缓冲区
+                changes = get_intraday_buffer().stock_changes(df["代码"])
+                df = df.assign(
+                    **{
+                        column: [
+                            "—" if np.isnan(x) else f"{x:.2f}%"
+                            for x in changes[column]
+                        ]
+                        for column in changes.columns
+                    }
+                )
 
             # 根据选择的列进行排序
             if sort_by == "涨跌幅":
@@ -1010,7 +1286,10 @@ def streamlit_app():
 
             # 美化数据表格显示
             styled_df = (
-                df.style.map(color_negative_red, subset=["涨跌幅"])
+                df.style.map(
+                    color_negative_red,
+                    subset=[c for c in df.columns if c.endswith("涨幅") or c == "涨跌幅"],
+                )
                 .set_properties(
                     **{
                         "background-color": "#f0f2f6",
@@ -1036,20 +1315,28 @@ def streamlit_app():
             )
 
     with tab3:
-        # 第三个tab显示指数收益差分析
-        streamlit_spread_chart()
+        # 第三个tab显示指数收益差分析（日线数据，与回放时刻无关）
+        if replay is None:
+            streamlit_spread_chart()
+        else:
+            st.info("回放模式只展示记录的行情快照，退出回放后查看指数对比。")
 
     # 数据更新时间和状态显示
     current_time = datetime.now()
-    updated_at = current_time.astimezone(pytz.timezone("Asia/Shanghai")).strftime(
-        "%Y-%m-%d %H:%M:%S"
-    )
-    is_trading = during_market_time(current_time)
-    status = (
-        "（非交易时间 - 已暂停刷新）"
-        if not is_trading
-        else f"（交易中 - {60}秒自动刷新）"
-    )
+    if replay is not None:
+        data_time = replay_time
+        status = f"（回放 {replay.day:%Y-%m-%d} - {st.session_state['replay_speed']}）"
+    else:
+        data_time = get_data_time() or current_time.astimezone(
+            pytz.timezone("Asia/Shanghai")
+        )
+        is_trading = during_market_time(current_time)
+        status = (
+            "（非交易时间 - 已暂停刷新）"
+            if not is_trading
+            else f"（交易中 - {60}秒自动刷新）"
+        )
+    updated_at = data_time.strftime("%Y-%m-%d %H:%M:%S")
 
     # 使用 st.markdown 添加带样式的更新时间信息和刷新状态
     status_color = "#1f77b4" if is_trading else "#666"
@@ -1066,7 +1353,7 @@ def streamlit_app():
             justify-content: space-between;
             align-items: center;
         '>
-            <span>⏰ 数据更新时间: {updated_at}</span>
+            <span>⏰ 数据时间: {updated_at}</span>
             <span style='
                 color: {status_color};
                 font-weight: 500;
@@ -1078,4 +1365,10 @@ def streamlit_app():
 
 
 if __name__ == "__main__":
+    warmer = get_warmer()
+    warmer.configure(WARM_TASKS)
+    warmer.start()
+    collector = get_collector()
+    collector.configure(COLLECTOR_SOURCES)
+    collector.start()
     streamlit_app()
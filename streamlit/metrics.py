@@ -0,0 +1,201 @@
+import threading
+
+from log import logger
+
+
+class Metric:
+    """
+    指标 DAG 中的一个节点。
+
+    参数:
+        key (str): 指标名（英文标识，供页面按名字读取）
+        label (str): 展示用的中文名称，可以是 callable(values) 以便根据其他指标生成
+        inputs (list[str]): 依赖的数据源或其他指标的 key，按顺序作为 compute 的参数
+        compute (callable): compute(*inputs) -> 指标值
+        group (str): 页面分组（如 "成交额"、"情绪"）；为 None 的是不展示的中间指标
+    """
+
+    def __init__(self, key, label, inputs, compute, group=None):
+        self.key = key
+        self.label = label
+        self.inputs = list(inputs)
+        self.compute = compute
+        self.group = group
+
+
+class Source:
+    """
+    数据源的一次取值。
+
+    参数:
+        value: 数据源的值
+        version: 可哈希的版本号（如数据获取时间戳），版本不变表示值不变
+        error (str): 获取失败时的错误信息
+    """
+
+    def __init__(self, value=None, version=None, error=None):
+        self.value = value
+        self.version = version
+        self.error = error
+
+
+class MetricValues:
+    """一次求值的结果，按指标名读取值、错误和展示名称。"""
+
+    def __init__(self, graph, values, errors, labels):
+        self._graph = graph
+        self._values = values
+        self._errors = errors
+        self._labels = labels
+
+    def __getitem__(self, key):
+        return self._values.get(key)
+
+    def error(self, key):
+        return self._errors.get(key)
+
+    def label(self, key):
+        return self._labels[key]
+
+    def group(self, group):
+        """返回某个分组中的指标名（按声明顺序）。"""
+        return [m.key for m in self._graph.metrics if m.group == group]
+
+    def keys(self):
+        """返回所有展示的指标名（按声明顺序）。"""
+        return [m.key for m in self._graph.metrics if m.group is not None]
+
+    def failed(self):
+        """返回展示的指标中失败的 {指标名: 错误信息}。"""
+        return {k: self._errors[k] for k in self.keys() if k in self._errors}
+
+
+class MetricGraph:
+    """
+    声明式的指标 DAG，带增量计算。
+
+    每个指标声明自己的输入（数据源或其他指标）。求值时按拓扑顺序计算，
+    只有输入版本发生变化的指标才重新计算，其余直接复用上一次的结果；
+    输入失败的指标不计算，错误沿依赖传递。
+
+    页面每次 rerun 都会重新执行脚本，所以图实例放在本模块中（见 get_metric_graph），
+    rerun 时通过 configure 替换指标定义，已计算的结果保留。
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.metrics = []
+        self._order = []
+        self._results = {}  # key -> (输入版本, 值, 错误)
+        self._lock = threading.Lock()
+
+    def configure(self, metrics):
+        """替换指标定义并检查依赖关系。"""
+        metrics = list(metrics)
+        order = _topological_order(metrics)
+        with self._lock:
+            self.metrics = metrics
+            self._order = order
+
+    def evaluate(self, sources):
+        """
+        参数:
+            sources (dict): {数据源名: Source}
+
+        返回:
+            MetricValues
+        """
+        with self._lock:
+            versions = {name: source.version for name, source in sources.items()}
+            values = {name: source.value for name, source in sources.items()}
+            errors = {
+                name: f"{name}：{source.error}"
+                for name, source in sources.items()
+                if source.error is not None
+            }
+            recomputed = 0
+            for metric in self._order:
+                missing = [k for k in metric.inputs if k not in versions]
+                if missing:
+                    raise KeyError(f"指标 {metric.key} 的输入 {missing} 不存在")
+                input_versions = tuple(versions[k] for k in metric.inputs)
+                failed = [errors[k] for k in metric.inputs if k in errors]
+
+                cached = self._results.get(metric.key)
+                if failed:
+                    result = (input_versions, None, "；".join(dict.fromkeys(failed)))
+                elif (
+                    cached is not None
+                    and cached[0] == input_versions
+                    and not _has_unknown_version(input_versions)
+                ):
+                    result = cached
+                else:
+                    recomputed += 1
+                    try:
+                        value = metric.compute(*(values[k] for k in metric.inputs))
+                        result = (input_versions, value, None)
+                    except Exception as e:
+                        logger.error(f"计算指标 {metric.key} 时发生错误：{str(e)}")
+                        result = (input_versions, None, str(e))
+                self._results[metric.key] = result
+
+                # 指标自身的版本就是它所有输入的版本
+                versions[metric.key] = input_versions
+                values[metric.key] = result[1]
+                if result[2] is not None:
+                    errors[metric.key] = result[2]
+
+            labels = {
+                m.key: m.label(values) if callable(m.label) else m.label
+                for m in self.metrics
+            }
+            logger.info(
+                f"指标图 {self.name} 求值完成，重新计算 {recomputed}/{len(self._order)} 个指标"
+            )
+            return MetricValues(self, values, errors, labels)
+
+
+def _has_unknown_version(version):
+    # 版本为 None 的数据源无法判断是否变化，依赖它的指标每次都重新计算
+    if version is None:
+        return True
+    return isinstance(version, tuple) and any(_has_unknown_version(v) for v in version)
+
+
+def _topological_order(metrics):
+    by_key = {m.key: m for m in metrics}
+    if len(by_key) != len(metrics):
+        raise ValueError("指标名重复")
+    order = []
+    state = {}  # key -> "visiting" / "done"
+
+    def visit(metric):
+        mark = state.get(metric.key)
+        if mark == "done":
+            return
+        if mark == "visiting":
+            raise ValueError(f"指标 {metric.key} 存在循环依赖")
+        state[metric.key] = "visiting"
+        for key in metric.inputs:
+            if key in by_key:
+                visit(by_key[key])
+        state[metric.key] = "done"
+        order.append(metric)
+
+    for metric in metrics:
+        visit(metric)
+    return order
+
+
+_graphs = {}
+_graphs_lock = threading.Lock()
+
+
+def get_metric_graph(name):
+    """返回进程内以 name 为键的 MetricGraph（页面 rerun 后仍是同一个实例）。"""
+    with _graphs_lock:
+        graph = _graphs.get(name)
+        if graph is None:
+            graph = _graphs[name] = MetricGraph(name)
+        return graph
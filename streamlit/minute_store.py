@@ -0,0 +1,193 @@
+import os
+import threading
+from datetime import datetime
+
+import pandas as pd
+from helpers import market_time_helper
+from log import logger
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow 是可选依赖，缺失时分钟线本地存储不可用
+    pa = None
+    pq = None
+
+
+class MinuteBarStore:
+    """
+    指数 / 股票分钟 K 线的本地增量存储。
+
+    数据按 directory/<symbol>/<period>m/<YYYY-MM>.parquet 分区保存，只追加比已存最后一根
+    更新的 K 线。上游（如新浪分钟线）只保留最近一段时间的数据，本地存储可以积累更长的历史。
+    写入先落到临时文件再 os.replace，读到的总是完整文件。
+
+    参数:
+        directory (str): 存储根目录
+        helper: MarketTimeHelper，用于判断本地数据是否已覆盖最近一个完整交易日
+    """
+
+    def __init__(self, directory, helper=None):
+        if pq is None:
+            raise ImportError("分钟线本地存储需要安装 pyarrow")
+        self.directory = directory
+        self.helper = helper or market_time_helper
+        self._lock = threading.Lock()
+        self._last = {}  # (symbol, period) -> 最后一根 K 线时间
+        os.makedirs(directory, exist_ok=True)
+
+    def _partition_dir(self, symbol, period):
+        return os.path.join(self.directory, symbol, f"{period}m")
+
+    def _months(self, symbol, period):
+        directory = self._partition_dir(symbol, period)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(
+            name[: -len(".parquet")]
+            for name in os.listdir(directory)
+            if name.endswith(".parquet")
+        )
+
+    def _read_month(self, symbol, period, month):
+        path = os.path.join(self._partition_dir(symbol, period), f"{month}.parquet")
+        return pq.read_table(path).to_pandas()
+
+    def _write_month(self, symbol, period, month, df):
+        directory = self._partition_dir(symbol, period)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{month}.parquet")
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp_path)
+        os.replace(tmp_path, path)
+
+    def last_timestamp(self, symbol, period):
+        """返回已存的最后一根 K 线时间，没有数据时返回 None。"""
+        key = (symbol, period)
+        if key not in self._last:
+            months = self._months(symbol, period)
+            last = None
+            if months:
+                df = self._read_month(symbol, period, months[-1])
+                if not df.empty:
+                    last = df["day"].max()
+            self._last[key] = last
+        return self._last[key]
+
+    def append(self, symbol, period, bars, until=None):
+        """
+        追加分钟 K 线，只保留比已存最后一根更新的部分。
+
+        参数:
+            bars (pd.DataFrame): 至少包含 day（K 线结束时间）列，其余数值列原样保存
+            until: 可选，丢弃结束时间晚于 until 的 K 线（盘中尚未走完的 K 线）
+
+        返回:
+            int: 新增的 K 线数量
+        """
+        bars = bars.copy()
+        bars["day"] = pd.to_datetime(bars["day"])
+        for column in bars.columns:
+            if column != "day":
+                bars[column] = pd.to_numeric(bars[column], errors="coerce")
+
+        with self._lock:
+            last = self.last_timestamp(symbol, period)
+            if last is not None:
+                bars = bars[bars["day"] > last]
+            if until is not None:
+                bars = bars[bars["day"] <= pd.Timestamp(until)]
+            if bars.empty:
+                return 0
+            bars = bars.drop_duplicates("day").sort_values("day")
+
+            months = bars["day"].dt.strftime("%Y-%m")
+            existing = set(self._months(symbol, period))
+            for month, new_bars in bars.groupby(months):
+                if month in existing:
+                    # 其他进程可能已经写入了同样的 K 线，按时间去重
+                    new_bars = (
+                        pd.concat(
+                            [self._read_month(symbol, period, month), new_bars],
+                            ignore_index=True,
+                        )
+                        .drop_duplicates("day", keep="last")
+                        .sort_values("day")
+                    )
+                self._write_month(symbol, period, month, new_bars)
+            self._last[(symbol, period)] = bars["day"].iloc[-1]
+
+        logger.info(f"分钟线 {symbol} {period}m 新增 {len(bars)} 条")
+        return len(bars)
+
+    def read(self, symbol, period, start=None, end=None):
+        """
+        读取 [start, end) 之间的分钟 K 线，只打开涉及的月份文件。
+
+        返回:
+            pd.DataFrame: 按时间排序；没有数据时返回空 DataFrame
+        """
+        start = pd.Timestamp(start) if start is not None else None
+        end = pd.Timestamp(end) if end is not None else None
+        frames = []
+        for month in self._months(symbol, period):
+            month_start = pd.Timestamp(f"{month}-01")
+            if end is not None and month_start >= end:
+                continue
+            if start is not None and month_start + pd.offsets.MonthBegin(1) <= start:
+                continue
+            frames.append(self._read_month(symbol, period, month))
+        if not frames:
+            return pd.DataFrame(columns=["day"])
+        df = pd.concat(frames, ignore_index=True)
+        if start is not None:
+            df = df[df["day"] >= start]
+        if end is not None:
+            df = df[df["day"] < end]
+        return df.reset_index(drop=True)
+
+    def is_current(self, symbol, period, now=None):
+        """本地数据是否已包含最近一个完整交易日的收盘 K 线。"""
+        last = self.last_timestamp(symbol, period)
+        if last is None:
+            return False
+        now = now or datetime.now(self.helper.tz)
+        last_close = self.helper.last_market_close(now).replace(tzinfo=None)
+        return last >= pd.Timestamp(last_close)
+
+    def update(self, symbol, period, fetch, now=None, intraday=False):
+        """
+        按需从上游补齐数据。
+
+        默认只在本地缺少最近一个完整交易日时调用 fetch；intraday=True 时总是调用，
+        用于获取当天盘中的 K 线。
+
+        参数:
+            fetch (callable): 无参函数，返回包含 day 列的分钟 K 线 DataFrame
+        返回:
+            int: 新增的 K 线数量
+        """
+        now = now or datetime.now(self.helper.tz)
+        if not intraday and self.is_current(symbol, period, now):
+            return 0
+        until = now.astimezone(self.helper.tz).replace(tzinfo=None)
+        return self.append(symbol, period, fetch(), until=until)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_minute_store(directory):
+    """
+    返回进程内 directory 对应的 MinuteBarStore（页面 rerun 后仍是同一个实例）；
+    pyarrow 不可用或目录无法创建时返回 None。
+    """
+    with _stores_lock:
+        if directory not in _stores:
+            try:
+                _stores[directory] = MinuteBarStore(directory)
+            except (ImportError, OSError) as e:
+                logger.warning(f"分钟线本地存储不可用，直接请求上游：{str(e)}")
+                _stores[directory] = None
+        return _stores[directory]
@@ -1,10 +1,10 @@
 import re
 import pandas as pd
 import akshare
-from akcache import CacheWrapper
+from akcache import AKSHARE_TTL_POLICY, CacheWrapper
 from datetime import datetime
 
-ak = CacheWrapper(akshare, cache_time=180)
+ak = CacheWrapper(akshare, cache_time=180, ttl_policy=AKSHARE_TTL_POLICY)
 
 
 def find_primary_options(etf):
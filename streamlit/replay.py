@@ -0,0 +1,142 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from breadth import compute_breadth
+from index_snapshot import IndexSnapshot
+from log import logger
+from snapshot_recorder import get_recorder
+
+# 回放的播放速度（倍速）
+PLAYBACK_SPEEDS = (10, 60)
+# 同时保留在内存中的回放交易日数
+MAX_LOADED_DAYS = 2
+
+
+class ReplayDay:
+    """
+    一个交易日的已记录快照（全市场行情 + 指数行情），按时刻还原当时的数据源。
+
+    只读本地快照文件，不请求上游；某个时刻的数据取该时刻（含）之前的最后一份快照。
+    同一时刻重复查询（同一次页面运行中多次读取）直接返回上次的结果。
+
+    参数:
+        day (date): 交易日
+        stocks (SnapshotHistory): 全市场行情快照
+        index (SnapshotHistory): 指数行情快照，没有记录时为 None
+        tz: 时区
+    """
+
+    def __init__(self, day, stocks, index, tz):
+        self.day = day
+        self.stocks = stocks
+        self.index = index
+        self.tz = tz
+        self._lock = threading.Lock()
+        self._breadth = None  # ((快照下标, top_percent, top_n), MarketBreadth)
+        self._index_snapshot = None  # (快照下标, IndexSnapshot)
+
+    @property
+    def start(self):
+        return datetime.fromtimestamp(self.stocks.times[0], self.tz)
+
+    @property
+    def end(self):
+        return datetime.fromtimestamp(self.stocks.times[-1], self.tz)
+
+    @staticmethod
+    def _position(history, at):
+        i = history.index_at(at.timestamp())
+        if i < 0:
+            raise LookupError(f"{at:%H:%M:%S} 之前没有记录的快照")
+        return i
+
+    def breadth(self, at, top_percent=5, top_n=10):
+        """按 at 时的全市场行情快照计算 MarketBreadth（与实时模式相同的计算）。"""
+        i = self._position(self.stocks, at)
+        key = (i, top_percent, top_n)
+        with self._lock:
+            if self._breadth is None or self._breadth[0] != key:
+                df = self.stocks.frame(i)
+                version = float(self.stocks.times[i])
+                self._breadth = (
+                    key,
+                    compute_breadth(df, version, top_percent=top_percent, top_n=top_n),
+                )
+            return self._breadth[1]
+
+    def index_snapshot(self, at):
+        """返回 at 时的 IndexSnapshot。"""
+        if self.index is None:
+            raise LookupError(f"{self.day} 没有记录指数行情")
+        i = self._position(self.index, at)
+        with self._lock:
+            if self._index_snapshot is None or self._index_snapshot[0] != i:
+                table = self.index.frame(i).set_index("代码")
+                self._index_snapshot = (
+                    i,
+                    IndexSnapshot(table, float(self.index.times[i])),
+                )
+            return self._index_snapshot[1]
+
+
+_loaded = OrderedDict()
+_loaded_lock = threading.Lock()
+
+
+def replay_days():
+    """返回有全市场行情记录、可以回放的交易日（降序）。"""
+    recorder = get_recorder("stocks")
+    if recorder is None:
+        return []
+    return sorted(recorder.days(), reverse=True)
+
+
+def load_replay_day(day, tz):
+    """
+    读取 day 的快照用于回放；最近使用的 MAX_LOADED_DAYS 个交易日保留在内存中，
+    页面 rerun 和播放时不重复读文件。没有记录时抛出 LookupError。
+    """
+    with _loaded_lock:
+        if day in _loaded:
+            _loaded.move_to_end(day)
+            return _loaded[day]
+
+        stocks_recorder = get_recorder("stocks")
+        index_recorder = get_recorder("index")
+        stocks = stocks_recorder.load(day) if stocks_recorder is not None else None
+        if stocks is None or len(stocks) == 0:
+            raise LookupError(f"{day} 没有记录的行情快照")
+        index = index_recorder.load(day) if index_recorder is not None else None
+        if index is not None and len(index) == 0:
+            index = None
+
+        replay = ReplayDay(day, stocks, index, tz)
+        _loaded[day] = replay
+        while len(_loaded) > MAX_LOADED_DAYS:
+            _loaded.popitem(last=False)
+        logger.info(
+            f"载入回放数据 {day}，全市场快照 {len(stocks)} 份，"
+            f"指数快照 {0 if index is None else len(index)} 份"
+        )
+        return replay
+
+
+def advance(at, speed, elapsed, end):
+    """
+    播放时把回放时刻向前推进 elapsed 秒 × speed 倍速，不超过 end；
+    跳过午间休市：越过 11:30 的部分从 13:00 接着推进，午休中的时刻从 13:00 开始推进。
+
+    返回:
+        (新的回放时刻, 是否已播放到结尾)
+    """
+    step = elapsed * speed
+    target = at.timestamp() + step
+    lunch_start = at.replace(hour=11, minute=30, second=0, microsecond=0)
+    lunch_end = at.replace(hour=13, minute=0, second=0, microsecond=0)
+    if at < lunch_start and target > lunch_start.timestamp():
+        target += (lunch_end - lunch_start).total_seconds()
+    elif lunch_start <= at < lunch_end:
+        target = lunch_end.timestamp() + step
+    target = min(target, end.timestamp())
+    return datetime.fromtimestamp(target, at.tzinfo), target >= end.timestamp()
@@ -0,0 +1,334 @@
+import json
+import os
+import struct
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from helpers import market_time_helper
+from log import logger
+
+# 记录的行情字段，全部按 float32 保存
+RECORD_FIELDS = ["最新价", "昨收", "涨跌幅", "成交额", "成交量", "总市值", "换手率"]
+INDEX_RECORD_FIELDS = ["最新价", "昨收", "涨跌幅", "成交额", "成交量"]
+
+# 记录的快照种类：{种类: (文件后缀, 字段)}
+RECORD_KINDS = {
+    "stocks": (".snap", RECORD_FIELDS),
+    "index": (".index.snap", INDEX_RECORD_FIELDS),
+}
+
+# 文件头：魔数 + uint32 长度 + JSON（字段列表、日期）
+MAGIC = b"SNAPREC1"
+# 每条记录的头：时间戳、新增字典项字节数、变化行数
+RECORD_HEADER = struct.Struct("<dII")
+
+
+class SnapshotHistory:
+    """
+    一个交易日的全市场快照历史。
+
+    参数:
+        times (np.ndarray): 每份快照的时间戳（秒，float64），升序
+        codes / names (np.ndarray): 股票字典，下标即股票编号
+        fields (list): 字段名
+        values (np.ndarray): float32，形状 (快照数, 股票数, 字段数)；
+            某只股票在第一次出现之前的值为 NaN
+    """
+
+    def __init__(self, times, codes, names, fields, values):
+        self.times = times
+        self.codes = codes
+        self.names = names
+        self.fields = list(fields)
+        self.values = values
+
+    def __len__(self):
+        return len(self.times)
+
+    def field(self, name):
+        """返回某个字段的 (快照数, 股票数) 视图。"""
+        return self.values[:, :, self.fields.index(name)]
+
+    def index_at(self, timestamp):
+        """返回 timestamp 时（含）最近一份快照的下标，早于第一份快照时返回 -1。"""
+        return int(np.searchsorted(self.times, timestamp, side="right")) - 1
+
+    def frame(self, i):
+        """把第 i 份快照还原为与 ak.stock_zh_a_spot_em() 相同列名的 DataFrame。"""
+        values = self.values[i]
+        present = ~np.isnan(values).all(axis=1)
+        df = pd.DataFrame(
+            values[present].astype(np.float64), columns=self.fields
+        )
+        df.insert(0, "名称", self.names[present])
+        df.insert(0, "代码", self.codes[present])
+        return df
+
+
+class _DayWriter:
+    """一个交易日文件的追加写入状态：股票字典和上一份快照的值。"""
+
+    def __init__(self, path, fields):
+        self.path = path
+        self.fields = list(fields)
+        self.index = {}  # 代码 -> 股票编号
+        self.state = np.empty((0, len(fields)), dtype=np.float32)
+        self.last_time = None
+
+    def restore(self, history, size):
+        self.index = {code: i for i, code in enumerate(history.codes)}
+        self.state = (
+            history.values[-1].copy()
+            if len(history)
+            else np.empty((0, len(self.fields)), dtype=np.float32)
+        )
+        self.last_time = float(history.times[-1]) if len(history) else None
+        # 截掉进程崩溃时写了一半的记录
+        if os.path.getsize(self.path) > size:
+            with open(self.path, "r+b") as f:
+                f.truncate(size)
+
+    def encode(self, df, timestamp):
+        """把快照编码为一条记录：新增字典项 + 与上一份快照相比有变化的行。"""
+        codes = df["代码"].astype(str).to_numpy()
+        names = df["名称"].astype(str).to_numpy()
+        new_entries = []
+        ids = np.empty(len(codes), dtype=np.int32)
+        for i, code in enumerate(codes):
+            idx = self.index.get(code)
+            if idx is None:
+                idx = self.index[code] = len(self.index)
+                new_entries.append(f"{code}\t{names[i]}")
+            ids[i] = idx
+        if len(self.index) > len(self.state):
+            grown = np.full((len(self.index), len(self.fields)), np.nan, np.float32)
+            grown[: len(self.state)] = self.state
+            self.state = grown
+
+        values = np.column_stack(
+            [
+                pd.to_numeric(df[name], errors="coerce").to_numpy(np.float32)
+                if name in df.columns
+                else np.full(len(df), np.nan, np.float32)
+                for name in self.fields
+            ]
+        ).astype(np.float32)
+        previous = self.state[ids]
+        same = (previous == values) | (np.isnan(previous) & np.isnan(values))
+        changed = ~same.all(axis=1)
+        rows, values = ids[changed], values[changed]
+        self.state[rows] = values
+        self.last_time = timestamp
+
+        entries = "\n".join(new_entries).encode("utf-8")
+        record = b"".join(
+            [
+                RECORD_HEADER.pack(timestamp, len(entries), len(rows)),
+                entries,
+                rows.astype("<i4").tobytes(),
+                values.astype("<f4").tobytes(),
+            ]
+        )
+        return record, len(rows)
+
+
+def _read_day(path):
+    """
+    读取一个交易日文件，返回 (SnapshotHistory, 最后一条完整记录的结束位置)。
+
+    按记录顺序回放增量：每条记录只包含变化的行，其余股票沿用上一份快照的值。
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[: len(MAGIC)] != MAGIC:
+        raise ValueError(f"不是快照记录文件：{path}")
+    offset = len(MAGIC)
+    (header_len,) = struct.unpack_from("<I", data, offset)
+    offset += 4
+    header = json.loads(data[offset : offset + header_len].decode("utf-8"))
+    offset += header_len
+    fields = header["fields"]
+    nfields = len(fields)
+
+    # 第一遍只解析记录头，确定快照数和股票数后一次性分配数组
+    records = []
+    codes, names = [], []
+    while offset + RECORD_HEADER.size <= len(data):
+        timestamp, entries_len, nrows = RECORD_HEADER.unpack_from(data, offset)
+        start = offset + RECORD_HEADER.size
+        rows_at = start + entries_len
+        values_at = rows_at + 4 * nrows
+        end = values_at + 4 * nrows * nfields
+        if end > len(data):
+            break  # 写了一半的记录
+        if entries_len:
+            for entry in data[start:rows_at].decode("utf-8").split("\n"):
+                code, _, name = entry.partition("\t")
+                codes.append(code)
+                names.append(name)
+        records.append((timestamp, rows_at, values_at, nrows))
+        offset = end
+
+    values = np.empty((len(records), len(codes), nfields), dtype=np.float32)
+    state = np.full((len(codes), nfields), np.nan, dtype=np.float32)
+    for t, (_, rows_at, values_at, nrows) in enumerate(records):
+        rows = np.frombuffer(data, "<i4", nrows, rows_at)
+        state[rows] = np.frombuffer(data, "<f4", nrows * nfields, values_at).reshape(
+            nrows, nfields
+        )
+        values[t] = state
+
+    history = SnapshotHistory(
+        np.array([r[0] for r in records], dtype=np.float64),
+        np.array(codes, dtype=object),
+        np.array(names, dtype=object),
+        fields,
+        values,
+    )
+    return history, offset
+
+
+class SnapshotRecorder:
+    """
+    全市场实时行情快照的列式记录器，每个交易日一个文件（directory/<YYYYMMDD><suffix>）。
+
+    股票代码按字典编码为整数编号，字段按 float32 保存；每条记录只写入与上一份快照
+    相比有变化的行，文件只追加不改写。交易时段内每 interval 秒最多记录一份，
+    开盘前和非交易日不记录。按 1 分钟记录一整天约几十 MB，读回为 (时间, 股票, 字段) 数组。
+
+    参数:
+        directory (str): 存储目录
+        fields (list): 记录的字段，默认 RECORD_FIELDS
+        interval (float): 两份记录之间的最短间隔（秒）
+        helper: MarketTimeHelper，用于判断交易日和交易时段
+        suffix (str): 文件后缀，同一目录下不同种类的快照用后缀区分
+    """
+
+    def __init__(
+        self, directory, fields=None, interval=60, helper=None, suffix=".snap"
+    ):
+        self.directory = directory
+        self.fields = list(fields or RECORD_FIELDS)
+        self.suffix = suffix
+        self.interval = interval
+        self.helper = helper or market_time_helper
+        self._writer = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, day):
+        return os.path.join(self.directory, f"{day:%Y%m%d}{self.suffix}")
+
+    def days(self):
+        """返回已有记录的交易日（升序）。"""
+        names = [
+            name[: -len(self.suffix)]
+            for name in os.listdir(self.directory)
+            if name.endswith(self.suffix)
+        ]
+        return sorted(
+            datetime.strptime(name, "%Y%m%d").date()
+            for name in names
+            if len(name) == 8 and name.isdigit()
+        )
+
+    def _open(self, day):
+        path = self.path(day)
+        writer = _DayWriter(path, self.fields)
+        if os.path.exists(path):
+            history, size = _read_day(path)
+            if history.fields != self.fields:
+                raise ValueError(f"{path} 的字段 {history.fields} 与配置不一致")
+            writer.restore(history, size)
+        else:
+            header = json.dumps(
+                {"fields": self.fields, "date": f"{day:%Y-%m-%d}"}, ensure_ascii=False
+            ).encode("utf-8")
+            with open(path, "wb") as f:
+                f.write(MAGIC + struct.pack("<I", len(header)) + header)
+        return writer
+
+    def record(self, df, timestamp):
+        """
+        记录一份快照。
+
+        参数:
+            df (pd.DataFrame): ak.stock_zh_a_spot_em() 的结果
+            timestamp (float): 快照的获取时间戳
+
+        返回:
+            int: 写入的变化行数；未记录（间隔太短、非交易时间、重复快照）时返回 0
+        """
+        if df is None or df.empty:
+            return 0
+        now = datetime.fromtimestamp(timestamp, self.helper.tz)
+        phase = self.helper.market_phase(now)
+        if phase == "pre_open" or not self.helper.is_trading_day(now.date()):
+            return 0
+
+        with self._lock:
+            writer = self._writer
+            if writer is None or writer.path != self.path(now.date()):
+                try:
+                    writer = self._writer = self._open(now.date())
+                except (OSError, ValueError) as e:
+                    logger.error(f"打开快照记录文件失败：{str(e)}")
+                    return 0
+            # 午休和收盘后不限间隔，保证记录到收盘数据（没有变化时不会写入）
+            if (
+                phase in ("morning", "afternoon")
+                and writer.last_time is not None
+                and timestamp - writer.last_time < self.interval
+            ):
+                return 0
+            record, nrows = writer.encode(df, timestamp)
+            if nrows == 0:
+                return 0
+            try:
+                with open(writer.path, "ab") as f:
+                    f.write(record)
+            except OSError as e:
+                logger.error(f"写入快照记录失败：{str(e)}")
+                # 内存中的状态已经更新，下次从文件重新恢复
+                self._writer = None
+                return 0
+        logger.info(
+            f"记录行情快照 {os.path.basename(writer.path)} {now:%H:%M:%S}，变化 {nrows} 行"
+        )
+        return nrows
+
+    def load(self, day):
+        """读取某个交易日的全部快照，没有记录时返回 None。"""
+        path = self.path(day)
+        if not os.path.exists(path):
+            return None
+        history, _ = _read_day(path)
+        return history
+
+
+_recorders = {}
+_recorders_lock = threading.Lock()
+
+
+def get_recorder(kind="stocks", directory=None):
+    """
+    返回进程内 directory 下 kind（见 RECORD_KINDS）快照的 SnapshotRecorder
+    （页面 rerun 后仍是同一个实例）。
+    默认目录为 SNAPSHOT_DIR，或 AKCACHE_DIR 下的 snapshots；目录无法创建时返回 None。
+    """
+    directory = directory or os.environ.get(
+        "SNAPSHOT_DIR",
+        os.path.join(os.environ.get("AKCACHE_DIR", ".akcache"), "snapshots"),
+    )
+    suffix, fields = RECORD_KINDS[kind]
+    key = (directory, kind)
+    with _recorders_lock:
+        if key not in _recorders:
+            try:
+                _recorders[key] = SnapshotRecorder(directory, fields, suffix=suffix)
+            except OSError as e:
+                logger.warning(f"行情快照记录不可用：{str(e)}")
+                _recorders[key] = None
+        return _recorders[key]
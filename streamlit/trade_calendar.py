@@ -0,0 +1,221 @@
+import os
+import threading
+import time
+from datetime import date, datetime
+
+import numpy as np
+import pytz
+from log import logger
+
+# 加载失败后至少间隔这么久（秒）才重试，期间按工作日判断
+RETRY_INTERVAL = 600
+
+
+def _to_day(day):
+    if isinstance(day, datetime):
+        day = day.date()
+    return np.datetime64(day, "D")
+
+
+def _to_date(value):
+    return value.astype("datetime64[D]").astype(date)
+
+
+class TradeCalendar:
+    """
+    交易日历：排好序的 datetime64[D] 数组，所有查询都是二分查找（O(log n)）。
+
+    超出日历范围的日期按工作日判断（日历通常只发布到当年年底）。
+    """
+
+    def __init__(self, dates, version=None):
+        dates = np.unique(np.asarray(dates, dtype="datetime64[D]"))
+        dates.flags.writeable = False
+        self.dates = dates
+        self.version = version if version is not None else time.time()
+
+    @classmethod
+    def from_frame(cls, df, column="trade_date", version=None):
+        """由 ak.tool_trade_date_hist_sina() 返回的 DataFrame 构建。"""
+        return cls(np.asarray(df[column], dtype="datetime64[D]"), version)
+
+    def covers(self, day):
+        day = _to_day(day)
+        return len(self.dates) > 0 and self.dates[0] <= day <= self.dates[-1]
+
+    def is_trade_date(self, day):
+        d = _to_day(day)
+        if not self.covers(d):
+            return bool(np.is_busday(d))
+        i = np.searchsorted(self.dates, d)
+        return bool(self.dates[i] == d)
+
+    def next_trade_date(self, day):
+        """返回 day 之后（不含 day）的第一个交易日。"""
+        d = _to_day(day)
+        i = np.searchsorted(self.dates, d, side="right")
+        if i < len(self.dates) and self.covers(d):
+            return _to_date(self.dates[i])
+        if len(self.dates) and d < self.dates[0]:
+            return _to_date(self.dates[0])
+        return _to_date(np.busday_offset(d, 1, roll="forward"))
+
+    def prev_trade_date(self, day, n=1):
+        """返回 day 之前（不含 day）的第 n 个交易日，默认为最后一个交易日。"""
+        d = _to_day(day)
+        if len(self.dates) == 0 or d <= self.dates[0]:
+            return _to_date(np.busday_offset(d, -n, roll="forward"))
+        if d > self.dates[-1]:
+            # 日历之后的部分按工作日推算，不够 n 天时再回到日历中
+            after = int(np.busday_count(self.dates[-1] + np.timedelta64(1, "D"), d))
+            if n <= after:
+                return _to_date(np.busday_offset(d, -n, roll="forward"))
+            n -= after
+            i = len(self.dates)
+        else:
+            i = int(np.searchsorted(self.dates, d, side="left"))
+        if i >= n:
+            return _to_date(self.dates[i - n])
+        return _to_date(np.busday_offset(self.dates[0], i - n, roll="forward"))
+
+    def trade_days_between(self, start, end):
+        """返回 [start, end] 之间（含两端）的交易日数量。"""
+        start, end = _to_day(start), _to_day(end)
+        if end < start:
+            return 0
+        if not (self.covers(start) and self.covers(end)):
+            return int(np.busday_count(start, end + np.timedelta64(1, "D")))
+        return int(
+            np.searchsorted(self.dates, end, side="right")
+            - np.searchsorted(self.dates, start, side="left")
+        )
+
+    def trade_dates(self, start, end):
+        """返回 [start, end] 之间的交易日（datetime64[D] 数组，只读）。"""
+        start, end = _to_day(start), _to_day(end)
+        return self.dates[
+            np.searchsorted(self.dates, start, side="left") : np.searchsorted(
+                self.dates, end, side="right"
+            )
+        ]
+
+
+def _load_from_akshare():
+    import akshare
+
+    return akshare.tool_trade_date_hist_sina()
+
+
+class TradeCalendarService:
+    """
+    每天加载一次交易日历并保存到本地文件（.npy）。
+
+    同一天内直接使用内存中的日历；本地文件是当天写入的就不再请求上游；
+    上游失败时使用本地文件中的旧日历，都没有时按工作日判断。
+
+    参数:
+        path (str): 本地日历文件路径
+        loader (callable): 返回包含 trade_date 列的 DataFrame，默认 ak.tool_trade_date_hist_sina
+    """
+
+    def __init__(self, path, loader=None, timezone="Asia/Shanghai"):
+        self.path = path
+        self.loader = loader or _load_from_akshare
+        self.tz = pytz.timezone(timezone)
+        self._calendar = None
+        self._loaded_on = None
+        self._retry_at = 0  # 加载失败后，在此时间之前直接使用失败时得到的日历
+        self._lock = threading.Lock()
+
+    def _today(self):
+        return datetime.now(self.tz).date()
+
+    def _read_local(self):
+        if not os.path.exists(self.path):
+            return None
+        try:
+            return TradeCalendar(np.load(self.path), os.path.getmtime(self.path))
+        except Exception as e:
+            logger.warning(f"读取本地交易日历 {self.path} 失败：{str(e)}")
+            return None
+
+    def _write_local(self, calendar):
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp.npy"
+            np.save(tmp_path, calendar.dates)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"保存交易日历到 {self.path} 失败：{str(e)}")
+
+    def calendar(self):
+        """返回当天的 TradeCalendar；无法获得任何日历时返回 None。"""
+        today = self._today()
+        if self._loaded_on == today or time.time() < self._retry_at:
+            return self._calendar
+        with self._lock:
+            if self._loaded_on == today or time.time() < self._retry_at:
+                return self._calendar
+
+            local = self._read_local()
+            if local is not None and (
+                datetime.fromtimestamp(local.version, self.tz).date() == today
+            ):
+                self._calendar, self._loaded_on = local, today
+                return local
+
+            try:
+                calendar = TradeCalendar.from_frame(self.loader())
+                self._write_local(calendar)
+                self._calendar, self._loaded_on = calendar, today
+                logger.info(f"交易日历加载完成，共 {len(calendar.dates)} 个交易日")
+                return calendar
+            except Exception as e:
+                logger.error(f"加载交易日历时发生错误：{str(e)}")
+                # 继续使用旧日历，不标记为当天已加载；RETRY_INTERVAL 内不再读本地文件、
+                # 不再请求上游，直接返回这次的结果
+                self._calendar = self._calendar or local
+                self._retry_at = time.time() + RETRY_INTERVAL
+                return self._calendar
+
+    def local_calendar(self):
+        """
+        返回内存中或本地文件中的 TradeCalendar，不请求上游（回放等离线场景）；
+        都没有时抛出 LookupError。
+        """
+        calendar = self._calendar or self._read_local()
+        if calendar is None:
+            raise LookupError(f"没有本地交易日历（{self.path}），无法离线推算交易日")
+        return calendar
+
+    @property
+    def version(self):
+        calendar = self.calendar()
+        return calendar.version if calendar is not None else None
+
+    def is_trade_date(self, day):
+        calendar = self.calendar()
+        if calendar is None:
+            return bool(np.is_busday(_to_day(day)))
+        return calendar.is_trade_date(day)
+
+    def next_trade_date(self, day):
+        calendar = self.calendar() or TradeCalendar([])
+        return calendar.next_trade_date(day)
+
+    def prev_trade_date(self, day, n=1):
+        calendar = self.calendar() or TradeCalendar([])
+        return calendar.prev_trade_date(day, n)
+
+    def trade_days_between(self, start, end):
+        calendar = self.calendar() or TradeCalendar([])
+        return calendar.trade_days_between(start, end)
+
+
+trade_calendar = TradeCalendarService(
+    os.environ.get(
+        "TRADE_CALENDAR_PATH",
+        os.path.join(os.environ.get("AKCACHE_DIR", ".akcache"), "trade_calendar.npy"),
+    )
+)
@@ -0,0 +1,185 @@
+import numpy as np
+import pandas as pd
+from log import logger
+
+# 每个交易日的连续竞价分钟数：上午 9:30-11:30，下午 13:00-15:00
+TRADING_MINUTES = 240
+MORNING_OPEN = 9 * 60 + 30
+MORNING_CLOSE = 11 * 60 + 30
+AFTERNOON_OPEN = 13 * 60
+
+SUPPORTED_PERIODS = (1, 5, 15)
+MAX_DAYS = 60
+
+
+def trading_minute(minutes_of_day):
+    """
+    把一天中的分钟数（如 10:00 -> 600）转换为开盘后经过的交易分钟数（跳过午休）。
+
+    参数:
+        minutes_of_day: 标量或 np.ndarray
+
+    返回:
+        与输入形状相同，9:30 为 0，11:30 和 13:00 都为 120，15:00 为 240
+    """
+    minutes_of_day = np.asarray(minutes_of_day)
+    return np.where(
+        minutes_of_day <= MORNING_CLOSE,
+        minutes_of_day - MORNING_OPEN,
+        np.maximum(minutes_of_day - AFTERNOON_OPEN, 0) + (MORNING_CLOSE - MORNING_OPEN),
+    )
+
+
+def bar_slots(timestamps, period):
+    """
+    按分钟 K 线的结束时间计算其在当天的时段序号（0 ~ 240/period-1）。
+
+    9:30 的集合竞价 K 线归入第一个时段。
+    """
+    timestamps = pd.DatetimeIndex(timestamps)
+    elapsed = trading_minute(timestamps.hour * 60 + timestamps.minute)
+    slots = np.ceil(elapsed / period).astype(np.int64) - 1
+    return np.clip(slots, 0, TRADING_MINUTES // period - 1)
+
+
+def day_weights(ndays, weighting="equal", halflife=5):
+    """
+    返回各交易日的权重，下标 0 为最早的一天，最后一个为最近的一天。
+
+    weighting:
+        "equal": 等权
+        "exp": 指数衰减，权重每隔 halflife 个交易日减半
+    """
+    if weighting == "equal":
+        weights = np.ones(ndays)
+    elif weighting == "exp":
+        age = np.arange(ndays - 1, -1, -1)
+        weights = 0.5 ** (age / halflife)
+    else:
+        raise ValueError(f"不支持的加权方式：{weighting}")
+    return weights / weights.sum()
+
+
+def compute_amount_curve(
+    bars, ndays, period=15, weighting="equal", halflife=5, before=None
+):
+    """
+    按分钟 K 线计算日内成交分布曲线：每个时段的成交量占全天成交量的比例，
+    在最近 ndays 个完整交易日上加权平均。
+
+    按 (交易日, 时段) 分组求和，全部为 NumPy 运算；K 线不完整的交易日
+    （有时段缺失或多出 K 线，如半日交易、数据缺失）不参与计算并记录日志。
+
+    参数:
+        bars (pd.DataFrame): 列 day（K 线结束时间）和 amount（成交量或成交额）
+        ndays (int): 使用的交易日天数，1 ~ MAX_DAYS
+        period (int): K 线周期（分钟），1 / 5 / 15
+        weighting (str): "equal" 等权或 "exp" 指数衰减
+        halflife (float): 指数衰减的半衰期（交易日）
+        before (date): 只使用该日期之前的数据，默认今天（当天数据不完整）
+
+    返回:
+        np.ndarray: 长度 240/period 的比例数组，和为 1
+    """
+    if period not in SUPPORTED_PERIODS:
+        raise ValueError(f"不支持的 K 线周期：{period}")
+    if not 1 <= ndays <= MAX_DAYS:
+        raise ValueError(f"天数应在 1 ~ {MAX_DAYS} 之间：{ndays}")
+    slots_per_day = TRADING_MINUTES // period
+
+    timestamps = pd.to_datetime(bars["day"])
+    amount = pd.to_numeric(bars["amount"], errors="coerce").to_numpy(np.float64)
+    before = pd.Timestamp(before or pd.Timestamp.today().date())
+    keep = (timestamps < before).to_numpy() & ~np.isnan(amount)
+    timestamps = pd.DatetimeIndex(timestamps[keep])
+    amount = amount[keep]
+
+    day_codes, days = pd.factorize(timestamps.normalize(), sort=True)
+    slots = bar_slots(timestamps, period)
+    flat = day_codes * slots_per_day + slots
+    size = len(days) * slots_per_day
+    totals = np.bincount(flat, weights=amount, minlength=size).reshape(
+        len(days), slots_per_day
+    )
+    counts = np.bincount(flat, minlength=size).reshape(len(days), slots_per_day)
+
+    # 每个时段恰好一根 K 线（第一个时段允许多一根集合竞价 K 线），全天成交量大于 0
+    complete = (
+        (counts > 0).all(axis=1)
+        & (counts.sum(axis=1) <= slots_per_day + 1)
+        & (totals.sum(axis=1) > 0)
+    )
+    incomplete = days[~complete]
+    if len(incomplete):
+        logger.warning(
+            f"以下交易日分钟数据不完整，不参与成交量曲线计算：{[d.date() for d in incomplete]}"
+        )
+
+    totals = totals[complete][-ndays:]
+    if len(totals) == 0:
+        raise ValueError("没有完整的交易日分钟数据")
+    if len(totals) < ndays:
+        logger.warning(f"完整交易日只有 {len(totals)} 天，少于要求的 {ndays} 天")
+
+    fractions = totals / totals.sum(axis=1, keepdims=True)
+    weights = day_weights(len(totals), weighting, halflife)
+    return weights @ fractions
+
+
+class CumulativeCurve:
+    """
+    开盘后每个交易分钟的累计成交比例（前缀和），用于 O(1) 预测全天成交额。
+
+    由成交量曲线构建一次（每天一次），时段内按线性插值展开到分钟，
+    by_minute[m] 为开盘后 m 个交易分钟（跳过午休）累计成交量占全天的比例，m = 0 ~ 240。
+
+    参数:
+        curve: compute_amount_curve() 返回的时段比例
+        period (int): curve 的时段长度（分钟）
+    """
+
+    def __init__(self, curve, period):
+        curve = np.asarray(curve, dtype=np.float64)
+        if len(curve) * period != TRADING_MINUTES:
+            raise ValueError(f"成交量曲线长度 {len(curve)} 与周期 {period} 分钟不匹配")
+        boundaries = np.concatenate([[0.0], np.cumsum(curve)])
+        boundaries /= boundaries[-1]
+        self.period = period
+        self.by_minute = np.interp(
+            np.arange(TRADING_MINUTES + 1),
+            np.arange(len(curve) + 1) * period,
+            boundaries,
+        )
+        self.by_minute.flags.writeable = False
+
+    def fraction(self, minutes):
+        """
+        返回开盘后 minutes 个交易分钟的累计成交比例。
+
+        参数:
+            minutes: 标量或数组，可以是小数（分钟之间线性插值），超出 0 ~ 240 时截断
+        """
+        minutes = np.clip(minutes, 0, TRADING_MINUTES)
+        if np.ndim(minutes) == 0 and float(minutes).is_integer():
+            return float(self.by_minute[int(minutes)])
+        return np.interp(minutes, np.arange(TRADING_MINUTES + 1), self.by_minute)
+
+    def forecast(self, amounts, minutes):
+        """
+        按当前累计成交额预测全天成交额，支持一次预测多个序列（上证、深证、任意指数）。
+
+        参数:
+            amounts: 标量或数组，截至当前的累计成交额
+            minutes: 标量或与 amounts 可广播的数组，开盘后的交易分钟数
+
+        返回:
+            与广播后的输入形状相同；开盘时（累计比例为 0）无法预测，返回当前成交额
+        """
+        if np.ndim(amounts) == 0 and np.ndim(minutes) == 0:
+            fraction = self.fraction(minutes)
+            return float(amounts) / fraction if fraction > 0 else float(amounts)
+        amounts = np.asarray(amounts, dtype=np.float64)
+        fraction = np.asarray(self.fraction(minutes), dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            result = np.where(fraction > 0, amounts / fraction, amounts)
+        return result if result.ndim else float(result)
@@ -0,0 +1,175 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from akcache.policy import REALTIME_TTL
+from helpers import market_time_helper
+from log import logger
+
+# 集合竞价阶段实时行情只缓存 REALTIME_TTL 秒，实时行情任务要在开盘前这么短的时间内预热，
+# 结果才能留到开盘
+REALTIME_BEFORE_OPEN = REALTIME_TTL // 2
+
+
+class WarmTask:
+    """
+    一个预热任务。
+
+    参数:
+        name (str): 任务名称，用于日志和报告
+        func (callable): 无参函数，调用后结果应进入缓存（通常调用带缓存的数据函数）
+        before_open (int): 可选，在开盘前多少秒预热，默认使用 CacheWarmer 的设置。
+            缓存有效期较短的任务（如实时行情，见 REALTIME_BEFORE_OPEN）需要设置得更晚
+    """
+
+    def __init__(self, name, func, before_open=None):
+        self.name = name
+        self.func = func
+        self.before_open = before_open
+
+
+class CacheWarmer:
+    """
+    开盘前缓存预热。
+
+    后台线程按市场时钟在开盘前 before_open 秒（任务可单独设置）、午后开盘后 after_lunch 秒
+    执行预热任务，让第一个打开页面的用户直接命中缓存。最近一次预热的耗时和失败情况
+    保存在 last_report。
+    """
+
+    def __init__(self, before_open=300, after_lunch=30, max_workers=4, helper=None):
+        self.before_open = before_open
+        self.after_lunch = after_lunch
+        self.max_workers = max_workers
+        self.helper = helper or market_time_helper
+        self.tasks = []
+        self.last_report = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def configure(self, tasks):
+        """替换预热任务列表。页面每次 rerun 都可以调用，保证任务引用最新的函数。"""
+        with self._lock:
+            self.tasks = list(tasks)
+
+    def next_warm_time(self, now):
+        """返回 now 之后的下一次预热时间。"""
+        warm = self.next_warm(now)
+        return warm[0] if warm is not None else None
+
+    def next_warm(self, now):
+        """
+        返回 now 之后的下一次预热。
+
+        返回:
+            tuple: (预热时间, 该时间要执行的任务列表)；没有任务或 14 天内没有交易日时返回 None
+        """
+        with self._lock:
+            tasks = list(self.tasks)
+        if not tasks:
+            return None
+        now = now.astimezone(self.helper.tz)
+        day = now.date()
+        for _ in range(14):
+            if self.helper.is_trading_day(day):
+                noon = self.helper.tz.localize(
+                    datetime.combine(day, datetime.strptime("12:00", "%H:%M").time())
+                )
+                market_open_time, _, lunch_end_time, _ = self.helper._get_market_times(
+                    noon
+                )
+                schedule = {}
+                for task in tasks:
+                    before_open = (
+                        task.before_open
+                        if task.before_open is not None
+                        else self.before_open
+                    )
+                    warm_time = market_open_time - timedelta(seconds=before_open)
+                    schedule.setdefault(warm_time, []).append(task)
+                schedule[lunch_end_time + timedelta(seconds=self.after_lunch)] = tasks
+                for warm_time in sorted(schedule):
+                    if warm_time > now:
+                        return warm_time, schedule[warm_time]
+            day += timedelta(days=1)
+        return None
+
+    def warm_now(self, tasks=None):
+        """
+        并行执行预热任务，默认执行所有任务。
+
+        返回:
+            dict: {"开始时间", "总耗时", "任务": [{"任务", "耗时", "错误"}...]}
+        """
+        if tasks is None:
+            with self._lock:
+                tasks = list(self.tasks)
+        started_at = datetime.now(self.helper.tz)
+        start = time.time()
+        logger.info(f"开始预热缓存，共 {len(tasks)} 个任务")
+
+        def run(task):
+            task_start = time.time()
+            try:
+                task.func()
+                error = None
+            except Exception as e:
+                error = str(e)
+                logger.error(f"预热任务 {task.name} 失败：{error}")
+            return {"任务": task.name, "耗时": time.time() - task_start, "错误": error}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(run, tasks))
+
+        report = {
+            "开始时间": started_at,
+            "总耗时": time.time() - start,
+            "任务": results,
+        }
+        failures = [r["任务"] for r in results if r["错误"] is not None]
+        logger.info(
+            f"缓存预热完成，耗时 {report['总耗时']:.2f} 秒，失败 {len(failures)} 个"
+            + (f"：{failures}" if failures else "")
+        )
+        self.last_report = report
+        return report
+
+    def start(self):
+        """启动后台预热线程，重复调用不会启动多个线程。"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="cache-warmer", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            now = datetime.now(self.helper.tz)
+            warm = self.next_warm(now)
+            if warm is None:
+                return
+            warm_time, tasks = warm
+            wait_seconds = (warm_time - now).total_seconds()
+            logger.info(f"下一次缓存预热时间: {warm_time:%Y-%m-%d %H:%M:%S}")
+            if self._stop.wait(wait_seconds):
+                return
+            try:
+                self.warm_now(tasks)
+            except Exception as e:
+                logger.error(f"缓存预热时发生错误：{str(e)}")
+
+
+_warmer = CacheWarmer()
+
+
+def get_warmer():
+    """返回进程内唯一的 CacheWarmer（页面 rerun 后仍是同一个实例）。"""
+    return _warmer
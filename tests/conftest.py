@@ -0,0 +1,46 @@
+import os
+import sys
+from datetime import datetime
+
+import numpy as np
+import pytest
+import pytz
+
+# 应用模块都是扁平导入的（from helpers import ...）。两套应用共用的模块（akcache、
+# helpers、trade_calendar 等）是相同的副本，从仓库根目录导入；streamlit 独有的模块
+# （limits、collector 等）从 streamlit 目录导入
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "streamlit"))
+sys.path.insert(0, ROOT)
+
+from helpers import MarketTimeHelper  # noqa: E402
+from trade_calendar import TradeCalendar  # noqa: E402
+
+TZ = pytz.timezone("Asia/Shanghai")
+
+
+@pytest.fixture
+def calendar():
+    """2025 年的交易日历：工作日，去掉国庆假期（10 月 1 日 ~ 8 日）。"""
+    days = np.arange("2025-01-02", "2026-01-01", dtype="datetime64[D]")
+    days = days[np.is_busday(days)]
+    holiday = (days >= np.datetime64("2025-10-01")) & (
+        days <= np.datetime64("2025-10-08")
+    )
+    return TradeCalendar(days[~holiday], version=0)
+
+
+@pytest.fixture
+def helper(calendar):
+    """使用固定交易日历的 MarketTimeHelper，测试不加载上游日历。"""
+    return MarketTimeHelper(calendar=calendar)
+
+
+@pytest.fixture
+def at():
+    """返回构造北京时间的函数：at(2025, 3, 11, 9, 30)。"""
+
+    def make(*args):
+        return TZ.localize(datetime(*args))
+
+    return make
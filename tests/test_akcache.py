@@ -0,0 +1,393 @@
+import threading
+import time
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+from akcache import CacheWrapper, cached, get_cache_stats
+from akcache.disk import DiskCache
+from akcache.keys import freeze, make_key
+from akcache.stats import CacheStats
+from akcache.singleflight import SingleFlight
+from akcache.sqlite_store import SQLiteCache
+from akcache.store import CacheStore
+
+
+def test_store_evicts_least_recently_used():
+    evicted = []
+    store = CacheStore(max_entries=2, on_evict=lambda key, entry: evicted.append(key))
+    store.set(("a",), 1, ttl=60)
+    store.set(("b",), 2, ttl=60)
+    store.get(("a",))  # a 变为最近使用
+    store.set(("c",), 3, ttl=60)
+
+    assert ("b",) not in store
+    assert ("a",) in store and ("c",) in store
+    assert evicted == [("b",)]
+    assert store.evictions == 1
+
+
+def test_store_evicts_by_bytes_and_skips_oversized_values():
+    df = pd.DataFrame({"x": range(1000)})
+    size = int(df.memory_usage(deep=True).sum())
+    store = CacheStore(max_entries=10, max_bytes=size * 2 + 1)
+    for name in ("a", "b", "c"):
+        store.set((name,), df.copy(), ttl=60)
+
+    assert len(store) == 2
+    assert ("a",) not in store
+    assert store.total_bytes == size * 2
+
+    big = pd.DataFrame({"x": range(10000)})
+    assert store.set(("big",), big, ttl=60) is None
+    assert ("big",) not in store
+
+
+def test_store_purges_expired_entries():
+    store = CacheStore()
+    now = time.time()
+    store.set(("old",), 1, ttl=10, timestamp=now - 20)
+    store.set(("stale",), 2, ttl=10, timestamp=now - 20, stale_ttl=60)
+    store.set(("new",), 3, ttl=10, timestamp=now)
+
+    assert store.purge_expired(now) == 1
+    assert ("old",) not in store
+    assert ("stale",) in store and ("new",) in store
+
+
+def test_single_flight_runs_concurrent_calls_once():
+    flight = SingleFlight()
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "value"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(flight.do("k", slow)))
+        for _ in range(8)
+    ]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.05)
+    assert flight.in_flight("k")
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == [1]
+    assert results == ["value"] * 8
+    assert not flight.in_flight("k")
+
+
+def test_single_flight_shares_errors_and_retries_afterwards():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        flight.do("k", fail)
+    assert flight.do("k", lambda: 1) == 1
+
+
+def test_wrapper_coalesces_concurrent_misses():
+    calls = []
+    release = threading.Event()
+
+    class Source:
+        def fetch(self, code):
+            calls.append(code)
+            release.wait(5)
+            return code * 2
+
+    wrapper = CacheWrapper(Source(), cache_time=60)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(wrapper.fetch(21)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == [21]
+    assert results == [42] * 8
+
+
+def test_disk_cache_round_trips_dataframes(tmp_path):
+    disk = DiskCache(str(tmp_path))
+    df = pd.DataFrame({"代码": ["000001", "600000"], "最新价": [10.5, 8.2]})
+    assert disk.set(("f",), df, ttl=60, timestamp=100.0, stale_ttl=30)
+    assert not disk.set(("g",), [1, 2], ttl=60)  # 非 DataFrame 不落盘
+
+    value, timestamp, ttl, stale_ttl = disk.get(("f",))
+    pd.testing.assert_frame_equal(value, df)
+    assert (timestamp, ttl, stale_ttl) == (100.0, 60, 30)
+    assert disk.get(("g",)) is None
+
+
+def test_disk_cache_purges_expired_and_corrupt_files(tmp_path):
+    disk = DiskCache(str(tmp_path))
+    df = pd.DataFrame({"x": [1]})
+    now = time.time()
+    disk.set(("old",), df, ttl=10, timestamp=now - 20)
+    disk.set(("stale",), df, ttl=10, timestamp=now - 20, stale_ttl=60)
+    disk.set(("new",), df, ttl=10, timestamp=now)
+    with open(disk.path_for(("bad",)), "wb") as f:
+        f.write(b"not arrow")
+
+    assert disk.purge_expired(now) == 2
+    assert disk.get(("old",)) is None
+    assert disk.get(("stale",)) is not None and disk.get(("new",)) is not None
+
+
+def test_wrapper_starts_warm_from_the_disk_tier(tmp_path):
+    calls = []
+
+    class Source:
+        def spot(self):
+            calls.append(1)
+            return pd.DataFrame({"x": [len(calls)]})
+
+    first = CacheWrapper(Source(), cache_time=60, disk_dir=str(tmp_path))
+    assert first.spot()["x"].iloc[0] == 1
+
+    # 模拟进程重启：新的实例没有内存缓存，从磁盘读取
+    restarted = CacheWrapper(Source(), cache_time=60, disk_dir=str(tmp_path))
+    assert restarted.spot()["x"].iloc[0] == 1
+    assert calls == [1]
+    assert restarted.stats_snapshot()[0]["磁盘命中"] == 1
+
+    # 有效期更短的实例不使用磁盘上的旧结果
+    short = CacheWrapper(Source(), cache_time=0.05, disk_dir=str(tmp_path))
+    time.sleep(0.1)
+    assert short.spot()["x"].iloc[0] == 2
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_stale_values_are_served_while_refreshing_in_background():
+    calls = []
+
+    class Source:
+        def spot(self):
+            calls.append(1)
+            return len(calls)
+
+    wrapper = CacheWrapper(Source(), cache_time=0.05, stale_ttl=60)
+    assert wrapper.spot() == 1
+    time.sleep(0.1)
+
+    # 过期但在 stale_ttl 内：立即返回旧值，后台刷新
+    assert wrapper.spot() == 1
+    assert wait_until(lambda: len(calls) == 2)
+    assert wait_until(lambda: wrapper.spot() == 2)
+    assert wrapper.stats_snapshot()[0]["旧值命中"] == 1
+
+
+def test_values_past_the_stale_window_are_reloaded():
+    calls = []
+
+    class Source:
+        def spot(self):
+            calls.append(1)
+            return len(calls)
+
+    wrapper = CacheWrapper(Source(), cache_time=0.02, stale_ttl=0.03)
+    assert wrapper.spot() == 1
+    time.sleep(0.1)
+    assert wrapper.spot() == 2
+
+
+def test_cached_decorator_exposes_fetched_at_and_clear():
+    calls = []
+
+    @cached(ttl=60)
+    def load(code):
+        calls.append(code)
+        return code
+
+    assert load.fetched_at("a") is None
+    before = time.time()
+    assert load("a") == "a" and load("a") == "a"
+    assert calls == ["a"]
+    assert load.fetched_at("a") >= before
+
+    load.clear()
+    assert load("a") == "a"
+    assert calls == ["a", "a"]
+
+
+def test_make_key_is_canonical_for_argument_order():
+    def f(a, b=2, *, c=3):
+        return a
+
+    key = make_key("f", f, (1,), {})
+    assert make_key("f", f, (1, 2), {}) == key
+    assert make_key("f", f, (), {"b": 2, "a": 1}) == key
+    assert make_key("f", f, (1,), {"c": 3}) == key
+    assert make_key("f", f, (1,), {"c": 4}) != key
+
+
+def test_make_key_falls_back_without_signature():
+    key = make_key("g", None, (1, [2]), {"y": 1, "x": 2})
+    assert key == make_key("g", None, (1, (2,)), {"x": 2, "y": 1})
+
+
+def test_freeze_is_order_independent_and_content_based():
+    assert freeze({"a": 1, "b": [1, 2]}) == freeze({"b": [1, 2], "a": 1})
+    assert freeze({3, 1, 2}) == freeze({1, 2, 3})
+    assert freeze([1, 2]) == freeze((1, 2))
+
+    df = pd.DataFrame({"x": [1, 2]})
+    assert freeze(df) == freeze(df.copy())
+    assert freeze(df) != freeze(pd.DataFrame({"x": [1, 3]}))
+    assert freeze(df) != freeze(pd.DataFrame({"y": [1, 2]}))
+    hash(freeze({"df": df, "items": [df]}))
+
+
+def test_cache_stats_counts_lookups_and_latency_buckets():
+    stats = CacheStats()
+    stats.record("spot", "hits")
+    stats.record("spot", "hits")
+    stats.record("spot", "stale_hits")
+    stats.record("spot", "misses")
+    stats.record_upstream("spot", 0.2)
+    stats.record_upstream("spot", 45, error=True)
+
+    (row,) = stats.snapshot({"spot": (1, 1024)})
+    assert row["函数"] == "spot"
+    assert row["命中率"] == pytest.approx(3 / 4)
+    assert (row["上游调用"], row["上游失败"]) == (2, 1)
+    assert (row["缓存条目"], row["占用字节"]) == (1, 1024)
+    assert row["平均耗时"] == pytest.approx(22.6)
+    assert row["最大耗时"] == 45
+    assert row["耗时分布"]["≤0.25s"] == 1
+    assert row["耗时分布"][">30s"] == 1
+    assert sum(row["耗时分布"].values()) == 2
+
+    stats.reset()
+    assert stats.snapshot() == []
+
+
+def test_wrapper_records_hits_misses_and_upstream_errors():
+    class Source:
+        def spot(self):
+            return 1
+
+        def fail(self):
+            raise ValueError("boom")
+
+    wrapper = CacheWrapper(Source(), cache_time=60)
+    wrapper.spot()
+    wrapper.spot()
+    with pytest.raises(ValueError):
+        wrapper.fail()
+
+    rows = {row["函数"]: row for row in wrapper.stats_snapshot()}
+    assert (rows["spot"]["命中"], rows["spot"]["未命中"]) == (1, 1)
+    assert rows["spot"]["上游调用"] == 1 and rows["spot"]["缓存条目"] == 1
+    assert (rows["fail"]["上游调用"], rows["fail"]["上游失败"]) == (1, 1)
+
+    stats = get_cache_stats()
+    assert {"缓存", "函数", "命中率"} <= set(stats.columns)
+    assert ((stats["缓存"] == "Source") & (stats["函数"] == "spot")).any()
+
+
+def test_shared_entries_use_the_reading_wrappers_ttl():
+    module = types.ModuleType("akcache_ttl_test")
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return len(calls)
+
+    module.fetch = fetch
+    long_lived = CacheWrapper(module, cache_time=600)
+    short_lived = CacheWrapper(module, cache_time=0.05)
+
+    assert long_lived.fetch() == 1
+    time.sleep(0.1)
+    # 条目由有效期 600 秒的实例写入，有效期更短的实例仍需重新请求
+    assert short_lived.fetch() == 2
+    assert long_lived.fetch() == 2
+    assert len(calls) == 2
+
+
+def test_wrappers_of_one_module_share_a_cache():
+    module = types.ModuleType("akcache_shared_test")
+    calls = []
+    module.fetch = lambda: calls.append(1) or len(calls)
+
+    first = CacheWrapper(module, cache_time=60)
+    second = CacheWrapper(module, cache_time=60)
+    assert first.shared is second.shared
+    assert first.fetch() == second.fetch() == 1
+    assert calls == [1]
+
+
+def test_sqlite_tier_is_shared_across_processes(tmp_path):
+    calls = []
+
+    class Source:
+        def spot(self):
+            calls.append(1)
+            return {"rows": len(calls)}
+
+    # 两个不共享内存缓存的实例相当于两个进程，共用同一个 SQLite 文件
+    options = dict(cache_time=60, disk_dir=str(tmp_path), disk_backend="sqlite")
+    first = CacheWrapper(Source(), **options)
+    second = CacheWrapper(Source(), **options)
+    assert first.spot() == {"rows": 1}
+    assert second.spot() == {"rows": 1}
+    assert calls == [1]
+
+    # 租约同一时间只属于一个进程，释放后其他进程才能获得
+    path = str(tmp_path / "akcache.sqlite3")
+    owner, other = SQLiteCache(path), SQLiteCache(path)
+    assert owner.acquire(("k",))
+    assert not other.acquire(("k",))
+    owner.release(("k",))
+    assert other.acquire(("k",))
+
+
+def test_shared_module_wrappers_hand_out_protected_views():
+    module = types.ModuleType("akcache_protect_test")
+    module.frame = lambda: pd.DataFrame({"x": [1, 2]})
+    module.array = lambda: np.arange(3)
+
+    # 与 index_amount_compare 一样不传 copy_on_write：共享缓存默认返回保护视图
+    wrapper = CacheWrapper(module, cache_time=60)
+    df = wrapper.frame()
+    df["y"] = 0
+    assert list(wrapper.frame().columns) == ["x"]
+    with pytest.raises(ValueError):
+        wrapper.array()[0] = 10
+    assert wrapper.array()[0] == 0
+
+    # 非共享实例默认原样返回，也可以显式开启
+    class Source:
+        def frame(self):
+            return pd.DataFrame({"x": [1, 2]})
+
+    plain = CacheWrapper(Source(), cache_time=60)
+    assert plain.frame() is plain.frame()
+    protected = CacheWrapper(Source(), cache_time=60, copy_on_write=True)
+    assert protected.frame() is not protected.frame()
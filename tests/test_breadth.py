@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+from breadth import compute_breadth
+
+
+@pytest.fixture
+def spot():
+    rng = np.random.default_rng(7)
+    n = 50
+    prev_close = rng.uniform(5, 50, n).round(2)
+    change = rng.uniform(-9, 9, n).round(2)
+    change[3] = np.nan  # 停牌
+    change[5] = 40.0  # 上市首日，不计入平均涨幅和涨停
+    names = [f"股票{i}" for i in range(n)]
+    names[5] = "N股票5"
+    return pd.DataFrame(
+        {
+            "代码": [f"{600000 + i}" for i in range(n)],
+            "名称": names,
+            "最新价": (prev_close * (1 + np.nan_to_num(change) / 100)).round(2),
+            "昨收": prev_close,
+            "涨跌幅": change,
+            "成交额": rng.uniform(1e7, 1e9, n),
+            "成交量": rng.uniform(1e5, 1e7, n),
+            "总市值": rng.uniform(1e9, 1e11, n),
+            "换手率": rng.uniform(0, 10, n),
+        }
+    )
+
+
+def test_breadth_matches_per_metric_pandas(spot):
+    breadth = compute_breadth(spot, version=1.0, top_percent=10, top_n=5)
+    change = spot["涨跌幅"]
+
+    assert breadth.version == 1.0 and breadth.stock_count == 50
+    middle = change.sort_values(na_position="last").iloc[25]
+    assert breadth.median_change == middle
+    assert breadth.up_count == (change >= 0).sum()
+    assert breadth.down_count == (change < 0).sum()
+    assert breadth.up_ratio == pytest.approx(breadth.up_count / 50 * 100)
+
+    top = spot.sort_values("成交额", ascending=False).head(5)
+    weighted = (top["涨跌幅"] * top["总市值"]).sum() / top["总市值"].sum()
+    assert breadth.top_weighted_change == pytest.approx(weighted)
+    below = spot[spot["涨跌幅"] < 31].sort_values("成交额", ascending=False)
+    assert breadth.top_avg_change == pytest.approx(below["涨跌幅"].head(5).mean())
+
+    volume = spot["成交量"]
+    expected = volume.sort_values(ascending=False).head(5).sum() / volume.sum()
+    assert breadth.crowdedness == pytest.approx(expected)
+
+    assert breadth.top_n == 5
+    assert list(breadth.top_stocks["代码"]) == list(top["代码"])
+    assert breadth.top_n_total_market_value == pytest.approx(top["总市值"].sum() / 1e8)
+    assert breadth.top_n_avg_market_value == pytest.approx(top["总市值"].mean() / 1e8)
+
+
+def test_breadth_counts_limit_moves(spot):
+    spot.loc[[0, 1], "昨收"] = 10.0
+    spot.loc[[0, 1], "最新价"] = [11.0, 9.0]
+    breadth = compute_breadth(spot, version=1.0)
+    assert (breadth.limit_up_count, breadth.limit_down_count) == (1, 1)
+
+
+def test_empty_snapshot_gives_empty_breadth():
+    breadth = compute_breadth(pd.DataFrame(), version=2.0, top_percent=5, top_n=10)
+    assert breadth.stock_count == 0 and breadth.top_stocks is None
+    assert breadth.version == 2.0
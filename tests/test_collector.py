@@ -0,0 +1,87 @@
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+from collector import SnapshotCollector
+from helpers import CLOSE_GRACE_SECONDS
+
+
+@pytest.fixture
+def collector(helper):
+    return SnapshotCollector(interval=30, timeout=5, helper=helper)
+
+
+def test_snapshots_keep_the_last_good_value_of_failed_sources(collector):
+    state = {"fail": False}
+
+    def flaky():
+        if state["fail"]:
+            raise ConnectionError("upstream down")
+        return "行情"
+
+    collector.configure({"行情": flaky, "指数": lambda: "指数"})
+    first = collector.collect_now()
+    assert first.version == 1 and dict(first.values) == {"行情": "行情", "指数": "指数"}
+    assert collector.latest() is first
+
+    state["fail"] = True
+    second = collector.collect_now()
+    assert second.version == 2
+    assert second.values["行情"] == "行情"
+    assert second.errors == {"行情": "upstream down"}
+    assert second.updated_at["行情"] == first.updated_at["行情"]
+    # 已发布的快照不可修改
+    with pytest.raises(TypeError):
+        second.values["行情"] = None
+
+
+def test_freshness_follows_the_data_version_not_the_collect_time(collector):
+    fetched_at = time.time() - 400  # 数据源返回的是缓存中的旧值
+    collector.configure(
+        {
+            "全市场行情": lambda: SimpleNamespace(version=fetched_at),
+            "无版本": lambda: "value",
+        }
+    )
+    snapshot = collector.collect_now()
+    assert snapshot.updated_at["全市场行情"] == fetched_at
+    assert snapshot.source_age("全市场行情") >= 400
+    assert snapshot.stale_sources(90) == {"全市场行情": (fetched_at, None)}
+
+
+def test_latest_honours_max_age(collector):
+    collector.configure({"指数": lambda: 1})
+    assert collector.latest() is None
+    collector.collect_now()
+    assert collector.latest(max_age=60) is not None
+    assert collector.latest(max_age=-1) is None
+
+
+@pytest.mark.parametrize(
+    "moment, was_trading, expected",
+    [
+        ((2025, 3, 11, 10, 0), True, 30),
+        # 刚进入午休：立即再采集一次，然后休眠到 13:00
+        ((2025, 3, 11, 11, 30), True, 0),
+        ((2025, 3, 11, 11, 30, 5), False, 90 * 60 - 5),
+        # 收盘后在宽限期内继续轮询，取得收盘集合竞价的结果
+        ((2025, 3, 11, 15, 0), True, 0),
+        ((2025, 3, 11, 15, 0, 5), False, 30),
+        ((2025, 3, 11, 15, 2, 59), False, 30),
+        # 宽限期之后休眠到下一个交易日开盘
+        ((2025, 3, 11, 15, 3), False, (18 * 60 + 27) * 60),
+        ((2025, 3, 15, 10, 0), False, (47 * 60 + 30) * 60),
+    ],
+)
+def test_next_delay(collector, at, moment, was_trading, expected):
+    assert collector.next_delay(at(*moment), was_trading) == expected
+
+
+def test_close_grace_window(helper, at):
+    assert helper.seconds_after_close(at(2025, 3, 11, 15, 1)) == 60
+    assert helper.in_close_grace(at(2025, 3, 11, 15, 1))
+    late = at(2025, 3, 11, 15, 0) + timedelta(seconds=CLOSE_GRACE_SECONDS)
+    assert not helper.in_close_grace(late)
+    assert not helper.in_close_grace(at(2025, 3, 11, 14, 59))
+    assert helper.seconds_after_close(at(2025, 3, 15, 15, 1)) is None
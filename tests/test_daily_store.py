@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("akshare")
+
+from daily_store import DailyBars, DailyBarStore, index_symbol  # noqa: E402
+
+
+@pytest.fixture
+def bars():
+    dates = pd.bdate_range("2025-03-03", periods=10)
+    amount = np.arange(1, 11, dtype=np.float64) * 100
+    close = np.linspace(10, 11.8, 10)
+    return DailyBars(
+        pd.DataFrame({"date": dates, "close": close, "amount": amount})
+    )
+
+
+def test_prefix_sums_match_direct_means(bars):
+    for n in range(1, 12):
+        for end in range(len(bars) + 1):
+            before = bars.dates[end] if end < len(bars) else None
+            window = bars.amount[max(0, end - n) : end]
+            expected = window.mean() if len(window) else 0.0
+            assert bars.mean_amount(n, before=before) == pytest.approx(expected)
+
+
+def test_before_is_exclusive_and_accepts_non_trading_days(bars):
+    # 2025-03-08 是周六：之前最近 2 个交易日是 3 月 6 日、7 日
+    assert bars.mean_amount(2, before=pd.Timestamp("2025-03-08").date()) == 450
+    assert bars.mean_amount(2, before=pd.Timestamp("2025-03-07").date()) == 350
+
+
+def test_returns(bars):
+    assert bars.returns(1) == pytest.approx(11.8 / 11.6 - 1)
+    assert np.isnan(bars.returns(10))
+    rolling = bars.rolling_returns(2)
+    assert rolling.isna().sum() == 2
+    assert rolling.iloc[-1] == pytest.approx(11.8 / 11.4 - 1)
+
+
+def daily_frame(days, start=10.0):
+    return pd.DataFrame(
+        {
+            "date": pd.to_datetime(days),
+            "close": start + np.arange(len(days)),
+            "amount": 100.0 * (np.arange(len(days)) + 1),
+        }
+    )
+
+
+def test_index_symbols_get_their_exchange_prefix():
+    assert index_symbol("000300") == "sh000300"
+    assert index_symbol("000852") == "sh000852"
+    assert index_symbol("000015") == "sh000015"
+    assert index_symbol("399006") == "sz399006"
+
+
+def test_failed_updates_back_off_to_local_data(tmp_path, helper, at):
+    store = DailyBarStore(str(tmp_path), helper=helper)
+    history = daily_frame(["2025-03-07", "2025-03-10"])
+    store.get("sh000001", lambda start: history, now=at(2025, 3, 10, 16, 0))
+    calls = []
+
+    def fail(start):
+        calls.append(start)
+        raise ConnectionError("upstream down")
+
+    for _ in range(3):
+        bars = store.get("sh000001", fail, now=at(2025, 3, 11, 16, 0))
+        assert len(bars) == 2
+    assert calls == ["20250311"]
+
+
+def test_today_is_appended_during_the_session_only(tmp_path, helper, at):
+    store = DailyBarStore(str(tmp_path), helper=helper)
+    history = daily_frame(["2025-03-07", "2025-03-10"])
+
+    def fetch(start):
+        return pd.concat(
+            [history, daily_frame(["2025-03-11"], start=20.0)], ignore_index=True
+        )
+
+    now = at(2025, 3, 11, 10, 0)
+    bars = store.get("sh000001", fetch, now=now, include_today=True)
+    assert bars.dates[-1] == np.datetime64("2025-03-11")
+    assert bars.close[-1] == 20.0
+    # 当天未收盘的 K 线不入库
+    assert len(store.get("sh000001", fetch, now=now)) == 2
+    before_open = store.get(
+        "sh000001", fetch, now=at(2025, 3, 11, 9, 0), include_today=True
+    )
+    assert len(before_open) == 2
@@ -0,0 +1,56 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fanout import FetchTask, fetch_all
+
+
+@pytest.fixture
+def executor():
+    executor = ThreadPoolExecutor(max_workers=4)
+    yield executor
+    executor.shutdown(wait=False)
+
+
+def test_tasks_run_concurrently(executor):
+    barrier = threading.Barrier(3, timeout=5)
+    tasks = [FetchTask(name, lambda: barrier.wait() is not None) for name in "abc"]
+    start = time.time()
+    results = fetch_all(tasks, executor=executor)
+
+    # 三个任务互相等待，串行执行会一直等到超时
+    assert all(result.ok and result.value for result in results.values())
+    assert time.time() - start < 5
+
+
+def test_timeouts_and_errors_only_mark_their_own_task(executor):
+    release = threading.Event()
+
+    def fail():
+        raise ValueError("bad response")
+
+    tasks = [
+        FetchTask("慢", lambda: release.wait(5), timeout=0.1),
+        FetchTask("失败", fail),
+        FetchTask("正常", lambda: 42),
+    ]
+    start = time.time()
+    results = fetch_all(tasks, executor=executor)
+    release.set()
+
+    assert time.time() - start < 2
+    assert not results["慢"].ok and results["慢"].error == "超时"
+    assert results["失败"].error == "bad response"
+    assert results["正常"].ok and results["正常"].value == 42
+
+
+def test_timeout_counts_from_submission(executor):
+    # 排在后面的任务在等待前面的任务时已经开始计时，总耗时不是各超时之和
+    tasks = [
+        FetchTask(name, lambda: time.sleep(1), timeout=0.2) for name in ("a", "b", "c")
+    ]
+    start = time.time()
+    results = fetch_all(tasks, executor=executor)
+    assert time.time() - start < 0.6
+    assert all(result.error == "超时" for result in results.values())
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+from index_snapshot import fetch_index_snapshot
+
+SERIES = {
+    "上证系列指数": [
+        ("000001", "上证指数", 3300.5, 4.1e11),
+        ("000015", "红利指数", 3200.0, 1e10),
+    ],
+    "深证系列指数": [("399001", "深证成指", 10500.2, 5.2e11)],
+    # 中证系列和上证系列有重复的代码，以靠前的系列为准
+    "中证系列指数": [
+        ("000852", "中证1000", 6000.0, 2e11),
+        ("000015", "重复", 0.0, 0.0),
+    ],
+}
+
+
+class FakeAk:
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.calls = []
+
+    def stock_zh_index_spot_em(self, symbol):
+        self.calls.append(symbol)
+        if symbol in self.fail:
+            raise ConnectionError(f"{symbol} 超时")
+        rows = SERIES.get(symbol, [])
+        return pd.DataFrame(rows, columns=["代码", "名称", "最新价", "成交额"])
+
+    def fetched_at(self, name, symbol):
+        return {"上证系列指数": 100.0, "深证系列指数": 90.0}.get(symbol)
+
+
+def test_snapshot_merges_series_once_per_lookup():
+    ak = FakeAk()
+    snapshot = fetch_index_snapshot(ak, series=list(SERIES))
+
+    assert sorted(ak.calls) == sorted(SERIES)
+    assert snapshot.price("000001") == 3300.5
+    assert snapshot.amount("399001") == 5.2e11
+    assert snapshot.price("000015") == 3200.0
+    assert "000852" in snapshot and "999999" not in snapshot
+    with pytest.raises(KeyError):
+        snapshot.amount("999999")
+    # 版本取各系列中最早的获取时间
+    assert snapshot.version == 90.0
+    assert snapshot.errors == {}
+
+
+def test_partial_failures_are_reported_not_raised():
+    snapshot = fetch_index_snapshot(FakeAk(fail={"深证系列指数"}), series=list(SERIES))
+    assert "399001" not in snapshot
+    assert snapshot.price("000001") == 3300.5
+    assert set(snapshot.errors) == {"深证系列指数"}
+
+
+def test_all_series_failing_raises():
+    with pytest.raises(RuntimeError):
+        fetch_index_snapshot(FakeAk(fail=set(SERIES)), series=list(SERIES))
+
+
+def test_non_numeric_values_become_nan():
+    class Dirty(FakeAk):
+        def stock_zh_index_spot_em(self, symbol):
+            return pd.DataFrame(
+                [("000001", "上证指数", "-", "-")],
+                columns=["代码", "名称", "最新价", "成交额"],
+            )
+
+    snapshot = fetch_index_snapshot(Dirty(), series=["上证系列指数"])
+    assert np.isnan(snapshot.price("000001"))
@@ -0,0 +1,121 @@
+from datetime import timedelta
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+from helpers import CLOSE_GRACE_SECONDS
+from intraday import STOCK_HEADROOM, IntradayBuffer, minute_label
+
+
+def snapshot(prices, changes=None):
+    codes = [f"{600000 + i}" for i in range(len(prices))]
+    return pd.DataFrame(
+        {
+            "代码": codes,
+            "名称": [f"股票{i}" for i in range(len(prices))],
+            "最新价": prices,
+            "涨跌幅": changes if changes is not None else [0.0] * len(prices),
+        }
+    )
+
+
+@pytest.fixture
+def buffer(helper):
+    return IntradayBuffer(max_stocks=1000, helper=helper)
+
+
+def test_snapshots_land_in_trading_minute_slots(buffer, at):
+    assert buffer.update(snapshot([10.0, 20.0]), at(2025, 3, 11, 9, 30).timestamp()) == 0
+    assert buffer.update(snapshot([11.0, 19.0]), at(2025, 3, 11, 9, 40).timestamp()) == 10
+    # 午休计入 11:30，下午从 121 开始
+    assert buffer.update(snapshot([12.0, 18.0]), at(2025, 3, 11, 12, 0).timestamp()) == 120
+    assert buffer.update(snapshot([13.0, 17.0]), at(2025, 3, 11, 13, 5).timestamp()) == 125
+    assert minute_label(125) == "13:05"
+
+    assert buffer.field_at("最新价").tolist() == [13.0, 17.0]
+    assert buffer.field_at("最新价", 10).tolist() == [11.0, 19.0]
+    # 没有刷新的分钟取之前最近一次
+    assert buffer.field_at("最新价", 5).tolist() == [10.0, 20.0]
+    # 更旧的快照不覆盖
+    assert buffer.update(snapshot([1.0, 1.0]), at(2025, 3, 11, 9, 35).timestamp()) is None
+
+
+def test_reads_return_copies(buffer, at):
+    buffer.update(snapshot([10.0]), at(2025, 3, 11, 9, 30).timestamp())
+    prices = buffer.field_at("最新价")
+    buffer.update(snapshot([12.0]), at(2025, 3, 11, 9, 30, 40).timestamp())
+    assert prices.tolist() == [10.0]
+    assert buffer.field_at("最新价").tolist() == [12.0]
+
+
+def test_after_close_snapshots_do_not_overwrite_the_close(buffer, at):
+    close = at(2025, 3, 11, 15, 0)
+    buffer.update(snapshot([10.0]), at(2025, 3, 11, 14, 59).timestamp())
+    # 收盘集合竞价的快照在宽限期内，计入 15:00
+    grace = close + timedelta(seconds=CLOSE_GRACE_SECONDS - 30)
+    assert buffer.update(snapshot([10.5]), grace.timestamp()) == 240
+    # 宽限期之后（盘后、晚上）的快照不再写入
+    late = close + timedelta(seconds=CLOSE_GRACE_SECONDS + 30)
+    assert buffer.update(snapshot([99.0]), late.timestamp()) is None
+    assert buffer.update(snapshot([99.0]), at(2025, 3, 11, 21, 0).timestamp()) is None
+    assert buffer.field_at("最新价").tolist() == [10.5]
+
+
+def test_no_writes_before_open_or_on_holidays(buffer, at):
+    assert buffer.update(snapshot([10.0]), at(2025, 3, 11, 9, 20).timestamp()) is None
+    assert buffer.update(snapshot([10.0]), at(2025, 10, 2, 10, 0).timestamp()) is None
+    assert buffer.values is None
+    assert buffer.field_at("最新价") is None
+
+
+def test_changes_and_stock_changes(buffer, at):
+    buffer.update(snapshot([10.0, 20.0]), at(2025, 3, 11, 10, 0).timestamp())
+    buffer.update(snapshot([11.0, 19.0]), at(2025, 3, 11, 10, 5).timestamp())
+    np.testing.assert_allclose(buffer.changes(5), [10.0, -5.0], rtol=1e-5)
+    # 数据不足 30 分钟
+    assert np.isnan(buffer.changes(30)).all()
+
+    frame = buffer.stock_changes(["600001", "000001"], periods=(5,))
+    assert frame.loc["600001", "5分钟涨幅"] == pytest.approx(-5.0)
+    assert np.isnan(frame.loc["000001", "5分钟涨幅"])
+
+
+def test_summary_frame_and_median(buffer, at):
+    breadth = SimpleNamespace(
+        up_ratio=0.6, limit_up_count=3, limit_down_count=1, median_change=0.5
+    )
+    buffer.update(
+        snapshot([10.0, 20.0, 30.0], [1.0, 2.0, 3.0]),
+        at(2025, 3, 11, 9, 31).timestamp(),
+        breadth,
+    )
+    assert buffer.median_change_at() == pytest.approx(2.0)
+    frame = buffer.summary_frame()
+    assert list(frame.index) == ["09:31"]
+    assert frame.iloc[0].tolist() == pytest.approx([0.6, 3, 1, 0.5])
+
+
+def test_buffer_allocates_on_first_write_and_grows(helper, at):
+    buffer = IntradayBuffer(max_stocks=5000, helper=helper)
+    assert buffer.values is None
+    assert buffer.field_at("最新价") is None
+    assert buffer.summary_frame().empty
+
+    buffer.update(snapshot([10.0] * 10), at(2025, 3, 11, 9, 30).timestamp())
+    assert buffer.values.shape[1] == 10 + STOCK_HEADROOM
+
+    prices = [float(i) for i in range(400)]
+    buffer.update(snapshot(prices), at(2025, 3, 11, 9, 31).timestamp())
+    assert buffer.values.shape[1] >= 400
+    # 扩容保留已写入的数据
+    assert buffer.field_at("最新价", 0).tolist()[:10] == [10.0] * 10
+    assert buffer.field_at("最新价").tolist() == prices
+
+
+def test_new_day_clears_the_buffer(buffer, at):
+    buffer.update(snapshot([10.0]), at(2025, 3, 11, 14, 0).timestamp())
+    buffer.update(snapshot([12.0]), at(2025, 3, 12, 9, 30).timestamp())
+    assert buffer.latest_minute == 0
+    assert buffer.field_at("最新价", 180).tolist() == [12.0]
+    assert buffer.summary_frame().index.tolist() == ["09:30"]
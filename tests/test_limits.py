@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+from breadth import compute_breadth
+from limits import (
+    LIMIT_DOWN,
+    LIMIT_UP,
+    bj_board,
+    classify_limits,
+    limit_prices,
+    limit_ratios,
+    round_to_tick,
+)
+
+
+@pytest.mark.parametrize(
+    "code, name, expected",
+    [
+        ("600000", "浦发银行", 0.10),
+        ("000001", "平安银行", 0.10),
+        ("002594", "比亚迪", 0.10),
+        ("600243", "*ST海华", 0.05),
+        ("000004", "ST国华", 0.05),
+        ("300750", "宁德时代", 0.20),
+        ("300108", "ST吉药", 0.20),  # 创业板风险警示股票仍为 20%
+        ("688981", "中芯国际", 0.20),
+        ("689009", "九号公司", 0.20),
+        ("430047", "诺思兰德", 0.30),
+        ("830799", "艾融软件", 0.30),
+        ("920002", "万达轴承", 0.30),
+    ],
+)
+def test_limit_ratios_by_board(code, name, expected):
+    assert limit_ratios([code], [name])[0] == expected
+
+
+@pytest.mark.parametrize("name", ["N中芯", "C宏盛", "N*ST"])
+def test_new_listings_have_no_limit(name):
+    assert np.isnan(limit_ratios(["688981"], [name])[0])
+    assert np.isnan(limit_ratios(["600000"], [name])[0])
+
+
+def test_round_to_tick_rounds_half_up():
+    assert round_to_tick(np.array([1.005, 1.004, 2.675, 10.115])).tolist() == (
+        pytest.approx([1.01, 1.0, 2.68, 10.12])
+    )
+
+
+def test_limit_prices():
+    up, down = limit_prices([10.0, 11.11, 3.33], np.array([0.1, 0.1, 0.05]))
+    # 11.11 * 1.1 = 12.221，11.11 * 0.9 = 9.999；3.33 * 1.05 = 3.4965
+    assert up.tolist() == pytest.approx([11.0, 12.22, 3.5])
+    assert down.tolist() == pytest.approx([9.0, 10.0, 3.16])
+
+
+def test_classify_limits():
+    ratio = np.array([0.1, 0.1, 0.2, 0.1, np.nan, 0.1])
+    prev_close = np.array([10.0, 10.0, 10.0, 10.0, 10.0, 10.0])
+    price = np.array([11.0, 9.0, 11.0, 10.99, 20.0, 0.0])
+    assert classify_limits(price, prev_close, ratio).tolist() == [
+        LIMIT_UP,
+        LIMIT_DOWN,
+        0,  # 创业板涨 10% 没有涨停
+        0,
+        0,  # 无涨跌幅限制
+        0,  # 停牌（价格为 0）
+    ]
+
+
+def test_bj_board():
+    codes = ["430047", "830799", "920002", "600000", "300750", "688981"]
+    assert bj_board(codes).tolist() == [True, True, True, False, False, False]
+
+
+def test_breadth_excludes_bj_limits_unless_asked():
+    df = pd.DataFrame(
+        {
+            "代码": ["600000", "830799", "920002"],
+            "名称": ["浦发银行", "艾融软件", "万达轴承"],
+            "最新价": [11.0, 13.0, 7.0],
+            "昨收": [10.0, 10.0, 10.0],
+            "涨跌幅": [10.0, 30.0, -30.0],
+            "成交额": [1e8, 1e8, 1e8],
+            "成交量": [1e6, 1e6, 1e6],
+            "总市值": [1e10, 1e10, 1e10],
+        }
+    )
+    breadth = compute_breadth(df, version=0)
+    assert (breadth.limit_up_count, breadth.limit_down_count) == (1, 0)
+    breadth = compute_breadth(df, version=0, include_bj=True)
+    assert (breadth.limit_up_count, breadth.limit_down_count) == (2, 1)
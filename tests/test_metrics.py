@@ -0,0 +1,117 @@
+import pytest
+from metrics import Metric, MetricGraph, Source, get_metric_graph
+
+
+def sum_(*args):
+    return sum(args)
+
+
+def double(value):
+    return value * 2
+
+
+@pytest.fixture
+def graph():
+    calls = []
+
+    def tracked(key, func):
+        def compute(*args):
+            calls.append(key)
+            return func(*args)
+
+        return compute
+
+    graph = MetricGraph("test")
+    graph.configure(
+        [
+            # 声明顺序与依赖顺序无关
+            Metric(
+                "ratio",
+                "占比",
+                ["total", "amount"],
+                tracked("ratio", lambda t, a: a / t),
+                "量",
+            ),
+            Metric("total", None, ["amount", "other"], tracked("total", sum_)),
+            Metric("amount", "成交额", ["spot"], tracked("amount", double), "量"),
+            Metric(
+                "heat",
+                lambda values: f"热度 {values['spot']}",
+                ["spot"],
+                tracked("heat", str),
+                "情绪",
+            ),
+        ]
+    )
+    graph.calls = calls
+    return graph
+
+
+def sources(spot, other, spot_version=1, other_version=1, other_error=None):
+    return {
+        "spot": Source(spot, spot_version),
+        "other": Source(other, other_version, other_error),
+    }
+
+
+def test_metrics_are_computed_in_dependency_order(graph):
+    values = graph.evaluate(sources(5, 10))
+    assert graph.calls.index("amount") < graph.calls.index("total")
+    assert graph.calls.index("total") < graph.calls.index("ratio")
+    assert values["amount"] == 10 and values["total"] == 20
+    assert values["ratio"] == 0.5
+    assert values.label("heat") == "热度 5"
+    assert values.group("量") == ["ratio", "amount"]
+    assert values.keys() == ["ratio", "amount", "heat"]
+
+
+def test_only_metrics_with_changed_inputs_are_recomputed(graph):
+    graph.evaluate(sources(5, 10))
+    graph.calls.clear()
+
+    graph.evaluate(sources(5, 10))
+    assert graph.calls == []
+
+    values = graph.evaluate(sources(5, 30, other_version=2))
+    assert sorted(graph.calls) == ["ratio", "total"]
+    assert values["ratio"] == 0.25
+
+
+def test_unknown_versions_are_always_recomputed(graph):
+    graph.evaluate(sources(5, 10, spot_version=None))
+    graph.calls.clear()
+    graph.evaluate(sources(5, 10, spot_version=None))
+    assert sorted(graph.calls) == ["amount", "heat", "ratio", "total"]
+
+
+def test_errors_propagate_to_dependents_only(graph):
+    values = graph.evaluate(sources(5, None, other_error="超时"))
+    assert values["amount"] == 10
+    assert values["total"] is None and values["ratio"] is None
+    assert values.error("ratio") == "other：超时"
+    assert values.failed() == {"ratio": "other：超时"}
+
+
+def test_compute_errors_are_recorded():
+    graph = MetricGraph("errors")
+    graph.configure([Metric("bad", "坏", ["spot"], lambda s: 1 / s, "量")])
+    values = graph.evaluate({"spot": Source(0, 1)})
+    assert values["bad"] is None
+    assert "division" in values.error("bad")
+
+
+def test_invalid_graphs_are_rejected():
+    graph = MetricGraph("invalid")
+    with pytest.raises(ValueError):
+        graph.configure(
+            [Metric("a", "a", ["b"], lambda b: b), Metric("b", "b", ["a"], lambda a: a)]
+        )
+    with pytest.raises(ValueError):
+        graph.configure([Metric("a", "a", [], int), Metric("a", "a", [], int)])
+    graph.configure([Metric("a", "a", ["missing"], int)])
+    with pytest.raises(KeyError):
+        graph.evaluate({})
+
+
+def test_graphs_survive_reruns():
+    assert get_metric_graph("heat") is get_metric_graph("heat")
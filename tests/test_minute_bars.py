@@ -0,0 +1,163 @@
+import numpy as np
+import pandas as pd
+import pytest
+from helpers import CLOSE_GRACE_SECONDS
+from minute_bars import (
+    BARS_PER_DAY,
+    MinuteBarBuilder,
+    MinuteBarFeeder,
+    bar_label,
+)
+
+
+def snapshot(prices, volumes, amounts, codes=("000001", "600000")):
+    return pd.DataFrame(
+        {
+            "代码": list(codes),
+            "名称": [f"股票{code}" for code in codes],
+            "最新价": prices,
+            "成交量": volumes,
+            "成交额": amounts,
+        }
+    )
+
+
+@pytest.fixture
+def builder(helper):
+    return MinuteBarBuilder(max_stocks=1, helper=helper)
+
+
+@pytest.mark.parametrize(
+    "moment, expected",
+    [
+        ((9, 29, 59), None),
+        ((9, 30, 0), 0),
+        ((9, 30, 59), 0),
+        ((9, 31, 0), 1),
+        ((11, 29, 59), 119),
+        ((11, 45, 0), 119),  # 午休计入上午最后一根
+        ((13, 0, 0), 120),
+        ((14, 59, 59), 239),
+        ((15, 0, 30), 239),  # 收盘集合竞价
+        ((15, 30, 0), None),  # 盘后交易不计入
+    ],
+)
+def test_bar_of_buckets_snapshots_by_trading_minute(builder, at, moment, expected):
+    assert builder.bar_of(at(2025, 3, 11, *moment).timestamp()) == expected
+
+
+def test_bar_of_ignores_non_trading_days(builder, at):
+    assert builder.bar_of(at(2025, 3, 15, 10, 0).timestamp()) is None
+    assert builder.bar_of(at(2025, 10, 8, 10, 0).timestamp()) is None
+
+
+def test_bar_labels():
+    assert bar_label(0) == "09:31"
+    assert bar_label(119) == "11:30"
+    assert bar_label(120) == "13:01"
+    assert bar_label(BARS_PER_DAY - 1) == "15:00"
+
+
+def test_volume_is_the_difference_of_cumulative_values(builder, at):
+    t = lambda *hms: at(2025, 3, 11, *hms).timestamp()  # noqa: E731
+    # 第一份快照只作为累计值的起点
+    builder.update(snapshot([10.0, 5.0], [1000, 500], [1e4, 2.5e3]), t(9, 30, 10))
+    builder.update(snapshot([10.2, 5.1], [1300, 600], [1.3e4, 3e3]), t(9, 30, 40))
+    builder.update(snapshot([9.9, 5.0], [1500, 600], [1.5e4, 3e3]), t(9, 31, 10))
+    # 累计值回落（上游数据异常）按 0 处理
+    builder.update(snapshot([10.1, 5.2], [1400, 700], [1.4e4, 3.5e3]), t(9, 31, 40))
+
+    bars = builder.stock_bars("000001")
+    assert list(bars.index) == ["09:31", "09:32"]
+    assert bars.loc["09:31", ["开盘", "最高", "最低", "收盘"]].tolist() == pytest.approx(
+        [10.0, 10.2, 10.0, 10.2]
+    )
+    assert bars.loc["09:31", "成交量"] == 300
+    assert bars.loc["09:32", ["开盘", "最高", "最低", "收盘"]].tolist() == pytest.approx(
+        [9.9, 10.1, 9.9, 10.1]
+    )
+    assert bars.loc["09:32", "成交量"] == 200
+    assert bars.loc["09:32", "成交额"] == 2000
+
+    # 第二只股票的成交量之和等于累计值的增量，且扩容后编号不变
+    other = builder.stock_bars("600000")
+    assert other["成交量"].sum() == 700 - 500
+    assert len(builder) == 2
+
+
+def test_old_snapshots_and_new_days(builder, at):
+    first = at(2025, 3, 11, 10, 0).timestamp()
+    assert builder.update(snapshot([10.0, 5.0], [1, 1], [1, 1]), first) == 30
+    # 缓存命中（同一份快照）不会重复计入
+    assert builder.update(snapshot([11.0, 5.0], [9, 9], [9, 9]), first) is None
+    assert builder.stock_bars("000001")["收盘"].iloc[-1] == 10.0
+
+    next_day = at(2025, 3, 12, 9, 45).timestamp()
+    assert builder.update(snapshot([10.5, 5.0], [1, 1], [1, 1]), next_day) == 15
+    assert list(builder.stock_bars("000001").index) == ["09:46"]
+
+
+def test_post_close_snapshots_do_not_inflate_the_last_bar(builder, at):
+    t = lambda *hms: at(2025, 3, 11, *hms).timestamp()  # noqa: E731
+    builder.update(snapshot([10.0, 5.0], [1000, 500], [1e4, 5e3]), t(14, 59, 20))
+    builder.update(snapshot([10.1, 5.0], [1100, 500], [1.1e4, 5e3]), t(14, 59, 50))
+    builder.update(snapshot([10.1, 5.0], [1200, 500], [1.2e4, 5e3]), t(15, 0, 20))
+    late = t(15, 0) + CLOSE_GRACE_SECONDS
+    assert builder.update(snapshot([10.1, 5.0], [9000, 500], [9e4, 5e3]), late) is None
+    assert builder.stock_bars("000001").loc["15:00", "成交量"] == 200
+
+
+def test_queries(builder, at):
+    t = lambda *hms: at(2025, 3, 11, *hms).timestamp()  # noqa: E731
+    for minute, price in enumerate([10.0, 10.5, 11.0]):
+        builder.update(
+            snapshot([price, 5.0], [100 * minute, 0], [1000 * minute, 0]),
+            t(9, 30 + minute, 30),
+        )
+    # 窗口内第一根 K 线的开盘价到最后一根的收盘价
+    recent = builder.recent(["000001", "999999"], minutes=2)
+    expected = (11.0 / 10.5 - 1) * 100
+    assert recent.loc["000001", "2分钟涨幅"] == pytest.approx(expected, rel=1e-5)
+    assert np.isnan(recent.loc["999999", "2分钟涨幅"])
+    assert builder.closes(["000001", "999999"], minutes=2) == [[10.5, 11.0], []]
+    amount = builder.amount_by_minute(["000001", "600000"])
+    assert amount.tolist() == [0, 1000, 1000]
+
+
+def test_feeder_schedule(helper, at):
+    feeder = MinuteBarFeeder(interval=30, helper=helper)
+    assert feeder.next_delay(at(2025, 3, 11, 10, 0), True) == 30
+    # 刚进入午休或收盘时立即再获取一次，收盘后短时间内继续获取收盘数据
+    assert feeder.next_delay(at(2025, 3, 11, 11, 30), True) == 0
+    assert feeder.next_delay(at(2025, 3, 11, 15, 1), False) == 30
+    assert feeder.next_delay(at(2025, 3, 11, 16, 0), False) == (17 * 60 + 30) * 60
+
+
+def test_feeder_writes_to_its_builder(builder, at):
+    feeder = MinuteBarFeeder(builder=builder)
+    assert feeder.feed_now() is None
+    feeder.configure(
+        lambda: (
+            snapshot([10.0, 5.0], [1, 1], [1, 1]),
+            at(2025, 3, 11, 10, 0).timestamp(),
+        )
+    )
+    assert feeder.feed_now() == 30
+
+
+def test_feeder_polls_feed_every_snapshot(builder, at):
+    # 每次获取都是新的快照（不经过缓存），30 秒一次的获取在相邻的 K 线中都有体现
+    polls = iter(
+        [
+            (snapshot([10.0, 5.0], [100, 0], [1e3, 0]), at(2025, 3, 11, 10, 0, 10)),
+            (snapshot([10.2, 5.0], [150, 0], [1.5e3, 0]), at(2025, 3, 11, 10, 0, 40)),
+            (snapshot([10.4, 5.0], [230, 0], [2.3e3, 0]), at(2025, 3, 11, 10, 1, 10)),
+        ]
+    )
+    feeder = MinuteBarFeeder(interval=30, builder=builder)
+    feeder.configure(lambda: (lambda df, t: (df, t.timestamp()))(*next(polls)))
+    assert [feeder.feed_now() for _ in range(3)] == [30, 30, 31]
+    bars = builder.stock_bars("000001")
+    assert bars.loc["10:01", "收盘"] == pytest.approx(10.2)
+    assert bars.loc["10:02", "收盘"] == pytest.approx(10.4)
+    assert bars.loc["10:02", "成交量"] == 80
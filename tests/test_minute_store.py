@@ -0,0 +1,84 @@
+import os
+
+import pandas as pd
+import pytest
+from minute_store import MinuteBarStore
+
+
+def bars(times, start=1.0):
+    times = pd.to_datetime(times)
+    return pd.DataFrame(
+        {
+            "day": times.strftime("%Y-%m-%d %H:%M:%S"),
+            "close": [str(start + i) for i in range(len(times))],
+            "volume": [100 * (i + 1) for i in range(len(times))],
+        }
+    )
+
+
+@pytest.fixture
+def store(tmp_path, helper):
+    return MinuteBarStore(str(tmp_path), helper=helper)
+
+
+def test_append_keeps_only_newer_bars(store):
+    first = bars(["2025-03-10 14:45", "2025-03-10 15:00"])
+    assert store.append("sh000001", 15, first) == 2
+    assert store.append("sh000001", 15, first) == 0
+
+    more = bars(["2025-03-10 15:00", "2025-03-11 09:45"], start=5)
+    assert store.append("sh000001", 15, more) == 1
+    df = store.read("sh000001", 15)
+    assert df["day"].tolist() == pd.to_datetime(
+        ["2025-03-10 14:45", "2025-03-10 15:00", "2025-03-11 09:45"]
+    ).tolist()
+    # 数值列转为数字保存
+    assert df["close"].tolist() == [1.0, 2.0, 6.0]
+
+
+def test_bars_are_partitioned_by_month_and_read_by_range(store, tmp_path):
+    store.append(
+        "sh000001",
+        15,
+        bars(["2025-02-28 15:00", "2025-03-03 09:45", "2025-04-01 09:45"]),
+    )
+    files = sorted(os.listdir(tmp_path / "sh000001" / "15m"))
+    assert files == ["2025-02.parquet", "2025-03.parquet", "2025-04.parquet"]
+
+    df = store.read("sh000001", 15, start="2025-03-01", end="2025-04-01")
+    assert df["day"].tolist() == [pd.Timestamp("2025-03-03 09:45")]
+    assert store.read("sz399001", 15).empty
+
+
+def test_unfinished_bars_are_not_stored(store):
+    added = store.append(
+        "sh000001",
+        15,
+        bars(["2025-03-11 09:45", "2025-03-11 10:00"]),
+        until="2025-03-11 09:50",
+    )
+    assert added == 1
+    assert store.last_timestamp("sh000001", 15) == pd.Timestamp("2025-03-11 09:45")
+
+
+def test_update_only_fetches_when_the_last_session_is_missing(store, at):
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return bars(["2025-03-10 15:00", "2025-03-11 15:00"])
+
+    assert store.update("sh000001", 15, fetch, now=at(2025, 3, 11, 16, 0)) == 2
+    assert store.is_current("sh000001", 15, now=at(2025, 3, 12, 10, 0))
+    assert store.update("sh000001", 15, fetch, now=at(2025, 3, 12, 10, 0)) == 0
+    assert calls == [1]
+    # 盘中获取当天 K 线时总是请求
+    store.update("sh000001", 15, fetch, now=at(2025, 3, 12, 10, 0), intraday=True)
+    assert calls == [1, 1]
+    assert not store.is_current("sh000001", 15, now=at(2025, 3, 12, 16, 0))
+
+
+def test_a_new_store_picks_up_existing_files(store, tmp_path, helper):
+    store.append("sh000001", 15, bars(["2025-03-11 15:00"]))
+    reopened = MinuteBarStore(str(tmp_path), helper=helper)
+    assert reopened.last_timestamp("sh000001", 15) == pd.Timestamp("2025-03-11 15:00")
@@ -0,0 +1,65 @@
+from datetime import timedelta
+
+import pytest
+from akcache.policy import SETTLE_SECONDS, MarketTTL
+
+
+@pytest.mark.parametrize(
+    "moment, expected",
+    [
+        # 开盘前：缓存到 09:15 集合竞价开始
+        ((2025, 3, 11, 9, 0), 15 * 60),
+        ((2025, 3, 11, 9, 14, 30), 30),
+        # 集合竞价、交易时段
+        ((2025, 3, 11, 9, 15), 60),
+        ((2025, 3, 11, 9, 30), 60),
+        ((2025, 3, 11, 11, 29, 59), 60),
+        # 午休：缓存到 13:00（午后开盘没有集合竞价）
+        ((2025, 3, 11, 11, 30), 90 * 60),
+        ((2025, 3, 11, 13, 0), 60),
+        # 收盘后半小时内仍按交易时段处理
+        ((2025, 3, 11, 15, 0), 60),
+        ((2025, 3, 11, 15, 29, 59), 60),
+        # 之后缓存到下一个交易日的集合竞价开始
+        ((2025, 3, 11, 15, 30), (17 * 60 + 45) * 60),
+        # 周五收盘后到周一
+        ((2025, 3, 14, 20, 0), (2 * 24 * 60 + 13 * 60 + 15) * 60),
+        # 长假前最后一个交易日到节后第一个交易日
+        ((2025, 9, 30, 16, 0), (8 * 24 * 60 + 17 * 60 + 15) * 60),
+    ],
+)
+def test_realtime_ttl_at_phase_boundaries(helper, at, moment, expected):
+    assert MarketTTL("realtime", helper=helper)(now=at(*moment)) == expected
+
+
+def test_realtime_pre_open_ttl_never_spans_the_auction(helper, at):
+    policy = MarketTTL("realtime", helper=helper)
+    for minute in range(0, 15):
+        now = at(2025, 3, 11, 9, minute)
+        auction = at(2025, 3, 11, 9, 15)
+        assert now.timestamp() + policy(now=now) <= auction.timestamp()
+
+
+def test_daily_ttl_caches_until_next_open(helper, at):
+    policy = MarketTTL("daily", helper=helper)
+    assert policy(now=at(2025, 3, 11, 10, 0)) == 600
+    assert policy(now=at(2025, 3, 11, 9, 0)) == 30 * 60
+    assert policy(now=at(2025, 3, 11, 9, 29)) == 600
+    assert policy(now=at(2025, 3, 11, 15, 0)) == 600
+    settled = at(2025, 3, 11, 15, 0) + timedelta(seconds=SETTLE_SECONDS)
+    assert policy(now=settled) == 18 * 60 * 60
+
+
+def test_intraday_pre_open_is_not_shortened(helper, at):
+    # 只有实时行情在集合竞价阶段变化
+    policy = MarketTTL("intraday", helper=helper)
+    assert policy(now=at(2025, 3, 11, 9, 20)) == 600
+
+
+def test_calendar_ttl_is_fixed(helper, at):
+    assert MarketTTL("calendar", helper=helper)(now=at(2025, 3, 15, 12, 0)) == 86400
+
+
+def test_unknown_kind_is_rejected():
+    with pytest.raises(ValueError):
+        MarketTTL("weekly")
@@ -0,0 +1,84 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+from replay import ReplayDay, advance
+from snapshot_recorder import SnapshotRecorder
+from trade_calendar import TradeCalendarService
+
+
+@pytest.mark.parametrize(
+    "start, step, expected",
+    [
+        ((10, 0), 600, (10, 10)),
+        # 越过 11:30 的部分从 13:00 接着走
+        ((11, 25), 600, (13, 5)),
+        ((11, 29, 50), 60, (13, 0, 50)),
+        ((11, 25), 300, (11, 30)),
+        # 午休中的时刻从 13:00 开始推进
+        ((11, 30), 60, (13, 1)),
+        ((12, 0), 60, (13, 1)),
+        ((13, 0), 60, (13, 1)),
+    ],
+)
+def test_advance_skips_lunch_without_dropping_time(at, start, step, expected):
+    end = at(2025, 3, 11, 15, 0)
+    moment, finished = advance(at(2025, 3, 11, *start), 60, step / 60, end)
+    assert moment == at(2025, 3, 11, *expected)
+    assert not finished
+
+
+def test_advance_stops_at_the_end(at):
+    end = at(2025, 3, 11, 15, 0)
+    moment, finished = advance(at(2025, 3, 11, 14, 59), 60, 10, end)
+    assert moment == end and finished
+
+
+def test_replay_day_rebuilds_sources_at_a_moment(tmp_path, helper, at):
+    recorder = SnapshotRecorder(
+        str(tmp_path),
+        fields=["最新价", "昨收", "涨跌幅", "成交额", "成交量", "总市值"],
+        interval=60,
+        helper=helper,
+    )
+    for minute, price in ((31, 10.5), (32, 11.0)):
+        df = pd.DataFrame(
+            {
+                "代码": ["600000", "000001"],
+                "名称": ["浦发银行", "平安银行"],
+                "最新价": [price, 9.0],
+                "昨收": [10.0, 10.0],
+                "涨跌幅": [(price / 10 - 1) * 100, -10.0],
+                "成交额": [1e8, 2e8],
+                "成交量": [1e6, 2e6],
+                "总市值": [1e10, 2e10],
+            }
+        )
+        recorder.record(df, at(2025, 3, 11, 9, minute).timestamp())
+    day = date(2025, 3, 11)
+    replay = ReplayDay(day, recorder.load(day), None, helper.tz)
+
+    assert replay.start == at(2025, 3, 11, 9, 31)
+    first = replay.breadth(at(2025, 3, 11, 9, 31, 30))
+    assert first.version == at(2025, 3, 11, 9, 31).timestamp()
+    assert (first.limit_up_count, first.limit_down_count) == (0, 1)
+    assert replay.breadth(at(2025, 3, 11, 9, 31, 40)) is first
+    assert replay.breadth(at(2025, 3, 11, 9, 32)).limit_up_count == 1
+    with pytest.raises(LookupError):
+        replay.breadth(at(2025, 3, 11, 9, 30))
+    with pytest.raises(LookupError):
+        replay.index_snapshot(at(2025, 3, 11, 9, 32))
+
+
+def test_local_calendar_never_calls_the_loader(tmp_path, calendar):
+    def loader():
+        raise AssertionError("不应请求上游")
+
+    service = TradeCalendarService(str(tmp_path / "calendar.npy"), loader=loader)
+    with pytest.raises(LookupError):
+        service.local_calendar()
+
+    np.save(service.path, calendar.dates)
+    local = service.local_calendar()
+    assert local.prev_trade_date(date(2025, 10, 9)) == date(2025, 9, 30)
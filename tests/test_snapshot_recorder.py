@@ -0,0 +1,101 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from snapshot_recorder import SnapshotRecorder
+
+
+def snapshot(codes, prices, amounts):
+    return pd.DataFrame(
+        {
+            "代码": codes,
+            "名称": [f"股票{code}" for code in codes],
+            "最新价": prices,
+            "昨收": [10.0] * len(codes),
+            "成交额": amounts,
+        }
+    )
+
+
+@pytest.fixture
+def recorder(tmp_path, helper):
+    return SnapshotRecorder(
+        str(tmp_path), fields=["最新价", "昨收", "成交额"], interval=60, helper=helper
+    )
+
+
+def record_day(recorder, at):
+    t = lambda *hms: at(2025, 3, 11, *hms).timestamp()  # noqa: E731
+    recorder.record(snapshot(["000001", "600000"], [10.0, 5.0], [1e4, 2e4]), t(9, 31))
+    # 间隔不足 interval 秒，不记录
+    recorder.record(
+        snapshot(["000001", "600000"], [10.5, 5.0], [2e4, 2e4]), t(9, 31, 30)
+    )
+    # 新股票出现、只有部分股票变化
+    recorder.record(
+        snapshot(["000001", "600000", "300750"], [10.2, 5.0, 200.0], [3e4, 2e4, 1e5]),
+        t(9, 32),
+    )
+    return t
+
+
+def test_round_trip(recorder, at):
+    t = record_day(recorder, at)
+    # 开盘前和非交易日不记录
+    assert recorder.record(snapshot(["000001"], [1.0], [1.0]), t(9, 0)) == 0
+    saturday = at(2025, 3, 15, 10, 0).timestamp()
+    assert recorder.record(snapshot(["000001"], [1.0], [1.0]), saturday) == 0
+
+    history = recorder.load(at(2025, 3, 11).date())
+    assert recorder.days() == [at(2025, 3, 11).date()]
+    assert history.times.tolist() == [t(9, 31), t(9, 32)]
+    assert history.codes.tolist() == ["000001", "600000", "300750"]
+    assert history.field("最新价")[0, :2].tolist() == pytest.approx([10.0, 5.0])
+    assert np.isnan(history.field("最新价")[0, 2])
+    assert history.field("最新价")[1].tolist() == pytest.approx([10.2, 5.0, 200.0])
+
+    frame = history.frame(0)
+    assert frame["代码"].tolist() == ["000001", "600000"]
+    assert frame["名称"].tolist() == ["股票000001", "股票600000"]
+    assert history.index_at(t(9, 31, 59)) == 0
+    assert history.index_at(t(9, 30)) == -1
+
+
+def test_appending_after_reopen(recorder, helper, at):
+    t = record_day(recorder, at)
+    reopened = SnapshotRecorder(
+        recorder.directory, fields=recorder.fields, interval=60, helper=helper
+    )
+    assert reopened.record(snapshot(["000001"], [10.2], [3e4]), t(9, 33)) == 0
+    assert reopened.record(snapshot(["000001"], [10.3], [4e4]), t(9, 34)) == 1
+    history = reopened.load(at(2025, 3, 11).date())
+    assert len(history) == 3
+    assert history.field("最新价")[-1].tolist() == pytest.approx([10.3, 5.0, 200.0])
+
+
+def test_corrupted_tail_is_recovered(recorder, helper, at):
+    t = record_day(recorder, at)
+    path = recorder.path(at(2025, 3, 11).date())
+    complete = os.path.getsize(path)
+    # 模拟进程在写入记录时崩溃：文件末尾只有半条记录
+    with open(path, "ab") as f:
+        f.write(b"\x00" * 7)
+
+    history = recorder.load(at(2025, 3, 11).date())
+    assert len(history) == 2
+
+    reopened = SnapshotRecorder(
+        recorder.directory, fields=recorder.fields, interval=60, helper=helper
+    )
+    assert reopened.record(snapshot(["000001"], [10.4], [5e4]), t(9, 35)) == 1
+    assert os.path.getsize(path) > complete
+    history = reopened.load(at(2025, 3, 11).date())
+    assert history.times.tolist() == [t(9, 31), t(9, 32), t(9, 35)]
+    assert history.field("最新价")[-1].tolist() == pytest.approx([10.4, 5.0, 200.0])
+
+
+def test_mismatched_fields_are_not_appended(recorder, helper, at):
+    t = record_day(recorder, at)
+    other = SnapshotRecorder(recorder.directory, fields=["最新价"], helper=helper)
+    assert other.record(snapshot(["000001"], [11.0], [1.0]), t(9, 40)) == 0
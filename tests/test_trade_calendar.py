@@ -0,0 +1,103 @@
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+from trade_calendar import TradeCalendar, TradeCalendarService
+
+
+@pytest.mark.parametrize("n", [1, 2, 5, 30])
+def test_prev_trade_date_n_steps_match_repeated_steps(calendar, n):
+    day = date(2024, 12, 1)
+    while day < date(2026, 2, 1):
+        expected = day
+        for _ in range(n):
+            expected = calendar.prev_trade_date(expected)
+        assert calendar.prev_trade_date(day, n) == expected, day
+        day += timedelta(days=3)
+
+
+def test_prev_trade_date_across_a_holiday_and_the_calendar_end(calendar):
+    assert calendar.prev_trade_date(date(2025, 10, 10), 2) == date(2025, 9, 30)
+    # 日历之后的周末：往前数工作日，不够时回到日历中
+    assert calendar.prev_trade_date(date(2026, 1, 4), 1) == date(2026, 1, 2)
+    assert calendar.prev_trade_date(date(2026, 1, 4), 3) == date(2025, 12, 31)
+
+
+def test_prev_and_next_inside_the_calendar(calendar):
+    # 周一的前一个交易日是上周五，周五的下一个交易日是下周一
+    assert calendar.prev_trade_date(date(2025, 3, 17)) == date(2025, 3, 14)
+    assert calendar.next_trade_date(date(2025, 3, 14)) == date(2025, 3, 17)
+    # 非交易日也能查询
+    assert calendar.prev_trade_date(date(2025, 3, 16)) == date(2025, 3, 14)
+    # 跨过长假
+    assert calendar.next_trade_date(date(2025, 9, 30)) == date(2025, 10, 9)
+    assert calendar.prev_trade_date(date(2025, 10, 9)) == date(2025, 9, 30)
+
+
+def test_prev_and_next_at_the_calendar_ends(calendar):
+    first, last = date(2025, 1, 2), date(2025, 12, 31)
+    assert calendar.next_trade_date(date(2024, 12, 31)) == first
+    assert calendar.next_trade_date(date(2024, 12, 1)) == first
+    assert calendar.prev_trade_date(date(2026, 1, 1)) == last
+    # 日历之外按工作日推算（不知道日历之外的节假日）
+    assert calendar.next_trade_date(last) == date(2026, 1, 1)
+    assert calendar.prev_trade_date(first) == date(2025, 1, 1)
+    assert calendar.prev_trade_date(date(2026, 1, 12)) == date(2026, 1, 9)
+
+
+def test_is_trade_date_and_counts(calendar):
+    assert calendar.is_trade_date(date(2025, 3, 11))
+    assert not calendar.is_trade_date(date(2025, 3, 15))
+    assert not calendar.is_trade_date(date(2025, 10, 8))
+    # 日历之外按工作日判断
+    assert calendar.is_trade_date(date(2026, 1, 5))
+    assert calendar.trade_days_between(date(2025, 3, 10), date(2025, 3, 16)) == 5
+    assert calendar.trade_days_between(date(2025, 3, 16), date(2025, 3, 10)) == 0
+    assert len(calendar.trade_dates(date(2025, 9, 29), date(2025, 10, 10))) == 4
+
+
+def test_empty_calendar_falls_back_to_weekdays():
+    calendar = TradeCalendar([])
+    assert calendar.prev_trade_date(date(2025, 3, 17)) == date(2025, 3, 14)
+    assert calendar.next_trade_date(date(2025, 3, 14)) == date(2025, 3, 17)
+
+
+def test_service_loads_once_per_day_and_saves_locally(tmp_path, calendar):
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return pd.DataFrame({"trade_date": calendar.dates})
+
+    service = TradeCalendarService(str(tmp_path / "calendar.npy"), loader=loader)
+    assert service.is_trade_date(date(2025, 3, 11))
+    assert service.prev_trade_date(date(2025, 10, 9)) == date(2025, 9, 30)
+    assert calls == [1]
+
+    # 本地文件是当天写入的，新进程不再请求上游
+    restarted = TradeCalendarService(service.path, loader=loader)
+    assert restarted.calendar().dates.tolist() == calendar.dates.tolist()
+    assert calls == [1]
+
+
+def test_failed_loads_are_cached_until_the_retry_time(tmp_path, monkeypatch):
+    calls, reads = [], []
+
+    def loader():
+        calls.append(1)
+        raise ConnectionError("upstream down")
+
+    service = TradeCalendarService(str(tmp_path / "calendar.npy"), loader=loader)
+    read_local = service._read_local
+    monkeypatch.setattr(service, "_read_local", lambda: reads.append(1) or read_local())
+
+    for _ in range(5):
+        assert service.calendar() is None
+        # 没有日历时按工作日判断
+        assert service.is_trade_date(date(2025, 10, 1))
+    assert (len(calls), len(reads)) == (1, 1)
+
+    # 到了重试时间再读本地文件、请求上游
+    service._retry_at = 0
+    service.calendar()
+    assert (len(calls), len(reads)) == (2, 2)
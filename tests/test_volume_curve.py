@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+import pytest
+from volume_curve import (
+    TRADING_MINUTES,
+    CumulativeCurve,
+    bar_slots,
+    compute_amount_curve,
+    day_weights,
+    trading_minute,
+)
+
+
+def bar_times(day, period):
+    """一个交易日的 K 线结束时间：上午 9:30 后、下午 13:00 后每 period 分钟一根。"""
+    morning = pd.date_range(f"{day} 09:30", f"{day} 11:30", freq=f"{period}min")[1:]
+    afternoon = pd.date_range(f"{day} 13:00", f"{day} 15:00", freq=f"{period}min")[1:]
+    return morning.append(afternoon)
+
+
+def make_bars(days, period=15, seed=0):
+    rng = np.random.default_rng(seed)
+    times = bar_times(days[0], period)
+    for day in days[1:]:
+        times = times.append(bar_times(day, period))
+    return pd.DataFrame({"day": times, "amount": rng.uniform(1, 100, len(times))})
+
+
+def test_trading_minute_skips_lunch():
+    minutes = np.array([9 * 60 + 30, 10 * 60, 11 * 60 + 30, 12 * 60, 13 * 60, 15 * 60])
+    assert trading_minute(minutes).tolist() == [0, 30, 120, 120, 120, 240]
+
+
+def test_bar_slots_put_the_auction_bar_in_the_first_slot():
+    times = pd.to_datetime(
+        ["2025-03-11 09:30", "2025-03-11 09:45", "2025-03-11 13:15", "2025-03-11 15:00"]
+    )
+    assert bar_slots(times, 15).tolist() == [0, 0, 8, 15]
+
+
+def test_curve_matches_a_groupby_reference():
+    days = ["2025-03-10", "2025-03-11", "2025-03-12"]
+    bars = make_bars(days)
+    curve = compute_amount_curve(bars, ndays=3, period=15, before="2025-03-13")
+
+    df = bars.assign(date=bars["day"].dt.date, slot=bar_slots(bars["day"], 15))
+    per_day = df.pivot_table(
+        index="date", columns="slot", values="amount", aggfunc="sum"
+    )
+    expected = per_day.div(per_day.sum(axis=1), axis=0).mean().to_numpy()
+    assert len(curve) == TRADING_MINUTES // 15
+    assert curve == pytest.approx(expected)
+    assert curve.sum() == pytest.approx(1)
+
+
+def test_incomplete_and_current_days_are_skipped():
+    bars = make_bars(["2025-03-10", "2025-03-11", "2025-03-12"])
+    # 3 月 11 日缺一根 K 线；3 月 12 日是“今天”
+    bars = bars.drop(index=20)
+    curve = compute_amount_curve(bars, ndays=5, period=15, before="2025-03-12")
+    only = compute_amount_curve(
+        bars[bars["day"].dt.day == 10], ndays=1, period=15, before="2025-03-12"
+    )
+    assert curve == pytest.approx(only)
+
+
+def test_exp_weighting_favours_recent_days():
+    weights = day_weights(3, "exp", halflife=1)
+    assert weights == pytest.approx(np.array([1, 2, 4]) / 7)
+    assert day_weights(4).tolist() == [0.25] * 4
+    with pytest.raises(ValueError):
+        day_weights(3, "linear")
+
+
+def test_invalid_arguments_are_rejected():
+    bars = make_bars(["2025-03-10"])
+    with pytest.raises(ValueError):
+        compute_amount_curve(bars, ndays=1, period=30)
+    with pytest.raises(ValueError):
+        compute_amount_curve(bars, ndays=0)
+    with pytest.raises(ValueError):
+        compute_amount_curve(bars, ndays=1, before="2025-03-10")
+
+
+def test_cumulative_curve_interpolates_within_slots():
+    curve = CumulativeCurve(np.full(16, 1 / 16), period=15)
+    assert curve.by_minute[0] == 0 and curve.by_minute[-1] == pytest.approx(1)
+    assert curve.fraction(15) == pytest.approx(1 / 16)
+    assert curve.fraction(7.5) == pytest.approx(1 / 32)
+    assert curve.fraction(120) == pytest.approx(0.5)
+    # 超出范围截断
+    assert curve.fraction(-5) == 0 and curve.fraction(300) == pytest.approx(1)
+    with pytest.raises(ValueError):
+        curve.by_minute[0] = 1
+
+
+def test_cumulative_curve_matches_the_slot_prefix_sums():
+    bars = make_bars(["2025-03-10", "2025-03-11"], period=5)
+    curve = compute_amount_curve(bars, ndays=2, period=5, before="2025-03-12")
+    cumulative = CumulativeCurve(curve, period=5)
+    minutes = np.arange(0, TRADING_MINUTES + 1, 5)
+    expected = np.concatenate([[0], np.cumsum(curve)])
+    assert cumulative.fraction(minutes) == pytest.approx(expected)
+
+
+def test_forecast_scales_current_amounts():
+    curve = CumulativeCurve(np.full(16, 1 / 16), period=15)
+    assert curve.forecast(100.0, 120) == pytest.approx(200)
+    # 开盘时无法预测，返回当前成交额
+    assert curve.forecast(100.0, 0) == 100.0
+    forecast = curve.forecast(np.array([100.0, 50.0]), np.array([60, 240]))
+    assert forecast == pytest.approx([400, 50])
+
+
+def test_cumulative_curve_rejects_mismatched_periods():
+    with pytest.raises(ValueError):
+        CumulativeCurve(np.full(16, 1 / 16), period=5)
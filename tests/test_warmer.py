@@ -0,0 +1,59 @@
+from datetime import timedelta
+
+from akcache.policy import MarketTTL
+from warmer import REALTIME_BEFORE_OPEN, CacheWarmer, WarmTask
+
+
+def make_warmer(helper):
+    warmer = CacheWarmer(before_open=300, after_lunch=30, helper=helper)
+    daily = WarmTask("日线", lambda: None)
+    realtime = WarmTask("行情", lambda: None, before_open=REALTIME_BEFORE_OPEN)
+    warmer.configure([daily, realtime])
+    return warmer, daily, realtime
+
+
+def test_tasks_are_scheduled_by_their_own_lead_time(helper, at):
+    warmer, daily, realtime = make_warmer(helper)
+
+    assert warmer.next_warm(at(2025, 3, 11, 8, 0)) == (at(2025, 3, 11, 9, 25), [daily])
+    assert warmer.next_warm(at(2025, 3, 11, 9, 25)) == (
+        at(2025, 3, 11, 9, 29, 30),
+        [realtime],
+    )
+    # 午后开盘后预热所有任务
+    assert warmer.next_warm(at(2025, 3, 11, 9, 30)) == (
+        at(2025, 3, 11, 13, 0, 30),
+        [daily, realtime],
+    )
+    # 周五收盘后到下周一，长假跳到节后第一个交易日
+    assert warmer.next_warm_time(at(2025, 3, 14, 15, 0)) == at(2025, 3, 17, 9, 25)
+    assert warmer.next_warm_time(at(2025, 9, 30, 15, 0)) == at(2025, 10, 9, 9, 25)
+
+
+def test_realtime_entries_warmed_before_the_open_outlive_it(helper, at):
+    warmer, _, realtime = make_warmer(helper)
+    warm_time, _ = warmer.next_warm(at(2025, 3, 11, 9, 25))
+    ttl = MarketTTL("realtime", helper=helper)(now=warm_time)
+    assert warm_time + timedelta(seconds=ttl) > at(2025, 3, 11, 9, 30)
+
+
+def test_nothing_is_scheduled_without_tasks(helper, at):
+    assert CacheWarmer(helper=helper).next_warm(at(2025, 3, 11, 8, 0)) is None
+
+
+def test_warm_now_reports_failures_without_stopping(helper):
+    calls = []
+
+    def fail():
+        raise RuntimeError("upstream down")
+
+    warmer = CacheWarmer(helper=helper)
+    warmer.configure(
+        [WarmTask("失败", fail), WarmTask("成功", lambda: calls.append(1))]
+    )
+    report = warmer.warm_now()
+
+    assert calls == [1]
+    errors = {task["任务"]: task["错误"] for task in report["任务"]}
+    assert errors == {"失败": "upstream down", "成功": None}
+    assert warmer.last_report is report